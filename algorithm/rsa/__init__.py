@@ -27,19 +27,56 @@ Example:
     keygen, base64_encrypt and base64_decrypt are exposed through package cli which is
     documented bellow.
 """
+from .batch import BatchDecryptor
+from .binary import decrypt_file
+from .binary import decrypt_file_range
+from .binary import decrypt_from_binary
+from .binary import decrypt_range
+from .binary import encrypt_file
+from .binary import encrypt_to_binary
+from .envelope import decrypt_envelope
+from .envelope import encrypt_envelope
+from .envelope import EnvelopeDecryptor
+from .envelope import EnvelopeEncryptor
+from .keyformat import iter_keys
+from .keyformat import key_from_bytes
+from .keyformat import key_from_pem
+from .keyformat import key_to_bytes
+from .keyformat import key_to_pem
+from .keys import load_private_key
+from .keys import load_public_key
+from .keys import PrivateKey
+from .keys import PublicKey
+from .modular import batch_modinv
+from .modular import lehmer_xgcd
+from .modular import modinv
+from .pool import PrimePool
 from .primes import find_prime
+from .primes import find_primes
 from .primes import generate_prime_candidate
 from .primes import is_prime
 from .rsa import base64_decrypt
 from .rsa import base64_encrypt
 from .rsa import decrypt
+from .rsa import decrypt_bytes
 from .rsa import encrypt
+from .rsa import encrypt_bytes
+from .rsa import encrypt_many
 from .rsa import initialize
+from .rsa import initialize_family
+from .rsa import initialize_multi_prime
 from .rsa import keygen
+from .stream import Decryptor
+from .stream import Encryptor
+from .utils import crt_params
 from .utils import decode_key
+from .utils import decode_private_key
 from .utils import encode_key
+from .utils import encode_private_key
+from .utils import fingerprint
 from .utils import lcm
 from .utils import powmod
+from .utils import powmod_crt
 from .utils import xgcd
 
 __version__ = "0.1.0"
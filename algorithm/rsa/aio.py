@@ -0,0 +1,286 @@
+"""Asyncio interface of the package.
+
+Key generation, encryption and decryption are CPU-bound, so calling them from a
+coroutine blocks the event loop until they are done. Functions of this module run
+them in an executor instead, limiting the number of calls running at once, so that
+a burst of requests can't occupy all the workers of the executor or queue up an
+unbounded amount of work.
+
+Cancelling a coroutine generating a key stops the search for primes as soon as the
+current candidate has been tested (see :func:`rsa.primes.find_prime`), rather than
+letting it run to completion in the background. Encryption and decryption can't be
+interrupted, so cancelling them only stops waiting for the result.
+
+By default the functions share a :class:`Runner` using a thread pool, which keeps
+the event loop responsive, but doesn't make the calls run in parallel since they
+hold the GIL. A runner using a process pool can be used for that instead, see
+:func:`configure`.
+
+Attributes:
+    MAX_CONCURRENCY (int): default maximal number of calls running at once
+
+Example:
+    >>> import asyncio
+    >>> from rsa import aio
+    >>> async def main():
+    ...     public, private = await aio.keygen(512)
+    ...     ciphertext = await aio.encrypt("Hello world!", public)
+    ...     return await aio.decrypt(ciphertext, private)
+    >>> print(asyncio.new_event_loop().run_until_complete(main()))
+    Hello world!
+"""
+import asyncio
+import multiprocessing
+import os
+import threading
+from concurrent.futures import Executor
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Any
+from typing import Callable
+from typing import Optional
+from typing import Tuple
+from weakref import WeakKeyDictionary
+
+from .rsa import base64_decrypt
+from .rsa import base64_encrypt
+from .rsa import initialize as _initialize
+from .rsa import keygen as _keygen
+
+MAX_CONCURRENCY = os.cpu_count() or 1
+
+
+def _call_with_stop(function: Callable[..., Any], stop: Any, *args: Any) -> Any:
+    """Call function making it stop once the event is set."""
+    return function(*args, should_stop=stop.is_set)
+
+
+class Runner:
+    """Runs CPU-bound functions in an executor, limiting the number of running calls.
+
+    Args:
+        executor: executor to run the functions in, a thread pool with
+                  :code:`max_concurrency` threads is created if not provided
+        max_concurrency: maximal number of calls running at once, further calls wait
+                         until one of the running ones is done
+
+    Attributes:
+        executor (concurrent.futures.Executor): executor running the functions
+        max_concurrency (int): maximal number of calls running at once
+    """
+
+    def __init__(
+        self,
+        executor: Optional[Executor] = None,
+        max_concurrency: int = MAX_CONCURRENCY,
+    ) -> None:
+        if max_concurrency < 1:
+            raise ValueError("max_concurrency should be a positive integer")
+        self._owns_executor = executor is None
+        self.executor = executor or ThreadPoolExecutor(max_concurrency)
+        self.max_concurrency = max_concurrency
+        self._semaphores: Any = WeakKeyDictionary()
+        self._manager: Any = None
+        self._lock = threading.Lock()
+
+    def _stop_event(self) -> Any:
+        """Create an event which can be shared with the workers of the executor."""
+        if not isinstance(self.executor, ProcessPoolExecutor):
+            return threading.Event()
+        with self._lock:
+            if self._manager is None:
+                self._manager = multiprocessing.Manager()
+            return self._manager.Event()
+
+    async def run(
+        self, function: Callable[..., Any], *args: Any, cancellable: bool = False
+    ) -> Any:
+        """Run function in the executor once there is room for another call.
+
+        If the coroutine is cancelled, it waits for the call to stop before
+        re-raising the cancellation, so that the call keeps counting towards the
+        limit for as long as it occupies a worker.
+
+        Args:
+            function: function to run, needs to be picklable if the executor is a
+                      process pool
+            args: arguments of the function
+            cancellable: whether the function accepts :code:`should_stop` callable,
+                         which is used to stop it if the coroutine is cancelled
+
+        Returns:
+            result of the function
+        """
+        loop = asyncio.get_event_loop()
+        semaphore = self._semaphores.get(loop)
+        if semaphore is None:
+            semaphore = self._semaphores[loop] = asyncio.Semaphore(self.max_concurrency)
+
+        async with semaphore:
+            stop = None
+            if cancellable:
+                stop = self._stop_event()
+                function = partial(_call_with_stop, function, stop)
+            future = self.executor.submit(function, *args)
+            wrapped = asyncio.wrap_future(future, loop=loop)
+            try:
+                return await asyncio.shield(wrapped)
+            except asyncio.CancelledError:
+                if stop is not None:
+                    stop.set()
+                future.cancel()
+                await asyncio.wait([wrapped])
+                if not wrapped.cancelled():
+                    wrapped.exception()
+                raise
+
+    async def keygen(self, num_bits: int, num_primes: int = 2) -> Tuple[str, str]:
+        """Generate pair of base64-encoded keys, see :func:`rsa.rsa.keygen`.
+
+        Args:
+            num_bits: number of bits in primes used by the RSA
+            num_primes: number of primes making up the modulus
+
+        Returns:
+            base64 encoded public and private key
+        """
+        return await self.run(
+            partial(_keygen, num_primes=num_primes), num_bits, cancellable=True
+        )
+
+    async def initialize(self, num_bits: int) -> Tuple[int, int, int, int, int, int]:
+        """Generate all parameters of RSA algorithm, see :func:`rsa.rsa.initialize`.
+
+        Args:
+            num_bits: number of bits in primes to be generated
+
+        Returns:
+            p, q, n, e, d, phi
+        """
+        return await self.run(_initialize, num_bits, cancellable=True)
+
+    async def encrypt(self, message: str, key: str, hybrid: bool = False) -> str:
+        """Encrypt message using base64-encoded key, see :func:`rsa.rsa.base64_encrypt`.
+
+        Args:
+            message: message to be encrypted
+            key: base64 encoded key
+            hybrid: whether to encrypt the message into an envelope
+
+        Returns:
+            base64 encoded ciphertext
+        """
+        return await self.run(partial(base64_encrypt, hybrid=hybrid), message, key)
+
+    async def decrypt(self, ciphertext: str, key: str) -> str:
+        """Decrypt ciphertext using base64-encoded key, see :func:`rsa.rsa.base64_decrypt`.
+
+        Args:
+            ciphertext: base64 encoded ciphertext or envelope
+            key: base64 encoded private key
+
+        Returns:
+            decrypted message
+        """
+        return await self.run(base64_decrypt, ciphertext, key)
+
+    def close(self) -> None:
+        """Shut down the executor, if it has been created by the runner.
+
+        The manager of events used to stop calls running in a process pool is shut
+        down as well, if it has been started.
+        """
+        if self._owns_executor:
+            self.executor.shutdown()
+        if self._manager is not None:
+            self._manager.shutdown()
+            self._manager = None
+
+
+_runner: Optional[Runner] = None
+
+
+def get_runner() -> Runner:
+    """Get the runner used by the functions of this module, creating it if needed.
+
+    Returns:
+        the default runner
+    """
+    global _runner
+    if _runner is None:
+        _runner = Runner()
+    return _runner
+
+
+def configure(
+    executor: Optional[Executor] = None, max_concurrency: int = MAX_CONCURRENCY
+) -> Runner:
+    """Replace the runner used by the functions of this module.
+
+    The previous runner is closed, see :meth:`Runner.close`.
+
+    Args:
+        executor: executor to run the functions in, see :class:`Runner`
+        max_concurrency: maximal number of calls running at once
+
+    Returns:
+        the new default runner
+    """
+    global _runner
+    if _runner is not None:
+        _runner.close()
+    _runner = Runner(executor, max_concurrency)
+    return _runner
+
+
+async def keygen(num_bits: int, num_primes: int = 2) -> Tuple[str, str]:
+    """Generate pair of base64-encoded keys using the default runner.
+
+    Args:
+        num_bits: number of bits in primes used by the RSA
+        num_primes: number of primes making up the modulus
+
+    Returns:
+        base64 encoded public and private key
+    """
+    return await get_runner().keygen(num_bits, num_primes)
+
+
+async def initialize(num_bits: int) -> Tuple[int, int, int, int, int, int]:
+    """Generate all parameters of RSA algorithm using the default runner.
+
+    Args:
+        num_bits: number of bits in primes to be generated
+
+    Returns:
+        p, q, n, e, d, phi
+    """
+    return await get_runner().initialize(num_bits)
+
+
+async def encrypt(message: str, key: str, hybrid: bool = False) -> str:
+    """Encrypt message using base64-encoded key and the default runner.
+
+    Args:
+        message: message to be encrypted
+        key: base64 encoded key
+        hybrid: whether to encrypt the message into an envelope
+
+    Returns:
+        base64 encoded ciphertext
+    """
+    return await get_runner().encrypt(message, key, hybrid)
+
+
+async def decrypt(ciphertext: str, key: str) -> str:
+    """Decrypt ciphertext using base64-encoded key and the default runner.
+
+    Args:
+        ciphertext: base64 encoded ciphertext or envelope
+        key: base64 encoded private key
+
+    Returns:
+        decrypted message
+    """
+    return await get_runner().decrypt(ciphertext, key)
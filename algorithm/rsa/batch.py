@@ -0,0 +1,304 @@
+"""Batch decryption of ciphertexts encrypted using a family of keys.
+
+Decrypting a ciphertext takes a full-size exponentiation, while encrypting one using
+a small public exponent takes only a few multiplications. `Fiat's batch RSA
+<https://doi.org/10.1007/s001459900012>`__ trades the former for the latter when
+ciphertexts :code:`c_i` were encrypted using keys sharing a modulus :code:`n`, but
+having distinct, pairwise coprime public exponents :code:`e_i`, see
+:func:`rsa.rsa.initialize_family`.
+
+A batch holds at most one ciphertext per key. The ciphertexts are combined up a
+binary product tree into :code:`v = prod(c_i ** (E / e_i))`, where :code:`E` is the
+product of all the exponents, so that :code:`v ** (1 / E)` is the product of all
+the plaintexts. That root is the only full-size exponentiation of the batch and is
+calculated using CRT. The product is then split back down the tree, with every node
+splitting the product of the plaintexts of its subtrees using exponents bounded by
+the product of the exponents of its subtrees. Divisions of all the nodes on a level
+of the tree are done using a single inversion, see
+:func:`rsa.modular.batch_modinv`.
+
+All the exponentiations other than the root are cheap only as long as the exponents
+are small, so the smaller they are and the more keys there are, the bigger the
+speedup. The default :code:`FAMILY_EXPONENTS` are the smallest primes starting from
+the usual public exponent 65537, rather than the smallest primes, since ciphertexts
+are not padded, so short messages encrypted using tiny exponents can be decrypted
+by anyone.
+
+Attributes:
+    FAMILY_EXPONENTS (tuple): default public exponents of a family of keys
+
+Example:
+    >>> from rsa import PublicKey, initialize_family
+    >>> from rsa.batch import BatchDecryptor
+    >>> p, q, n, exponents, private_exponents, _ = initialize_family(256)
+    >>> decryptor = BatchDecryptor.from_primes([p, q], private_exponents)
+    >>> ciphertexts = [
+    ...     PublicKey(n, e).encrypt(f"Hello {i}!") for i, e in enumerate(exponents)
+    ... ]
+    >>> decryptor.decrypt(list(enumerate(ciphertexts)))[:2]
+    ['Hello 0!', 'Hello 1!']
+"""
+import base64
+from functools import reduce
+from math import gcd
+from operator import mul
+from typing import Dict
+from typing import Iterable
+from typing import List
+from typing import Sequence
+from typing import Tuple
+from typing import Union
+
+from . import config
+from . import instrumentation
+from .keys import load_private_key
+from .keys import PrivateKey
+from .keys import restore_last_block
+from .keys import split_ciphertext
+from .modular import batch_modinv
+from .modular import modinv
+from .utils import crt_params
+from .utils import lcm
+from .utils import powmod_crt
+
+FAMILY_EXPONENTS = (65537, 65539, 65543, 65551, 65557, 65563, 65579, 65581)
+
+
+def check_family_exponents(exponents: Sequence[int]) -> None:
+    """Checks whether exponents can be public exponents of a family of keys.
+
+    Args:
+        exponents: public exponents
+
+    Raises:
+        ValueError: if any of the exponents isn't an odd number greater than 1 or
+                    the exponents aren't pairwise coprime
+    """
+    if not exponents:
+        raise ValueError("Family needs to have at least one key")
+    for i, e in enumerate(exponents):
+        if e < 3 or e % 2 == 0:
+            raise ValueError("Public exponent needs to be an odd number greater than 1")
+        if any(gcd(e, other) != 1 for other in exponents[:i]):
+            raise ValueError("Public exponents of a family need to be pairwise coprime")
+
+
+class BatchDecryptor:
+    """Decrypts ciphertexts encrypted using any of the keys of a family in batches.
+
+    Args:
+        keys: private keys of the family, with CRT parameters, or their base64
+              encodings
+
+    Raises:
+        ValueError: if the keys don't share the modulus, don't have CRT parameters
+                    or their public exponents aren't pairwise coprime
+
+    Attributes:
+        n (int): modulus of the family
+        keys (list): private key objects of the family
+        exponents (list): public exponents of the keys
+    """
+
+    def __init__(self, keys: Iterable[Union[str, PrivateKey]]) -> None:
+        self.keys = [
+            load_private_key(key) if isinstance(key, str) else key for key in keys
+        ]
+        if not self.keys:
+            raise ValueError("Family needs to have at least one key")
+        if any(key.n != self.keys[0].n for key in self.keys):
+            raise ValueError("Keys of a family need to share the modulus")
+        if any(key.crt is None for key in self.keys):
+            raise ValueError("Batch decryption requires keys with CRT parameters")
+
+        crt = self.keys[0].crt or ()
+        self.n = self.keys[0].n
+        self._primes = [crt[0], crt[1], *crt[5::3]]
+        self._phi = reduce(lcm, (prime - 1 for prime in self._primes))
+        self.exponents = [modinv(key.d, self._phi) for key in self.keys]
+        check_family_exponents(self.exponents)
+        self._root_params: Dict[int, Tuple[int, ...]] = {}
+
+    @classmethod
+    def from_primes(
+        cls, primes: Sequence[int], private_exponents: Iterable[int]
+    ) -> "BatchDecryptor":
+        """Create decryptor from the primes and private exponents of a family.
+
+        Args:
+            primes: primes making up the shared modulus
+            private_exponents: private exponents of the keys, as returned by
+                               :func:`rsa.rsa.initialize_family`
+
+        Returns:
+            batch decryptor
+        """
+        p, q, *other_primes = primes
+        n = reduce(mul, primes)
+        return cls(
+            PrivateKey(n, d, (p, q, *crt_params(p, q, d, *other_primes)))
+            for d in private_exponents
+        )
+
+    def _root(self, num: int, e: int) -> int:
+        """Calculate :code:`e`-th root of a number using CRT."""
+        params = self._root_params.get(e)
+        if params is None:
+            p, q, *other_primes = self._primes
+            d = modinv(e, self._phi)
+            params = self._root_params[e] = (p, q, *crt_params(p, q, d, *other_primes))
+        return powmod_crt(num, *params)
+
+    def _decrypt_batch(self, exponents: List[int], nums: List[int]) -> List[int]:
+        """Decrypt ciphertexts encrypted using distinct keys of the family."""
+        n = self.n
+        levels = [list(zip(exponents, nums))]
+        while len(levels[-1]) > 1:
+            below = levels[-1]
+            level = [
+                (e_left * e_right, pow(left, e_right, n) * pow(right, e_left, n) % n)
+                for (e_left, left), (e_right, right) in zip(below[::2], below[1::2])
+            ]
+            levels.append(level + below[len(level) * 2 :])
+
+        ((e, num),) = levels[-1]
+        products = [self._root(num, e)]
+        for below in reversed(levels[:-1]):
+            powers, divisors = [], []
+            for product, (e_left, left), (e_right, right) in zip(
+                products, below[::2], below[1::2]
+            ):
+                # x is a multiple of e_left and one more than a multiple of e_right,
+                # so product ** x is the plaintext of the right subtree multiplied
+                # by a number which can be calculated from the ciphertexts
+                x = e_left * modinv(e_left, e_right)
+                powers.append(pow(product, x, n))
+                divisors.append(
+                    pow(left, x // e_left, n) * pow(right, (x - 1) // e_right, n) % n
+                )
+
+            inverses = batch_modinv(powers + divisors, n)
+            split = []
+            for i, (product, power, divisor) in enumerate(
+                zip(products, powers, divisors)
+            ):
+                right = power * inverses[len(powers) + i] % n
+                split += [product * divisor * inverses[i] % n, right]
+            products = split + products[len(powers) :]
+
+        return products
+
+    def decrypt_ints(self, items: Sequence[Tuple[int, int]]) -> List[int]:
+        """Decrypt ciphertexts represented as integers.
+
+        Ciphertexts are grouped into batches holding at most one ciphertext per key,
+        so the speedup is the biggest if all the keys are used equally. A batch with a
+        single ciphertext is decrypted using its key as usual.
+
+        Args:
+            items: pairs of an index of the key in :code:`keys` and a ciphertext
+                   encrypted using that key
+
+        Returns:
+            decrypted integers, in the same order as the items
+        """
+        queues: List[List[int]] = [[] for _ in self.keys]
+        for position, (index, num) in enumerate(items):
+            queues[index].append(position)
+
+        out = [0] * len(items)
+        with instrumentation.timer("decrypt"):
+            while any(queues):
+                batched, single = [], []
+                for index, queue in enumerate(queues):
+                    if queue:
+                        position = queue.pop()
+                        # zero, unlike other ciphertexts, can't be inverted
+                        if items[position][1] == 0:
+                            single.append((index, position))
+                        else:
+                            batched.append((index, position))
+                if len(batched) < 2:
+                    single += batched
+                    batched = []
+
+                for index, position in single:
+                    out[position] = self.keys[index].decrypt_int(items[position][1])
+                if batched:
+                    decrypted = self._decrypt_batch(
+                        [self.exponents[index] for index, _ in batched],
+                        [items[position][1] for _, position in batched],
+                    )
+                    for (_, position), num in zip(batched, decrypted):
+                        out[position] = num
+
+        return out
+
+    def decrypt_bytes(self, items: Sequence[Tuple[int, str]]) -> List[bytearray]:
+        """Decrypt base64-encoded ciphertexts into bytes.
+
+        Blocks of all the ciphertexts are decrypted together, so ciphertexts made up
+        of many blocks can be batched even if they were all encrypted using the same
+        key. See :meth:`rsa.keys.PrivateKey.decrypt_bytes` for the layout of the
+        decrypted bytes.
+
+        Args:
+            items: pairs of an index of the key in :code:`keys` and base64 encoded
+                   ciphertext encrypted using that key
+
+        Raises:
+            ValueError: if a block of any of the ciphertexts doesn't decrypt into at
+                        most :code:`chunk_size` bytes
+
+        Returns:
+            decrypted bytes, in the same order as the items
+        """
+        split = [split_ciphertext(ciphertext) for _, ciphertext in items]
+        blocks = [
+            [
+                int.from_bytes(base64.urlsafe_b64decode(chunk), config.BYTEORDER)
+                for chunk in chunks
+            ]
+            for chunks, _ in split
+        ]
+        nums = iter(
+            self.decrypt_ints(
+                [
+                    (index, num)
+                    for (index, _), nums in zip(items, blocks)
+                    for num in nums
+                ]
+            )
+        )
+
+        n = self.keys[0].chunk_size
+        messages = []
+        for count, (_, last_size) in zip(map(len, blocks), split):
+            out = bytearray(count * n)
+            end = 0
+            for i in range(count):
+                num = next(nums)
+                block = num.to_bytes((num.bit_length() + 7) // 8, config.BYTEORDER)
+                if i == count - 1:
+                    block = restore_last_block(block, last_size, n)
+                if len(block) > n:
+                    raise ValueError("Ciphertext has not been encrypted using this key")
+                end = i * n + len(block)
+                out[i * n : end] = block
+            del out[end:]
+            messages.append(out)
+        return messages
+
+    def decrypt(self, items: Sequence[Tuple[int, str]]) -> List[str]:
+        """Decrypt base64-encoded ciphertexts.
+
+        Args:
+            items: pairs of an index of the key in :code:`keys` and base64 encoded
+                   ciphertext encrypted using that key
+
+        Returns:
+            decrypted messages, in the same order as the items
+        """
+        return [
+            message.decode(config.ENCODING) for message in self.decrypt_bytes(items)
+        ]
@@ -0,0 +1,311 @@
+"""Benchmarks of key generation, primality testing, encryption and decryption.
+
+Benchmarks are parametrized by key size, i.e. size of the modulus in bits, so primes
+are half of that size, and benchmarks of base64 functions also by the size of the
+message in bytes. Functions that depend on randomness are run with seeded random
+number generator, so that every run does the same amount of work. Modular inverse
+benchmarks invert numbers modulo the modulus of the key, with :code:`batch_modinv`
+inverting :code:`BATCH_SIZE` of them at once. Batch decryption decrypts a ciphertext
+for each key of a family generated using the default exponents, so its duration
+should be compared to that many times the duration of :code:`decrypt`.
+
+Each benchmark is first run once to estimate its duration and then :code:`repeat`
+times, with each repetition calling it as many times as needed to take at least
+:code:`MIN_TIME` seconds. Durations of a single call are reported in seconds.
+
+Results can be compared against a baseline produced by an earlier run, in which case
+every benchmark whose median got slower by more than the tolerance is reported as a
+regression.
+
+Attributes:
+    KEY_SIZES (Tuple[int, ...]): default key sizes in bits
+    MESSAGE_SIZES (Tuple[int, ...]): default message sizes in bytes
+    MIN_TIME (float): minimal duration of a single repetition in seconds
+    SEED (int): seed of random number generator used by randomized benchmarks
+    BATCH_SIZE (int): number of values inverted by :code:`batch_modinv` benchmark
+    KEYGEN_BENCHMARKS (Tuple[str, ...]): names of key generation benchmarks
+    KEY_BENCHMARKS (Tuple[str, ...]): names of benchmarks using a generated key
+    MESSAGE_BENCHMARKS (Tuple[str, ...]): names of benchmarks using a generated key
+                                          which are also parametrized by message size
+    BENCHMARKS (Tuple[str, ...]): names of all the benchmarks
+
+Example:
+    .. code::
+
+        $ python -m rsa.bench --key-sizes 512,1024 --repeat 3 -o baseline.json
+        $ python -m rsa.bench --key-sizes 512,1024 --repeat 3 --baseline baseline.json
+"""
+import json
+import platform
+import random
+import statistics
+import time
+from math import gcd
+from typing import Any
+from typing import Callable
+from typing import Dict
+from typing import Iterable
+from typing import Iterator
+from typing import List
+from typing import Optional
+from typing import Tuple
+
+from .. import __version__
+from .. import config
+from ..batch import BatchDecryptor
+from ..batch import FAMILY_EXPONENTS
+from ..modular import batch_modinv
+from ..modular import lehmer_xgcd
+from ..modular import modinv
+from ..primes import find_prime
+from ..primes import is_prime
+from ..rsa import base64_decrypt
+from ..rsa import base64_encrypt
+from ..rsa import decrypt
+from ..rsa import encrypt
+from ..rsa import initialize
+from ..rsa import initialize_family
+from ..utils import crt_params
+from ..utils import encode_key
+from ..utils import encode_private_key
+from ..utils import xgcd
+
+KEY_SIZES = (512, 1024, 2048, 4096)
+MESSAGE_SIZES = (1 << 10, 1 << 16)
+MIN_TIME = 0.05
+SEED = 0
+BATCH_SIZE = 64
+
+KEYGEN_BENCHMARKS = ("find_prime", "initialize")
+KEY_BENCHMARKS = (
+    "is_prime",
+    "encrypt",
+    "decrypt",
+    "xgcd",
+    "lehmer_xgcd",
+    "modinv",
+    "batch_modinv",
+    "batch_decrypt",
+)
+MESSAGE_BENCHMARKS = (
+    "base64_encrypt",
+    "base64_decrypt",
+    "hybrid_encrypt",
+    "hybrid_decrypt",
+)
+BENCHMARKS = KEYGEN_BENCHMARKS + KEY_BENCHMARKS + MESSAGE_BENCHMARKS
+
+Benchmark = Tuple[str, Dict[str, int], Callable[[], Any]]
+
+
+def seeded(function: Callable[[], Any]) -> Callable[[], Any]:
+    """Makes function reseed the random number generator before each call."""
+
+    def wrapper() -> Any:
+        random.seed(SEED)
+        return function()
+
+    return wrapper
+
+
+def benchmarks(
+    key_sizes: Iterable[int] = KEY_SIZES,
+    message_sizes: Iterable[int] = MESSAGE_SIZES,
+    only: Iterable[str] = BENCHMARKS,
+) -> Iterator[Benchmark]:
+    """Creates benchmarks, generating keys needed by them only when required.
+
+    Args:
+        key_sizes: sizes of the modulus in bits
+        message_sizes: sizes of messages for base64 functions in bytes
+        only: names of benchmarks to create
+
+    Raises:
+        ValueError: if any of the names isn't a name of a benchmark
+
+    Returns:
+        iterator over name, parameters and function of every benchmark
+    """
+    only = set(only)
+    unknown = only.difference(BENCHMARKS)
+    if unknown:
+        raise ValueError(f"Unknown benchmarks: {', '.join(sorted(unknown))}")
+    message_sizes = list(message_sizes)
+
+    for key_bits in key_sizes:
+        num_bits = key_bits // 2
+        params = {"key_bits": key_bits}
+
+        if "find_prime" in only:
+            yield "find_prime", params, seeded(lambda: find_prime(num_bits))
+        if "initialize" in only:
+            yield "initialize", params, seeded(lambda: initialize(num_bits))
+        if only.isdisjoint(KEY_BENCHMARKS + MESSAGE_BENCHMARKS):
+            continue
+
+        random.seed(SEED)
+        p, q, n, e, d, _ = initialize(num_bits)
+        crt = (p, q, *crt_params(p, q, d))
+        public_key, private_key = encode_key(n, e), encode_private_key(n, d, *crt)
+
+        if "is_prime" in only:
+            yield "is_prime", params, seeded(lambda: is_prime(p))
+
+        block = b"a" * ((n.bit_length() + 7) // 8 - 1)
+        ciphertext = encrypt(block, n, e)
+        if "encrypt" in only:
+            yield "encrypt", params, lambda: encrypt(block, n, e)
+        if "decrypt" in only:
+            yield "decrypt", params, lambda: decrypt(ciphertext, n, d, crt)
+
+        values = [random.randrange(2, n) for _ in range(BATCH_SIZE)]
+        values = [value for value in values if gcd(value, n) == 1]
+        if "xgcd" in only:
+            yield "xgcd", params, lambda: xgcd(values[0], n)
+        if "lehmer_xgcd" in only:
+            yield "lehmer_xgcd", params, lambda: lehmer_xgcd(values[0], n)
+        if "modinv" in only:
+            yield "modinv", params, lambda: modinv(values[0], n)
+        if "batch_modinv" in only:
+            batch_params = {"key_bits": key_bits, "batch_size": len(values)}
+            yield "batch_modinv", batch_params, lambda: batch_modinv(values, n)
+        if "batch_decrypt" in only:
+            random.seed(SEED)
+            *primes, modulus, exponents, private_exponents, _ = initialize_family(
+                num_bits
+            )
+            decryptor = BatchDecryptor.from_primes(primes, private_exponents)
+            num = int.from_bytes(block, config.BYTEORDER)
+            items = [(i, pow(num, e, modulus)) for i, e in enumerate(exponents)]
+            batch_params = {"key_bits": key_bits, "batch_size": len(FAMILY_EXPONENTS)}
+            yield "batch_decrypt", batch_params, lambda: decryptor.decrypt_ints(items)
+
+        for message_size in message_sizes:
+            message_params = {"key_bits": key_bits, "message_size": message_size}
+            message = "a" * message_size
+            encrypted = base64_encrypt(message, public_key)
+            if "base64_encrypt" in only:
+                yield "base64_encrypt", message_params, lambda: base64_encrypt(
+                    message, public_key
+                )
+            if "base64_decrypt" in only:
+                yield "base64_decrypt", message_params, lambda: base64_decrypt(
+                    encrypted, private_key
+                )
+            envelope = base64_encrypt(message, public_key, hybrid=True)
+            if "hybrid_encrypt" in only:
+                yield "hybrid_encrypt", message_params, lambda: base64_encrypt(
+                    message, public_key, hybrid=True
+                )
+            if "hybrid_decrypt" in only:
+                yield "hybrid_decrypt", message_params, lambda: base64_decrypt(
+                    envelope, private_key
+                )
+
+
+def measure(function: Callable[[], Any], repeat: int) -> Dict[str, Any]:
+    """Measures duration of a single call of a function.
+
+    Args:
+        function: function to be measured
+        repeat: number of repetitions
+
+    Returns:
+        minimal and median duration in seconds, number of repetitions and number of
+        calls per repetition
+    """
+    start = time.perf_counter()
+    function()
+    number = max(1, int(MIN_TIME / max(time.perf_counter() - start, 1e-9)))
+
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            function()
+        timings.append((time.perf_counter() - start) / number)
+
+    return {
+        "min": min(timings),
+        "median": statistics.median(timings),
+        "repeat": repeat,
+        "number": number,
+    }
+
+
+def run(
+    key_sizes: Iterable[int] = KEY_SIZES,
+    message_sizes: Iterable[int] = MESSAGE_SIZES,
+    only: Iterable[str] = BENCHMARKS,
+    repeat: int = 5,
+) -> Dict[str, Any]:
+    """Runs the benchmarks.
+
+    Args:
+        key_sizes: sizes of the modulus in bits
+        message_sizes: sizes of messages for base64 functions in bytes
+        only: names of benchmarks to run
+        repeat: number of repetitions of each benchmark
+
+    Returns:
+        JSON-serializable report containing information about the environment and
+        results of all the benchmarks
+    """
+    results = [
+        {"name": name, "params": params, **measure(function, repeat)}
+        for name, params, function in benchmarks(key_sizes, message_sizes, only)
+    ]
+    return {
+        "meta": {
+            "rsa_version": __version__,
+            "python": platform.python_version(),
+            "implementation": platform.python_implementation(),
+            "machine": platform.machine(),
+            "byteorder": config.BYTEORDER,
+            "encoding": config.ENCODING,
+        },
+        "results": results,
+    }
+
+
+def _result_id(result: Dict[str, Any]) -> str:
+    return result["name"] + json.dumps(result["params"], sort_keys=True)
+
+
+def compare(
+    report: Dict[str, Any], baseline: Dict[str, Any], tolerance: float = 0.2
+) -> List[Dict[str, Any]]:
+    """Finds benchmarks that got slower compared to a baseline.
+
+    Only benchmarks present in both reports are compared.
+
+    Args:
+        report: report produced by :func:`run`
+        baseline: report to compare against
+        tolerance: relative slowdown of the median which is not considered to be a
+                   regression
+
+    Returns:
+        list of regressions, each containing name and parameters of the benchmark,
+        medians from both reports and their ratio
+    """
+    baseline_results = {_result_id(result): result for result in baseline["results"]}
+    regressions = []
+
+    for result in report["results"]:
+        previous: Optional[Dict[str, Any]] = baseline_results.get(_result_id(result))
+        if previous is None:
+            continue
+        ratio = result["median"] / previous["median"]
+        if ratio > 1 + tolerance:
+            regressions.append(
+                {
+                    "name": result["name"],
+                    "params": result["params"],
+                    "baseline": previous["median"],
+                    "median": result["median"],
+                    "ratio": ratio,
+                }
+            )
+
+    return regressions
@@ -0,0 +1,99 @@
+"""Benchmark CLI.
+
+Runs the benchmarks and writes JSON report to stdout or a file. If a baseline report
+is provided, regressions are added to the report and the exit status is 1 if there
+are any.
+"""
+import argparse
+import json
+import sys
+from typing import List
+from typing import Optional
+
+from . import BENCHMARKS
+from . import compare
+from . import KEY_SIZES
+from . import MESSAGE_SIZES
+from . import run
+
+
+def _sizes(value: str) -> List[int]:
+    return [int(size) for size in value.split(",")]
+
+
+def _names(value: str) -> List[str]:
+    names = value.split(",")
+    unknown = [name for name in names if name not in BENCHMARKS]
+    if unknown:
+        raise argparse.ArgumentTypeError(f"unknown benchmarks: {', '.join(unknown)}")
+    return names
+
+
+def get_parser() -> argparse.ArgumentParser:
+    """
+
+    Returns:
+        an instance of argument parser
+    """
+    parser = argparse.ArgumentParser(prog="python -m rsa.bench")
+    parser.add_argument(
+        "--key-sizes",
+        type=_sizes,
+        default=list(KEY_SIZES),
+        help="Comma-separated sizes of the modulus in bits",
+    )
+    parser.add_argument(
+        "--message-sizes",
+        type=_sizes,
+        default=list(MESSAGE_SIZES),
+        help="Comma-separated sizes of messages in bytes",
+    )
+    parser.add_argument(
+        "--only",
+        type=_names,
+        default=list(BENCHMARKS),
+        help=f"Comma-separated names of benchmarks to run, any of {', '.join(BENCHMARKS)}",
+    )
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--baseline", type=str, help="Report to compare against")
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.2,
+        help="Relative slowdown not considered a regression. Defaults to 0.2",
+    )
+    parser.add_argument(
+        "-o",
+        "--output",
+        type=str,
+        default="",
+        help="Where to write the report. Defaults to stdout",
+    )
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Runs the benchmarks as specified by the args.
+
+    Returns:
+        1 if there are regressions compared to the baseline, 0 otherwise
+    """
+    args = get_parser().parse_args(argv)
+
+    report = run(args.key_sizes, args.message_sizes, args.only, args.repeat)
+    if args.baseline:
+        with open(args.baseline) as f:
+            report["regressions"] = compare(report, json.load(f), args.tolerance)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+
+    return 1 if report.get("regressions") else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,351 @@
+"""Compact binary ciphertext format.
+
+Unlike base64 ciphertext, whose blocks have variable length and are separated by
+dots, binary ciphertext consists of a header followed by blocks that all have the
+size of the modulus in bytes. The header has the following layout, with all
+integers being little-endian:
+
+    ======  =====  ==========================================================
+    Offset  Size   Field
+    ======  =====  ==========================================================
+    0       4      magic bytes :code:`RSAB`
+    4       1      format version
+    5       8      fingerprint of the key, see :func:`rsa.utils.fingerprint`
+    13      4      size of a ciphertext block in bytes
+    17      8      number of blocks
+    25      4      number of plaintext bytes in the final block
+    ======  =====  ==========================================================
+
+Every block except the final one holds :code:`block_size - 1` bytes of plaintext.
+Since sizes of all the blocks are known, any of them can be located without reading
+the ones preceding it, and since the length of the final block is stored, plaintext
+is restored exactly, including any trailing zero bytes. This allows decrypting an
+arbitrary range of plaintext by decrypting only the blocks covering it, see
+:func:`decrypt_range` and :func:`decrypt_file_range`. Whole files are encrypted and
+decrypted block by block using :func:`encrypt_file` and :func:`decrypt_file`.
+
+Example:
+    >>> from rsa import decrypt_from_binary, encrypt_to_binary, keygen
+    >>> public, private = keygen(512)
+    >>> ciphertext = encrypt_to_binary(b"Hello world!", public)
+    >>> len(ciphertext)
+    157
+    >>> print(decrypt_from_binary(ciphertext, private).decode())
+    Hello world!
+"""
+import mmap
+import os
+import struct
+from typing import Iterator
+from typing import NamedTuple
+from typing import Optional
+from typing import Union
+
+from . import config
+from .keys import load_private_key
+from .keys import load_public_key
+from .keys import PrivateKey
+from .keys import PublicKey
+
+MAGIC = b"RSAB"
+VERSION = 1
+HEADER = struct.Struct("<4sB8sIQI")
+
+Buffer = Union[bytes, bytearray, memoryview, mmap.mmap]
+
+
+class BinaryHeader(NamedTuple):
+    """Header of binary ciphertext."""
+
+    fingerprint: bytes
+    block_size: int
+    block_count: int
+    final_block_size: int
+
+    @property
+    def chunk_size(self) -> int:
+        """Number of plaintext bytes held by every block except the final one."""
+        return self.block_size - 1
+
+    @property
+    def plaintext_size(self) -> int:
+        """Size of the whole plaintext in bytes."""
+        if self.block_count == 0:
+            return 0
+        return (self.block_count - 1) * self.chunk_size + self.final_block_size
+
+    @property
+    def size(self) -> int:
+        """Size of the whole binary ciphertext in bytes."""
+        return HEADER.size + self.block_count * self.block_size
+
+
+def read_header(data: Buffer) -> BinaryHeader:
+    """Parses and validates the header of binary ciphertext.
+
+    Args:
+        data: binary ciphertext, or at least its first :code:`HEADER.size` bytes
+
+    Raises:
+        ValueError: if the data doesn't start with a valid header
+
+    Returns:
+        parsed header
+    """
+    if len(data) < HEADER.size:
+        raise ValueError("Binary ciphertext is too short to contain a header")
+
+    magic, version, *fields = HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise ValueError("Data is not a binary ciphertext")
+    if version != VERSION:
+        raise ValueError(f"Unsupported binary ciphertext version {version}")
+
+    return BinaryHeader(*fields)
+
+
+def _header(size: int, key: PublicKey) -> BinaryHeader:
+    """Creates header of binary ciphertext of plaintext with given size."""
+    block_count = -(-size // key.chunk_size)
+    final_block_size = size - (block_count - 1) * key.chunk_size if block_count else 0
+    return BinaryHeader(key.fingerprint, key.num_bytes, block_count, final_block_size)
+
+
+def _encrypt_blocks(view: memoryview, key: PublicKey) -> Iterator[bytes]:
+    """Encrypts data block by block, padding each block to the size of the modulus."""
+    chunk_size, block_size = key.chunk_size, key.num_bytes
+    for i in range(0, len(view), chunk_size):
+        num = key.encrypt_int(
+            int.from_bytes(view[i : i + chunk_size], config.BYTEORDER)
+        )
+        yield num.to_bytes(block_size, config.BYTEORDER)
+
+
+def encrypt_to_binary(data: Buffer, key: Union[str, PublicKey]) -> bytearray:
+    """Encrypts data into binary ciphertext.
+
+    The data is sliced without copying and the ciphertext is written into a
+    preallocated buffer.
+
+    Args:
+        data: data to be encrypted
+        key: public key object or base64 encoded key
+
+    Returns:
+        binary ciphertext
+    """
+    if isinstance(key, str):
+        key = load_public_key(key)
+
+    with memoryview(data) as raw, raw.cast("B") as view:
+        header = _header(len(view), key)
+        out = bytearray(header.size)
+        HEADER.pack_into(out, 0, MAGIC, VERSION, *header)
+
+        offset = HEADER.size
+        for block in _encrypt_blocks(view, key):
+            out[offset : offset + header.block_size] = block
+            offset += header.block_size
+
+    return out
+
+
+def encrypt_file(source: str, destination: str, key: Union[str, PublicKey]) -> None:
+    """Encrypts a file into binary ciphertext file.
+
+    The source file is memory-mapped and the ciphertext is written block by block,
+    so neither of the files is ever loaded into memory as a whole.
+
+    Args:
+        source: path of the file to be encrypted
+        destination: path of the file to write the ciphertext to
+        key: public key object or base64 encoded key
+    """
+    if isinstance(key, str):
+        key = load_public_key(key)
+
+    with open(source, "rb") as src, open(destination, "wb") as dest:
+        size = os.fstat(src.fileno()).st_size
+        dest.write(HEADER.pack(MAGIC, VERSION, *_header(size, key)))
+        if size == 0:
+            return
+        with mmap.mmap(src.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            with memoryview(mapped) as view:
+                for block in _encrypt_blocks(view, key):
+                    dest.write(block)
+
+
+def _decrypt_blocks(
+    view: memoryview, key: PrivateKey, header: BinaryHeader, start: int, stop: int
+) -> Iterator[bytes]:
+    """Decrypts blocks one by one, trimming each to its size of plaintext."""
+    chunk_size, block_size = header.chunk_size, header.block_size
+    for index in range(start, stop):
+        offset = HEADER.size + index * block_size
+        num = key.decrypt_int(
+            int.from_bytes(view[offset : offset + block_size], config.BYTEORDER)
+        )
+        last = index == header.block_count - 1
+        size = header.final_block_size if last else chunk_size
+        if (num.bit_length() + 7) // 8 > size:
+            raise ValueError("Binary ciphertext is corrupted")
+        yield num.to_bytes(size, config.BYTEORDER)
+
+
+def decrypt_blocks(
+    data: Buffer, key: PrivateKey, header: BinaryHeader, start: int, stop: int
+) -> bytearray:
+    """Decrypts a range of blocks of binary ciphertext.
+
+    Args:
+        data: binary ciphertext
+        key: private key object
+        header: header of the ciphertext
+        start: index of the first block to be decrypted
+        stop: index of the block after the last one to be decrypted
+
+    Raises:
+        ValueError: if any of the blocks doesn't decrypt into the plaintext size
+                    stored in the header
+
+    Returns:
+        plaintext held by the blocks
+    """
+    out = bytearray()
+    with memoryview(data) as raw, raw.cast("B") as view:
+        for block in _decrypt_blocks(view, key, header, start, stop):
+            out += block
+    return out
+
+
+def _validate(data: Buffer, key: PrivateKey) -> BinaryHeader:
+    """Reads the header and checks it against the key and the size of the data."""
+    header = read_header(data)
+    if header.fingerprint != key.fingerprint:
+        raise ValueError("Ciphertext was encrypted using a different key")
+    if header.block_size != key.num_bytes or len(data) != header.size:
+        raise ValueError("Binary ciphertext is corrupted")
+    return header
+
+
+def decrypt_from_binary(data: Buffer, key: Union[str, PrivateKey]) -> bytearray:
+    """Decrypts binary ciphertext.
+
+    Args:
+        data: binary ciphertext
+        key: private key object or base64 encoded private key
+
+    Raises:
+        ValueError: if the ciphertext is malformed or was encrypted using another key
+
+    Returns:
+        decrypted data
+    """
+    return decrypt_range(data, key)
+
+
+def decrypt_range(
+    data: Buffer,
+    key: Union[str, PrivateKey],
+    start: Optional[int] = None,
+    stop: Optional[int] = None,
+) -> bytearray:
+    """Decrypts a range of bytes of plaintext from binary ciphertext.
+
+    Only the blocks covering the range are decrypted. The range is interpreted the
+    same way as a slice :code:`plaintext[start:stop]` would be.
+
+    Args:
+        data: binary ciphertext
+        key: private key object or base64 encoded private key
+        start: index of the first byte of plaintext to be decrypted
+        stop: index of the byte after the last one to be decrypted
+
+    Raises:
+        ValueError: if the ciphertext is malformed or was encrypted using another key
+
+    Returns:
+        decrypted range of plaintext
+    """
+    if isinstance(key, str):
+        key = load_private_key(key)
+
+    header = _validate(data, key)
+    start, stop, _ = slice(start, stop).indices(header.plaintext_size)
+    if start >= stop:
+        return bytearray()
+
+    first, last = start // header.chunk_size, (stop - 1) // header.chunk_size
+    out = decrypt_blocks(data, key, header, first, last + 1)
+    offset = first * header.chunk_size
+    del out[stop - offset :]
+    del out[: start - offset]
+    return out
+
+
+def decrypt_file(source: str, destination: str, key: Union[str, PrivateKey]) -> None:
+    """Decrypts binary ciphertext file.
+
+    The ciphertext file is memory-mapped and the plaintext is written block by block,
+    so neither of the files is ever loaded into memory as a whole. The header is
+    validated before anything is written and the plaintext is written to a temporary
+    file that replaces the destination only once all the blocks have been decrypted,
+    so the destination is left untouched if the ciphertext turns out to be invalid.
+
+    Args:
+        source: path of the ciphertext file
+        destination: path of the file to write the plaintext to
+        key: private key object or base64 encoded private key
+
+    Raises:
+        ValueError: if the ciphertext is malformed or was encrypted using another key
+    """
+    if isinstance(key, str):
+        key = load_private_key(key)
+
+    with open(source, "rb") as src:
+        if os.fstat(src.fileno()).st_size == 0:
+            raise ValueError("Binary ciphertext is too short to contain a header")
+        with mmap.mmap(src.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            header = _validate(mapped, key)
+            tmp = f"{destination}.{os.getpid()}.tmp"
+            try:
+                with open(tmp, "wb") as dest, memoryview(mapped) as view:
+                    blocks = _decrypt_blocks(view, key, header, 0, header.block_count)
+                    for block in blocks:
+                        dest.write(block)
+                os.replace(tmp, destination)
+            except BaseException:
+                if os.path.exists(tmp):
+                    os.remove(tmp)
+                raise
+
+
+def decrypt_file_range(
+    path: str,
+    key: Union[str, PrivateKey],
+    start: Optional[int] = None,
+    stop: Optional[int] = None,
+) -> bytearray:
+    """Decrypts a range of bytes of plaintext from binary ciphertext file.
+
+    The file is memory-mapped, so only the header and the blocks covering the range
+    are read from it.
+
+    Args:
+        path: path of the ciphertext file
+        key: private key object or base64 encoded private key
+        start: index of the first byte of plaintext to be decrypted
+        stop: index of the byte after the last one to be decrypted
+
+    Raises:
+        ValueError: if the ciphertext is malformed or was encrypted using another key
+
+    Returns:
+        decrypted range of plaintext
+    """
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            raise ValueError("Binary ciphertext is too short to contain a header")
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            return decrypt_range(mapped, key, start, stop)
@@ -7,7 +7,11 @@ Examples:
 
         $ python -m rsa keygen -o private,public 1024
 
-    The command above writes private and public key to corresponding files.
+    The command above writes private and public key to corresponding files. For big
+    keys primes can be searched for using multiple processes by adding
+    :code:`-w <number of processes>` after :code:`keygen`. Multi-prime keys, whose
+    modulus is a product of more than two primes, are generated using
+    :code:`-p <number of primes>`.
 
     .. code::
 
@@ -22,17 +26,77 @@ Examples:
         $ python -m rsa decrypt $(cat ciphertext) $(cat private)
         Hello
 
+    Messages and ciphertexts which are too big to be passed as arguments can be read
+    from a file or standard input and written to a file or standard output, with
+    :code:`-` standing for standard input/output. They are processed in blocks of
+    :code:`BUFFER_SIZE` bytes, so memory usage doesn't depend on their size. Files
+    are encrypted as raw bytes, so arbitrary binary files survive the round trip,
+    while messages passed as arguments are encoded the same way as by
+    :func:`rsa.base64_encrypt`.
+
+    .. code::
+
+        $ python -m rsa encrypt --in archive.tar --out - $(cat public) \\
+            | python -m rsa decrypt --in - --out copy.tar $(cat private)
+
+    Big messages and files are encrypted much faster using :code:`--hybrid`, which
+    encrypts them into base64-encoded envelope using a single RSA operation, see
+    :mod:`rsa.envelope`. Envelopes are recognized by :code:`decrypt` without any
+    additional options.
+
+    .. code::
+
+        $ python -m rsa encrypt --hybrid --in archive.tar --out archive.rsa $(cat public)
+        $ python -m rsa decrypt --in archive.rsa --out copy.tar $(cat private)
+
+    Files can also be encrypted into compact binary format using :code:`--binary`.
+    Any range of bytes of such file can be decrypted without decrypting the rest of
+    it. The command bellow prints 100 bytes of plaintext starting from offset 5000.
+
+    .. code::
+
+        $ python -m rsa encrypt --binary --in archive.tar --out archive.rsa $(cat public)
+        $ python -m rsa decrypt-range --start 5000 --length 100 archive.rsa $(cat private)
+
+    The same message can be encrypted using many keys at once, with keys given as
+    arguments or read from a file containing one key per line. The result is a JSON
+    object mapping fingerprints of the keys to the ciphertexts.
+
+    .. code::
+
+        $ python -m rsa encrypt-many --keys-file recipients "Hello" $(cat public)
+
 """
 import argparse
+import base64
+import io
+import json
+import sys
+from contextlib import contextmanager
+from typing import BinaryIO
 from typing import Callable
 from typing import Dict
+from typing import Iterator
 from typing import List
 from typing import Optional
 from typing import Union
 
+from . import config
+from .binary import decrypt_file
+from .binary import decrypt_file_range
+from .binary import encrypt_file
+from .envelope import EnvelopeDecryptor
+from .envelope import EnvelopeEncryptor
+from .envelope import MAGIC
+from .envelope import VERSION
 from .rsa import base64_decrypt
 from .rsa import base64_encrypt
+from .rsa import encrypt_many
 from .rsa import keygen
+from .stream import Decryptor
+from .stream import Encryptor
+
+BUFFER_SIZE = 1 << 16
 
 ACTIONS: Dict[str, Union[Callable]] = {
     "keygen": keygen,
@@ -40,6 +104,19 @@ ACTIONS: Dict[str, Union[Callable]] = {
     "decrypt": base64_decrypt,
 }
 
+STREAM_ACTIONS: Dict[str, Union[Callable]] = {
+    "encrypt": Encryptor,
+    "decrypt": Decryptor,
+}
+
+HYBRID_STREAM_ACTIONS: Dict[str, Union[Callable]] = {
+    "encrypt": EnvelopeEncryptor,
+    "decrypt": EnvelopeDecryptor,
+}
+
+# base64 encoding of the first 36 bits of an envelope, which are always the same
+ENVELOPE_PREFIX = base64.urlsafe_b64encode(MAGIC + bytes([VERSION]) + b"\0")[:6]
+
 
 def get_parser() -> argparse.ArgumentParser:
     """
@@ -55,15 +132,85 @@ def get_parser() -> argparse.ArgumentParser:
     keygen_parser = subparsers.add_parser("keygen")
     encrypt_parser = subparsers.add_parser("encrypt")
     decrypt_parser = subparsers.add_parser("decrypt")
+    decrypt_range_parser = subparsers.add_parser("decrypt-range")
+    encrypt_many_parser = subparsers.add_parser("encrypt-many")
 
     keygen_parser.add_argument("num_bits", type=int)
+    keygen_parser.add_argument(
+        "-w",
+        "--workers",
+        type=int,
+        default=1,
+        help="Number of processes searching for primes. Defaults to 1",
+    )
+    keygen_parser.add_argument(
+        "-p",
+        "--primes",
+        dest="num_primes",
+        type=int,
+        default=2,
+        help="Number of primes making up the modulus. Defaults to 2",
+    )
 
-    encrypt_parser.add_argument("message", type=str)
+    encrypt_parser.add_argument("message", type=str, nargs="?")
     encrypt_parser.add_argument("key", type=str)
+    encrypt_parser.add_argument(
+        "--hybrid",
+        action="store_true",
+        help="Encrypt into an envelope using a single RSA operation, which is much "
+        "faster for big inputs",
+    )
 
-    decrypt_parser.add_argument("ciphertext", type=str)
+    decrypt_parser.add_argument("ciphertext", type=str, nargs="?")
     decrypt_parser.add_argument("key", type=str)
 
+    for subparser in (encrypt_parser, decrypt_parser):
+        subparser.add_argument(
+            "--in",
+            dest="input",
+            type=str,
+            help="File to read the input from instead of the argument, - for stdin",
+        )
+        subparser.add_argument(
+            "--out",
+            type=str,
+            help="File to stream the result to, - for stdout",
+        )
+        subparser.add_argument(
+            "--binary",
+            action="store_true",
+            help="Use binary ciphertext format, requires --in and --out to be files",
+        )
+
+    decrypt_range_parser.add_argument("file", type=str)
+    decrypt_range_parser.add_argument("key", type=str)
+    decrypt_range_parser.add_argument(
+        "--start",
+        type=int,
+        default=0,
+        help="Index of the first byte of plaintext to decrypt. Defaults to 0",
+    )
+    decrypt_range_parser.add_argument(
+        "--length",
+        type=int,
+        help="Number of bytes of plaintext to decrypt. Defaults to all the rest",
+    )
+
+    encrypt_many_parser.add_argument("message", type=str)
+    encrypt_many_parser.add_argument("keys", type=str, nargs="*")
+    encrypt_many_parser.add_argument(
+        "--keys-file",
+        type=str,
+        help="File to read additional keys from, one per line, - for stdin",
+    )
+    encrypt_many_parser.add_argument(
+        "-w",
+        "--workers",
+        type=int,
+        default=1,
+        help="Number of processes encrypting for batches of keys. Defaults to 1",
+    )
+
     parser.add_argument(
         "-o",
         "--output",
@@ -75,6 +222,100 @@ def get_parser() -> argparse.ArgumentParser:
     return parser
 
 
+class Base64Envelope:
+    """Base64-encodes output of envelope encryptor or decodes input of decryptor.
+
+    Args:
+        processor: either :class:`rsa.envelope.EnvelopeEncryptor` or
+                   :class:`rsa.envelope.EnvelopeDecryptor`
+    """
+
+    def __init__(self, processor: Union[EnvelopeEncryptor, EnvelopeDecryptor]) -> None:
+        self.processor = processor
+        self._encode = isinstance(processor, EnvelopeEncryptor)
+        self._buffer = bytearray()
+
+    def update(self, data: bytes) -> bytes:
+        """Feed the next part of the input to the processor.
+
+        Args:
+            data: next part of the message or of base64-encoded envelope
+
+        Returns:
+            next part of base64-encoded envelope or of the message
+        """
+        if self._encode:
+            self._buffer += self.processor.update(data)
+            end = len(self._buffer) - len(self._buffer) % 3
+            out = base64.urlsafe_b64encode(self._buffer[:end])
+        else:
+            self._buffer += data.translate(None, b" \t\r\n")
+            end = len(self._buffer) - len(self._buffer) % 4
+            out = self.processor.update(base64.urlsafe_b64decode(self._buffer[:end]))
+        del self._buffer[:end]
+        return out
+
+    def finalize(self) -> bytes:
+        """Process the rest of the input.
+
+        Returns:
+            the rest of base64-encoded envelope or of the message
+        """
+        if self._encode:
+            return base64.urlsafe_b64encode(self._buffer + self.processor.finalize())
+        out = self.processor.update(base64.urlsafe_b64decode(self._buffer))
+        return out + self.processor.finalize()
+
+
+@contextmanager
+def open_binary(path: str, mode: str) -> Iterator[BinaryIO]:
+    """Opens a file in binary mode, with :code:`-` standing for stdin/stdout.
+
+    Args:
+        path: path to the file or :code:`-`
+        mode: either :code:`rb` or :code:`wb`
+
+    Returns:
+        context manager yielding binary file object
+    """
+    if path != "-":
+        with open(path, mode) as f:
+            yield f  # type: ignore
+    elif mode == "rb":
+        yield sys.stdin.buffer
+    else:
+        yield sys.stdout.buffer
+        sys.stdout.buffer.flush()
+
+
+def stream(
+    command: str, key: str, source: BinaryIO, output: str, hybrid: bool = False
+) -> None:
+    """Encrypts or decrypts input block by block writing the results as they come.
+
+    Args:
+        command: either :code:`encrypt` or :code:`decrypt`
+        key: base64 encoded key
+        source: binary file object to read the input from
+        output: path of the file to write the results to or :code:`-` for stdout
+        hybrid: whether to encrypt the input into an envelope, envelopes are
+                recognized when decrypting regardless of it
+    """
+    first = source.read(BUFFER_SIZE)
+    if command == "decrypt":
+        hybrid = first.startswith(ENVELOPE_PREFIX)
+    if hybrid:
+        processor = Base64Envelope(HYBRID_STREAM_ACTIONS[command](key))
+    else:
+        processor = STREAM_ACTIONS[command](key)
+
+    with open_binary(output, "wb") as dest:
+        dest.write(processor.update(first))
+        for block in iter(lambda: source.read(BUFFER_SIZE), b""):
+            dest.write(processor.update(block))
+        dest.write(processor.finalize())
+
+
 def main(argv: Optional[List[str]] = None) -> int:
     """Parses the args and executes the command invoked by them.
 
@@ -85,8 +326,67 @@ def main(argv: Optional[List[str]] = None) -> int:
     args = vars(parser.parse_args(argv))
 
     command = args.pop("command")
-    action = ACTIONS[command]
     output = args.pop("output")
+    input_path = args.pop("input", None)
+    out_path = args.pop("out", None)
+
+    if command == "decrypt-range":
+        length = args["length"]
+        stop = None if length is None else args["start"] + length
+        res = decrypt_file_range(args["file"], args["key"], args["start"], stop)
+        with open_binary(output or "-", "wb") as dest:
+            dest.write(res)
+        return 0
+
+    if command == "encrypt-many":
+        keys = args["keys"]
+        if args["keys_file"] is not None:
+            with open_binary(args["keys_file"], "rb") as source:
+                keys += source.read().decode().split()
+        if not keys:
+            print("Please provide at least one key.")
+            return 1
+        ciphertexts = encrypt_many(args["message"], keys, args["workers"])
+        result = json.dumps(ciphertexts, indent=2)
+        if output == "":
+            print(result)
+        else:
+            with open(output, "w") as f:
+                f.write(result)
+        return 0
+
+    hybrid = args.get("hybrid", False)
+    if args.pop("binary", False):
+        if hybrid:
+            print("Hybrid mode can't be combined with --binary.")
+            return 1
+        out_path = out_path or output
+        if input_path in (None, "-") or out_path in ("", "-"):
+            print("Binary mode requires --in and --out to be paths of files.")
+            return 1
+        if command == "encrypt":
+            encrypt_file(input_path, out_path, args["key"])
+        else:
+            decrypt_file(input_path, out_path, args["key"])
+        return 0
+
+    action = ACTIONS[command]
+
+    if command != "keygen":
+        text = args.get("message", args.get("ciphertext"))
+        if (text is None) == (input_path is None):
+            print("Please provide either the input as an argument or --in.")
+            return 1
+
+        if input_path is not None or out_path is not None:
+            out_path = out_path or output or "-"
+            if input_path is None:
+                data = (text or "").encode(config.ENCODING)
+                stream(command, args["key"], io.BytesIO(data), out_path, hybrid)
+            else:
+                with open_binary(input_path, "rb") as source:
+                    stream(command, args["key"], source, out_path, hybrid)
+            return 0
 
     res = action(**args)
 
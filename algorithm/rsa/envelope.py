@@ -0,0 +1,320 @@
+"""Hybrid encryption of big messages.
+
+Encrypting every :code:`chunk_size` bytes of a message using RSA makes encryption
+and especially decryption of big messages slow. Envelopes use RSA only once, to
+encapsulate a random secret from which symmetric keys are derived (`RSA-KEM
+<https://tools.ietf.org/html/rfc5990>`__), and encrypt the message using a keystream
+generated by SHAKE-256, which is authenticated using HMAC-SHA256. Only
+:mod:`hashlib` and :mod:`hmac` are needed, so no dependencies are required.
+
+An envelope consists of a header, the encapsulated secret and the encrypted
+message. The header has the following layout, with all integers being little-endian:
+
+    ======  =====  ==========================================================
+    Offset  Size   Field
+    ======  =====  ==========================================================
+    0       4      magic bytes :code:`RSAE`
+    4       1      format version
+    5       8      fingerprint of the key, see :func:`rsa.utils.fingerprint`
+    13      2      size of the encapsulated secret in bytes
+    ======  =====  ==========================================================
+
+The encapsulated secret is a random number smaller than the modulus encrypted using
+the public key. Keys of the keystream and the MAC are derived by hashing the header,
+the encapsulated secret and the secret itself, so any change of the header makes
+authentication fail. The message is split into chunks of :code:`CHUNK_SIZE` bytes,
+with the last one being shorter, possibly empty. Each chunk is XOR-ed with its own
+part of the keystream and followed by a :code:`TAG_SIZE` byte tag authenticating
+the chunk, its index and whether it's the last one, so chunks can't be reordered,
+nor can the envelope be truncated without being detected. Since every chunk is
+authenticated on its own, :class:`EnvelopeDecryptor` only outputs plaintext which
+has been authenticated.
+
+Attributes:
+    CHUNK_SIZE (int): number of message bytes authenticated by a single tag
+    TAG_SIZE (int): size of the tag of a chunk in bytes
+
+Example:
+    >>> from rsa import decrypt_envelope, encrypt_envelope, keygen
+    >>> public, private = keygen(512)
+    >>> envelope = encrypt_envelope(b"Hello world!", public)
+    >>> len(envelope)
+    171
+    >>> print(decrypt_envelope(envelope, private).decode())
+    Hello world!
+"""
+import hashlib
+import hmac
+import secrets
+import struct
+from typing import List
+from typing import Optional
+from typing import Union
+
+from .keys import load_private_key
+from .keys import load_public_key
+from .keys import PrivateKey
+from .keys import PublicKey
+
+MAGIC = b"RSAE"
+VERSION = 1
+HEADER = struct.Struct("<4sB8sH")
+INDEX = struct.Struct("<Q")
+KDF_LABEL = b"rsa envelope v1"
+
+CHUNK_SIZE = 1 << 16
+TAG_SIZE = 16
+
+Buffer = Union[bytes, bytearray, memoryview]
+
+
+class _Session:
+    """Symmetric keys of an envelope and the index of the next chunk."""
+
+    __slots__ = ("stream_key", "mac_key", "index")
+
+    def __init__(self, preamble: bytes, secret: int, num_bytes: int) -> None:
+        material = hashlib.shake_256(
+            KDF_LABEL + preamble + secret.to_bytes(num_bytes, "little")
+        ).digest(64)
+        self.stream_key = material[:32]
+        self.mac_key = material[32:]
+        self.index = 0
+
+    def _tag(self, chunk: Buffer, final: bool) -> bytes:
+        mac = hmac.new(self.mac_key, INDEX.pack(self.index), hashlib.sha256)
+        mac.update(b"\x01" if final else b"\x00")
+        mac.update(chunk)
+        return mac.digest()[:TAG_SIZE]
+
+    def _xor(self, chunk: Buffer) -> bytes:
+        keystream = hashlib.shake_256(self.stream_key + INDEX.pack(self.index))
+        mask = int.from_bytes(keystream.digest(len(chunk)), "little")
+        return (int.from_bytes(chunk, "little") ^ mask).to_bytes(len(chunk), "little")
+
+    def seal(self, chunk: Buffer, final: bool) -> bytes:
+        """Encrypt a chunk and append its tag."""
+        encrypted = self._xor(chunk)
+        tag = self._tag(encrypted, final)
+        self.index += 1
+        return encrypted + tag
+
+    def open(self, chunk: memoryview, final: bool) -> bytes:
+        """Check the tag of a chunk and decrypt it."""
+        encrypted, tag = chunk[:-TAG_SIZE], chunk[-TAG_SIZE:]
+        if not hmac.compare_digest(self._tag(encrypted, final), tag):
+            raise ValueError("Envelope is corrupted or was encrypted using another key")
+        decrypted = self._xor(encrypted)
+        self.index += 1
+        return decrypted
+
+
+class EnvelopeEncryptor:
+    """Incrementally encrypts a message into an envelope.
+
+    The interface is the same as that of :class:`rsa.stream.Encryptor`, but the
+    output is binary envelope instead of base64 text.
+
+    Args:
+        key: public key object or base64 encoded key
+    """
+
+    def __init__(self, key: Union[str, PublicKey]) -> None:
+        self.key = load_public_key(key) if isinstance(key, str) else key
+        secret = secrets.randbelow(self.key.n - 2) + 2
+        encapsulated = self.key.encrypt_int(secret).to_bytes(
+            self.key.num_bytes, "little"
+        )
+        header = HEADER.pack(MAGIC, VERSION, self.key.fingerprint, len(encapsulated))
+        self._pending = header + encapsulated
+        self._session = _Session(self._pending, secret, self.key.num_bytes)
+        self._buffer = bytearray()
+        self._finalized = False
+
+    def _flush(self, chunks: List[bytes]) -> bytes:
+        """Join chunks prepending the header if it hasn't been output yet."""
+        out = b"".join([self._pending, *chunks])
+        self._pending = b""
+        return out
+
+    def update(self, data: Buffer) -> bytes:
+        """Feed the next part of the message to the encryptor.
+
+        Args:
+            data: next part of the message
+
+        Raises:
+            ValueError: if the encryptor has already been finalized
+
+        Returns:
+            envelope header, if it hasn't been output yet, followed by all the chunks
+            completed by the data
+        """
+        if self._finalized:
+            raise ValueError("Encryptor has already been finalized")
+
+        self._buffer += data
+        # the last chunk is kept even if it's complete, since it needs to be marked
+        end = max(len(self._buffer) - 1, 0) // CHUNK_SIZE * CHUNK_SIZE
+        with memoryview(self._buffer) as view:
+            chunks = [
+                self._session.seal(view[i : i + CHUNK_SIZE], False)
+                for i in range(0, end, CHUNK_SIZE)
+            ]
+        del self._buffer[:end]
+        return self._flush(chunks)
+
+    def finalize(self) -> bytes:
+        """Encrypt the last chunk.
+
+        Raises:
+            ValueError: if the encryptor has already been finalized
+
+        Returns:
+            the last chunk, preceded by the header if it hasn't been output yet
+        """
+        if self._finalized:
+            raise ValueError("Encryptor has already been finalized")
+
+        self._finalized = True
+        out = self._flush([self._session.seal(self._buffer, True)])
+        self._buffer.clear()
+        return out
+
+
+class EnvelopeDecryptor:
+    """Incrementally decrypts an envelope.
+
+    Chunks are output only after they have been authenticated, but the envelope
+    is known to be complete only once :meth:`finalize` succeeds.
+
+    Args:
+        key: private key object or base64 encoded private key
+    """
+
+    def __init__(self, key: Union[str, PrivateKey]) -> None:
+        self.key = load_private_key(key) if isinstance(key, str) else key
+        self._session: Optional[_Session] = None
+        self._buffer = bytearray()
+        self._finalized = False
+
+    def _open_session(self) -> Optional[_Session]:
+        """Decapsulate the secret once the whole header has been received."""
+        if len(self._buffer) < HEADER.size:
+            return None
+        magic, version, fingerprint, size = HEADER.unpack_from(self._buffer)
+        if magic != MAGIC:
+            raise ValueError("Data is not an envelope")
+        if version != VERSION:
+            raise ValueError(f"Unsupported envelope version {version}")
+        if fingerprint != self.key.fingerprint or size != self.key.num_bytes:
+            raise ValueError("Envelope was encrypted using a different key")
+
+        end = HEADER.size + size
+        if len(self._buffer) < end:
+            return None
+        encapsulated = int.from_bytes(self._buffer[HEADER.size : end], "little")
+        if encapsulated >= self.key.n:
+            raise ValueError("Envelope is corrupted")
+        secret = self.key.decrypt_int(encapsulated)
+        self._session = _Session(bytes(self._buffer[:end]), secret, size)
+        del self._buffer[:end]
+        return self._session
+
+    def update(self, data: Buffer) -> bytes:
+        """Feed the next part of the envelope to the decryptor.
+
+        Args:
+            data: next part of the envelope
+
+        Raises:
+            ValueError: if the decryptor has already been finalized, or the envelope
+                        is malformed or was encrypted using another key
+
+        Returns:
+            decrypted bytes of all the chunks completed by the data
+        """
+        if self._finalized:
+            raise ValueError("Decryptor has already been finalized")
+
+        self._buffer += data
+        session = self._session or self._open_session()
+        if session is None:
+            return b""
+
+        size = CHUNK_SIZE + TAG_SIZE
+        end = max(len(self._buffer) - 1, 0) // size * size
+        with memoryview(self._buffer) as view:
+            out = b"".join(
+                session.open(view[i : i + size], False) for i in range(0, end, size)
+            )
+        del self._buffer[:end]
+        return out
+
+    def finalize(self) -> bytes:
+        """Decrypt the last chunk.
+
+        Raises:
+            ValueError: if the decryptor has already been finalized, or the envelope
+                        is truncated or has been tampered with
+
+        Returns:
+            decrypted bytes of the last chunk
+        """
+        if self._finalized:
+            raise ValueError("Decryptor has already been finalized")
+
+        self._finalized = True
+        if self._session is None or len(self._buffer) < TAG_SIZE:
+            raise ValueError("Envelope is truncated")
+        with memoryview(self._buffer) as view:
+            out = self._session.open(view, True)
+        self._buffer.clear()
+        return out
+
+
+def is_envelope(data: Buffer) -> bool:
+    """Checks whether data starts with magic bytes and version of an envelope.
+
+    Unlike base64 text the version is not a printable character, so the beginning of
+    an envelope can't be confused with the beginning of base64 ciphertext.
+
+    Args:
+        data: data to be checked
+
+    Returns:
+        whether the data looks like an envelope
+    """
+    return bytes(data[: len(MAGIC) + 1]) == MAGIC + bytes([VERSION])
+
+
+def encrypt_envelope(data: Buffer, key: Union[str, PublicKey]) -> bytes:
+    """Encrypts data into an envelope.
+
+    Args:
+        data: data to be encrypted
+        key: public key object or base64 encoded key
+
+    Returns:
+        envelope
+    """
+    encryptor = EnvelopeEncryptor(key)
+    return encryptor.update(data) + encryptor.finalize()
+
+
+def decrypt_envelope(data: Buffer, key: Union[str, PrivateKey]) -> bytes:
+    """Decrypts an envelope.
+
+    Args:
+        data: envelope
+        key: private key object or base64 encoded private key
+
+    Raises:
+        ValueError: if the envelope is malformed, has been tampered with or was
+                    encrypted using another key
+
+    Returns:
+        decrypted data
+    """
+    decryptor = EnvelopeDecryptor(key)
+    return decryptor.update(data) + decryptor.finalize()
@@ -0,0 +1,201 @@
+"""Opt-in instrumentation of prime generation, encryption and decryption.
+
+Instrumented functions check :code:`active` before recording anything, so when no
+statistics are being collected the only overhead is a single attribute lookup. Stats
+are enabled by :func:`collect`, which makes every instrumented call in the process,
+from any thread, record into the yielded :class:`Stats` object. Work done by worker
+processes, e.g. when searching for primes or encrypting blocks using multiple
+processes, is not recorded, apart from the time spent waiting for it.
+
+The following counters are recorded:
+    - candidates: numbers tested for primality while searching for a prime
+    - sieve_rejections: numbers skipped by the sieve while searching for a prime
+    - miller_rabin_rounds: rounds of Miller–Rabin test
+    - lucas_tests: strong Lucas tests
+    - modexps: modular exponentiations, CRT counting as two
+    - rejected.miller_rabin_base_2: composites rejected by the first round of
+      Miller–Rabin test
+    - rejected.miller_rabin: composites rejected by the remaining rounds
+    - rejected.lucas: composites rejected by strong Lucas test
+
+The following stages are timed:
+    - find_prime: search for a single prime
+    - initialize.primes: obtaining both primes in :func:`rsa.rsa.initialize`
+    - initialize.exponent: calculating the private exponent
+    - encrypt: encryption of a message, either a block or a whole base64 message
+    - decrypt: decryption of a message, either a block or a whole base64 message
+
+Attributes:
+    active (Optional[Stats]): stats currently being collected, if any
+
+Example:
+    >>> from rsa import initialize
+    >>> from rsa.instrumentation import collect
+    >>> with collect() as stats:
+    ...     _ = initialize(256)
+    >>> stats.calls["find_prime"]
+    2
+    >>> stats.counters["candidates"] >= 2
+    True
+"""
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any
+from typing import Callable
+from typing import Dict
+from typing import Iterator
+from typing import Optional
+
+
+class Stats:
+    """Aggregated counters and stage timings.
+
+    Args:
+        callback: optional callable invoked with the name and value of every recorded
+                  event, i.e. the increment of a counter or the duration of a stage
+                  in seconds, which makes it possible to spot individual outliers
+
+    Attributes:
+        counters (Dict[str, int]): totals of counters
+        timings (Dict[str, float]): total time spent in each stage in seconds
+        calls (Dict[str, int]): number of times each stage has been timed
+        callback (Optional[Callable[[str, float], Any]]): callable invoked on every
+                                                           event
+    """
+
+    def __init__(self, callback: Optional[Callable[[str, float], Any]] = None) -> None:
+        self.counters: Dict[str, int] = {}
+        self.timings: Dict[str, float] = {}
+        self.calls: Dict[str, int] = {}
+        self.callback = callback
+        self._lock = threading.Lock()
+
+    def count(self, name: str, value: int = 1) -> None:
+        """Increment a counter.
+
+        Args:
+            name: name of the counter
+            value: increment
+        """
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+        if self.callback is not None:
+            self.callback(name, value)
+
+    def record_time(self, stage: str, seconds: float) -> None:
+        """Record duration of a stage.
+
+        Args:
+            stage: name of the stage
+            seconds: duration of the stage
+        """
+        with self._lock:
+            self.timings[stage] = self.timings.get(stage, 0.0) + seconds
+            self.calls[stage] = self.calls.get(stage, 0) + 1
+        if self.callback is not None:
+            self.callback(stage, seconds)
+
+    def as_dict(self) -> Dict[str, Any]:
+        """JSON-serializable snapshot of the stats.
+
+        Returns:
+            counters and, for each stage, number of calls and total time in seconds
+        """
+        with self._lock:
+            return {
+                "counters": dict(self.counters),
+                "timings": {
+                    stage: {"calls": self.calls[stage], "total": total}
+                    for stage, total in self.timings.items()
+                },
+            }
+
+
+active: Optional[Stats] = None
+
+
+class _Timer:
+    """Context manager recording duration of its block into stats."""
+
+    __slots__ = ("stats", "stage", "start")
+
+    def __init__(self, stats: Stats, stage: str) -> None:
+        self.stats = stats
+        self.stage = stage
+        self.start = 0.0
+
+    def __enter__(self) -> None:
+        self.start = time.perf_counter()
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.stats.record_time(self.stage, time.perf_counter() - self.start)
+
+
+class _NullTimer:
+    """Context manager doing nothing, used while no stats are being collected."""
+
+    __slots__ = ()
+
+    def __enter__(self) -> None:
+        pass
+
+    def __exit__(self, *exc_info: Any) -> None:
+        pass
+
+
+_NULL_TIMER = _NullTimer()
+
+
+def timer(stage: str) -> Any:
+    """Time a stage if stats are being collected.
+
+    Args:
+        stage: name of the stage
+
+    Returns:
+        context manager recording duration of its block
+    """
+    if active is None:
+        return _NULL_TIMER
+    return _Timer(active, stage)
+
+
+def count(name: str, value: int = 1) -> None:
+    """Increment a counter if stats are being collected.
+
+    Hot paths should check :code:`active` themselves instead of calling this.
+
+    Args:
+        name: name of the counter
+        value: increment
+    """
+    if active is not None:
+        active.count(name, value)
+
+
+@contextmanager
+def collect(
+    stats: Optional[Stats] = None,
+    callback: Optional[Callable[[str, float], Any]] = None,
+) -> Iterator[Stats]:
+    """Collect stats of instrumented calls made inside of the block.
+
+    Blocks can be nested, in which case the inner one collects the stats until it
+    exits and the outer one continues afterwards.
+
+    Args:
+        stats: stats object to record into, a new one is created if not provided
+        callback: callback of the newly created stats object, see :class:`Stats`
+
+    Returns:
+        context manager yielding the stats object
+    """
+    global active
+    if stats is None:
+        stats = Stats(callback)
+    previous, active = active, stats
+    try:
+        yield stats
+    finally:
+        active = previous
@@ -0,0 +1,253 @@
+"""Compact binary key format.
+
+Base64 keys are convenient to pass around as text, but are about a third bigger
+than the numbers they hold and can't be identified without decoding them. Binary
+keys consist of a header followed by length-prefixed integers, with all integers
+being little-endian regardless of :code:`config.BYTEORDER`. The header has the
+following layout:
+
+    ======  =====  ==========================================================
+    Offset  Size   Field
+    ======  =====  ==========================================================
+    0       4      magic bytes :code:`RSAK`
+    4       1      format version
+    5       1      flags, see :code:`PRIVATE` and :code:`NEGATIVE_EXPONENT`
+    6       1      number of integers
+    7       8      fingerprint of the key, see :func:`rsa.utils.fingerprint`
+    15      4      size of the whole key in bytes, including the header
+    ======  =====  ==========================================================
+
+Each integer is stored as its size in bytes (2 bytes) followed by its magnitude.
+The integers are the modulus and the exponent, followed by CRT parameters in the
+order used by extended base64 private keys, if the key is a private key which has
+them. Since the size of the key is stored in the header, keys can be concatenated
+and skipped over, or indexed by their fingerprint, without parsing the integers.
+
+Keys can also be armored as PEM, i.e. base64-encoded between :code:`BEGIN` and
+:code:`END` lines, for places which only accept text.
+
+Attributes:
+    PRIVATE (int): flag set for private keys
+    NEGATIVE_EXPONENT (int): flag set if the exponent is negative, which private
+                             exponents of keys generated by earlier versions of
+                             :func:`rsa.rsa.initialize` may be
+
+Example:
+    >>> from rsa import keygen, load_public_key
+    >>> from rsa.keyformat import key_from_bytes, key_to_bytes, read_key_header
+    >>> public, _ = keygen(512)
+    >>> data = key_to_bytes(load_public_key(public))
+    >>> len(data)
+    154
+    >>> key_from_bytes(data).to_base64() == public
+    True
+    >>> read_key_header(data).fingerprint == load_public_key(public).fingerprint
+    True
+"""
+import base64
+import struct
+from typing import Iterator
+from typing import NamedTuple
+from typing import Union
+
+from .keys import PrivateKey
+from .keys import PublicKey
+
+MAGIC = b"RSAK"
+VERSION = 1
+HEADER = struct.Struct("<4sBBB8sI")
+LENGTH = struct.Struct("<H")
+
+PRIVATE = 1
+NEGATIVE_EXPONENT = 2
+
+PEM_LABELS = {False: "RSAK PUBLIC KEY", True: "RSAK PRIVATE KEY"}
+PEM_LINE_LENGTH = 64
+
+Buffer = Union[bytes, bytearray, memoryview]
+Key = Union[PublicKey, PrivateKey]
+
+
+class KeyHeader(NamedTuple):
+    """Header of binary key."""
+
+    flags: int
+    field_count: int
+    fingerprint: bytes
+    size: int
+
+    @property
+    def private(self) -> bool:
+        """Whether the key is a private key."""
+        return bool(self.flags & PRIVATE)
+
+
+def read_key_header(data: Buffer, offset: int = 0) -> KeyHeader:
+    """Parses and validates the header of binary key.
+
+    Args:
+        data: buffer containing binary key
+        offset: position of the key in the buffer
+
+    Raises:
+        ValueError: if there is no valid header at the offset
+
+    Returns:
+        parsed header
+    """
+    if len(data) - offset < HEADER.size:
+        raise ValueError("Data is too short to contain a key header")
+
+    magic, version, *fields = HEADER.unpack_from(data, offset)
+    if magic != MAGIC:
+        raise ValueError("Data is not a binary key")
+    if version != VERSION:
+        raise ValueError(f"Unsupported binary key version {version}")
+
+    header = KeyHeader(*fields)
+    valid_count = header.field_count == 2 or (
+        header.private and header.field_count >= 7 and (header.field_count - 7) % 3 == 0
+    )
+    if not valid_count or header.size > len(data) - offset:
+        raise ValueError("Binary key is corrupted")
+    return header
+
+
+def key_to_bytes(key: Key) -> bytearray:
+    """Serializes key object into binary key.
+
+    Args:
+        key: public or private key object
+
+    Returns:
+        binary key
+    """
+    if isinstance(key, PrivateKey):
+        flags, exponent, nums = PRIVATE, key.d, [key.n, abs(key.d), *(key.crt or ())]
+    else:
+        flags, exponent, nums = 0, key.e, [key.n, abs(key.e)]
+    if exponent < 0:
+        flags |= NEGATIVE_EXPONENT
+
+    sizes = [(num.bit_length() + 7) // 8 for num in nums]
+    size = HEADER.size + LENGTH.size * len(nums) + sum(sizes)
+
+    out = bytearray(size)
+    HEADER.pack_into(out, 0, MAGIC, VERSION, flags, len(nums), key.fingerprint, size)
+    offset = HEADER.size
+    for num, num_size in zip(nums, sizes):
+        LENGTH.pack_into(out, offset, num_size)
+        offset += LENGTH.size
+        out[offset : offset + num_size] = num.to_bytes(num_size, "little")
+        offset += num_size
+
+    return out
+
+
+def key_from_bytes(data: Buffer, offset: int = 0) -> Key:
+    """Parses binary key directly from a buffer, without copying it.
+
+    Args:
+        data: buffer containing binary key
+        offset: position of the key in the buffer
+
+    Raises:
+        ValueError: if the key is malformed or its fingerprint doesn't match
+
+    Returns:
+        public or private key object
+    """
+    header = read_key_header(data, offset)
+    end = offset + header.size
+
+    nums = []
+    with memoryview(data) as raw, raw.cast("B") as view:
+        position = offset + HEADER.size
+        for _ in range(header.field_count):
+            if position + LENGTH.size > end:
+                raise ValueError("Binary key is corrupted")
+            (num_size,) = LENGTH.unpack_from(view, position)
+            position += LENGTH.size
+            if position + num_size > end:
+                raise ValueError("Binary key is corrupted")
+            nums.append(int.from_bytes(view[position : position + num_size], "little"))
+            position += num_size
+
+    if position != end:
+        raise ValueError("Binary key is corrupted")
+
+    n, exponent, *crt = nums
+    if header.flags & NEGATIVE_EXPONENT:
+        exponent = -exponent
+
+    key: Key
+    if header.private:
+        key = PrivateKey(n, exponent, tuple(crt) or None)
+    else:
+        key = PublicKey(n, exponent)
+    if key.fingerprint != header.fingerprint:
+        raise ValueError("Fingerprint of the key doesn't match its modulus")
+    return key
+
+
+def iter_keys(data: Buffer) -> Iterator[Key]:
+    """Parses concatenated binary keys.
+
+    Args:
+        data: buffer containing binary keys one after another
+
+    Raises:
+        ValueError: if any of the keys is malformed
+
+    Returns:
+        iterator over key objects
+    """
+    offset = 0
+    while offset < len(data):
+        size = read_key_header(data, offset).size
+        yield key_from_bytes(data, offset)
+        offset += size
+
+
+def key_to_pem(key: Key) -> str:
+    """Serializes key object into PEM-armored binary key.
+
+    Args:
+        key: public or private key object
+
+    Returns:
+        PEM-armored binary key
+    """
+    label = PEM_LABELS[isinstance(key, PrivateKey)]
+    encoded = base64.b64encode(key_to_bytes(key)).decode()
+    lines = [
+        encoded[i : i + PEM_LINE_LENGTH]
+        for i in range(0, len(encoded), PEM_LINE_LENGTH)
+    ]
+    return "\n".join([f"-----BEGIN {label}-----", *lines, f"-----END {label}-----"])
+
+
+def key_from_pem(text: str) -> Key:
+    """Parses PEM-armored binary key.
+
+    Args:
+        text: PEM-armored binary key, surrounding whitespace is ignored
+
+    Raises:
+        ValueError: if the armor or the key is malformed
+
+    Returns:
+        public or private key object
+    """
+    lines = text.strip().splitlines()
+    for private, label in PEM_LABELS.items():
+        if (
+            len(lines) >= 2
+            and lines[0] == f"-----BEGIN {label}-----"
+            and lines[-1] == f"-----END {label}-----"
+        ):
+            key = key_from_bytes(base64.b64decode("".join(lines[1:-1]), validate=True))
+            if isinstance(key, PrivateKey) != private:
+                raise ValueError("Type of the key doesn't match its PEM label")
+            return key
+    raise ValueError("Text is not a PEM-armored binary key")
@@ -0,0 +1,400 @@
+"""Reusable key objects.
+
+Functions operating on base64-encoded keys need to split and decode the key and
+calculate sizes derived from the modulus on every call. Key objects do that only once
+when they are created and can then be used for encrypting or decrypting any number
+of messages.
+
+Ciphertext is made up of base64-encoded encrypted blocks separated by :code:`.`.
+Converting a block to an integer loses zero bytes at its end, which are restored
+from the position of the block for all but the last one. If the last block ends
+with zero bytes, its size is therefore appended to the ciphertext after
+:code:`LENGTH_MARKER`, which isn't a base64 character. Text never ends with zero
+bytes when encoded using the default :code:`config.ENCODING`, so ciphertexts of
+text don't have it.
+
+Attributes:
+    KEY_CACHE_SIZE (int): maximal number of decoded keys of each kind kept by
+                          :func:`load_public_key` and :func:`load_private_key`
+    LENGTH_MARKER (str): separator of the size of the last block of ciphertext
+
+Example:
+    >>> from rsa import PrivateKey, PublicKey, keygen
+    >>> public, private = keygen(512)
+    >>> public_key = PublicKey.from_base64(public)
+    >>> private_key = PrivateKey.from_base64(private)
+    >>> print(private_key.decrypt(public_key.encrypt("Hello world!")))
+    Hello world!
+"""
+import base64
+from concurrent.futures import Executor
+from functools import lru_cache
+from typing import List
+from typing import Optional
+from typing import Tuple
+from typing import Union
+
+from . import config
+from . import instrumentation
+from .parallel import map_blocks
+from .utils import decode_key
+from .utils import decode_private_key
+from .utils import encode_key
+from .utils import encode_private_key
+from .utils import fingerprint
+from .utils import powmod
+from .utils import powmod_crt
+
+KEY_CACHE_SIZE = 128
+LENGTH_MARKER = "~"
+
+Buffer = Union[bytes, bytearray, memoryview]
+
+
+def length_suffix(block: Buffer) -> str:
+    """Suffix of ciphertext storing the size of its last block, if it's needed.
+
+    Args:
+        block: last block of the message
+
+    Returns:
+        :code:`LENGTH_MARKER` followed by the size of the block, or an empty string
+        if the size is implied by the value of the block
+    """
+    num = int.from_bytes(block, config.BYTEORDER)
+    if (num.bit_length() + 7) // 8 == len(block):
+        return ""
+    return f"{LENGTH_MARKER}{len(block)}"
+
+
+def split_ciphertext(ciphertext: str) -> Tuple[List[str], Optional[int]]:
+    """Splits ciphertext into base64-encoded blocks and the size of the last block.
+
+    Args:
+        ciphertext: base64 encoded ciphertext
+
+    Raises:
+        ValueError: if the size of the last block is malformed
+
+    Returns:
+        blocks and the size of the last block, if it's stored in the ciphertext
+    """
+    blocks, marker, size = ciphertext.partition(LENGTH_MARKER)
+    if not marker:
+        return blocks.split("."), None
+    if not size.isdigit():
+        raise ValueError("Size of the last block of the ciphertext is malformed")
+    return blocks.split("."), int(size)
+
+
+def restore_last_block(block: bytes, size: Optional[int], chunk_size: int) -> bytes:
+    """Restores zero bytes lost at the end of the last decrypted block.
+
+    Args:
+        block: decrypted last block
+        size: size of the block stored in the ciphertext, if any
+        chunk_size: maximal size of a block
+
+    Raises:
+        ValueError: if the block doesn't fit the size
+
+    Returns:
+        the block, extended to the size if it's provided
+    """
+    if size is None:
+        return block
+    if len(block) > size or size > chunk_size:
+        raise ValueError("Ciphertext has not been encrypted using this key")
+    return int.from_bytes(block, config.BYTEORDER).to_bytes(size, config.BYTEORDER)
+
+
+class PublicKey:
+    """RSA public key with precomputed sizes derived from the modulus.
+
+    Args:
+        n: modulus
+        e: public exponent
+
+    Attributes:
+        n (int): modulus
+        e (int): public exponent
+        num_bytes (int): number of bytes needed to represent the modulus
+        chunk_size (int): number of message bytes encrypted into a single block
+        fingerprint (bytes): fingerprint of the modulus, see
+                             :func:`rsa.utils.fingerprint`
+    """
+
+    __slots__ = ("n", "e", "num_bytes", "chunk_size", "fingerprint")
+
+    def __init__(self, n: int, e: int) -> None:
+        self.n = n
+        self.e = e
+        self.num_bytes = (n.bit_length() + 7) // 8
+        self.chunk_size = self.num_bytes - 1
+        self.fingerprint = fingerprint(n)
+
+    @classmethod
+    def from_base64(cls, key: str) -> "PublicKey":
+        """Create key object from base64-encoded key.
+
+        Args:
+            key: base64 encoded key
+
+        Returns:
+            key object
+        """
+        return cls(*decode_key(key))
+
+    def to_base64(self) -> str:
+        """Base64-encode the key.
+
+        Returns:
+            base64 encoded key
+        """
+        return encode_key(self.n, self.e)
+
+    def encrypt_int(self, num: int) -> int:
+        """Encrypt a message represented as an integer smaller than the modulus.
+
+        Args:
+            num: message to be encrypted
+
+        Returns:
+            :code:`num ** e % n`
+        """
+        return powmod(num, self.e, self.n)
+
+    def encrypt_block(self, block: Union[bytes, bytearray, memoryview]) -> bytes:
+        """Encrypt a single block of at most :code:`chunk_size` bytes.
+
+        Args:
+            block: bytes to be encrypted
+
+        Returns:
+            encrypted block
+        """
+        num = self.encrypt_int(int.from_bytes(block, config.BYTEORDER))
+        return num.to_bytes((num.bit_length() + 7) // 8, config.BYTEORDER)
+
+    def encrypt_bytes(
+        self,
+        data: Union[bytes, bytearray, memoryview],
+        workers: int = 1,
+        executor: Optional[Executor] = None,
+    ) -> str:
+        """Encrypt and base64-encode bytes.
+
+        Blocks are slices of a :code:`memoryview` of the data, so the data isn't
+        copied before it's encrypted. If the data ends with zero bytes, the size of
+        the last block is appended to the ciphertext, see :func:`length_suffix`.
+
+        Args:
+            data: bytes to be encrypted
+            workers: number of processes encrypting blocks of big messages
+            executor: process pool to use instead of creating one, see
+                      :func:`rsa.parallel.map_blocks`
+
+        Returns:
+            base64 encoded ciphertext
+        """
+        with instrumentation.timer("encrypt"):
+            n = self.chunk_size
+            view = memoryview(data)
+            blocks = [view[i : i + n] for i in range(0, len(view), n)]
+            suffix = length_suffix(blocks[-1]) if blocks else ""
+            return (
+                b".".join(
+                    base64.urlsafe_b64encode(block)
+                    for block in map_blocks(
+                        self, "encrypt_block", blocks, workers, executor
+                    )
+                ).decode()
+                + suffix
+            )
+
+    def encrypt(
+        self, message: str, workers: int = 1, executor: Optional[Executor] = None
+    ) -> str:
+        """Encrypt and base64-encode message.
+
+        Args:
+            message: message to be encrypted
+            workers: number of processes encrypting blocks of big messages
+            executor: process pool to use instead of creating one, see
+                      :func:`rsa.parallel.map_blocks`
+
+        Returns:
+            base64 encoded ciphertext
+        """
+        return self.encrypt_bytes(message.encode(config.ENCODING), workers, executor)
+
+
+class PrivateKey:
+    """RSA private key with precomputed sizes and optional CRT parameters.
+
+    Args:
+        n: modulus
+        d: private exponent
+        crt: optional :code:`(p, q, dP, dQ, qInv)` tuple, followed by parameters of
+             the other primes of multi-prime keys
+
+    Attributes:
+        n (int): modulus
+        d (int): private exponent
+        crt (Optional[Tuple[int, ...]]): CRT parameters, if known
+        num_bytes (int): number of bytes needed to represent the modulus
+        chunk_size (int): number of message bytes encrypted into a single block
+        fingerprint (bytes): fingerprint of the modulus, see
+                             :func:`rsa.utils.fingerprint`
+    """
+
+    __slots__ = ("n", "d", "crt", "num_bytes", "chunk_size", "fingerprint")
+
+    def __init__(self, n: int, d: int, crt: Optional[Tuple[int, ...]] = None) -> None:
+        self.n = n
+        self.d = d
+        self.crt = crt
+        self.num_bytes = (n.bit_length() + 7) // 8
+        self.chunk_size = self.num_bytes - 1
+        self.fingerprint = fingerprint(n)
+
+    @classmethod
+    def from_base64(cls, key: str) -> "PrivateKey":
+        """Create key object from base64-encoded private key.
+
+        Args:
+            key: base64 encoded private key, either extended or legacy one
+
+        Returns:
+            key object
+        """
+        return cls(*decode_private_key(key))
+
+    def to_base64(self) -> str:
+        """Base64-encode the key.
+
+        Returns:
+            base64 encoded private key, extended one if CRT parameters are known
+        """
+        if self.crt is None:
+            return encode_key(self.n, self.d)
+        return encode_private_key(self.n, self.d, *self.crt)
+
+    def decrypt_int(self, num: int) -> int:
+        """Decrypt a ciphertext represented as an integer.
+
+        Args:
+            num: ciphertext
+
+        Returns:
+            :code:`num ** d % n`, calculated using CRT if its parameters are known
+        """
+        if self.crt is None:
+            return powmod(num, self.d, self.n)
+        return powmod_crt(num, *self.crt)
+
+    def decrypt_block(self, block: bytes) -> bytes:
+        """Decrypt a single block.
+
+        Args:
+            block: encrypted block
+
+        Returns:
+            decrypted bytes
+        """
+        num = self.decrypt_int(int.from_bytes(block, config.BYTEORDER))
+        return num.to_bytes((num.bit_length() + 7) // 8, config.BYTEORDER)
+
+    def decrypt_bytes(
+        self, ciphertext: str, workers: int = 1, executor: Optional[Executor] = None
+    ) -> bytearray:
+        """Decrypt base64-encoded ciphertext into bytes.
+
+        Decrypted blocks are written into a preallocated buffer at offsets which are
+        multiples of :code:`chunk_size`, which also restores zero bytes at the ends of
+        the blocks that are lost when a block is converted to an integer. Zero bytes
+        at the end of the last block are restored using its size, if it's stored in
+        the ciphertext.
+
+        Args:
+            ciphertext: base64 encoded ciphertext
+            workers: number of processes decrypting blocks of big ciphertexts
+            executor: process pool to use instead of creating one, see
+                      :func:`rsa.parallel.map_blocks`
+
+        Raises:
+            ValueError: if a block of the ciphertext doesn't decrypt into at most
+                        :code:`chunk_size` bytes, or into more bytes than the size of
+                        the last block stored in the ciphertext
+
+        Returns:
+            decrypted bytes
+        """
+        with instrumentation.timer("decrypt"):
+            n = self.chunk_size
+            chunks, size = split_ciphertext(ciphertext)
+            blocks = [base64.urlsafe_b64decode(chunk) for chunk in chunks]
+            out = bytearray(len(blocks) * n)
+            end = 0
+            for i, block in enumerate(
+                map_blocks(self, "decrypt_block", blocks, workers, executor)
+            ):
+                if i == len(blocks) - 1:
+                    block = restore_last_block(block, size, n)
+                if len(block) > n:
+                    raise ValueError("Ciphertext has not been encrypted using this key")
+                end = i * n + len(block)
+                out[i * n : end] = block
+            del out[end:]
+            return out
+
+    def decrypt(
+        self, ciphertext: str, workers: int = 1, executor: Optional[Executor] = None
+    ) -> str:
+        """Decrypt base64-encoded ciphertext.
+
+        The decrypted bytes are decoded only once, so characters whose encoding is
+        split between two blocks are decoded correctly.
+
+        Args:
+            ciphertext: base64 encoded ciphertext
+            workers: number of processes decrypting blocks of big ciphertexts
+            executor: process pool to use instead of creating one, see
+                      :func:`rsa.parallel.map_blocks`
+
+        Returns:
+            decrypted message
+        """
+        return self.decrypt_bytes(ciphertext, workers, executor).decode(config.ENCODING)
+
+
+@lru_cache(maxsize=KEY_CACHE_SIZE)
+def load_public_key(key: str) -> PublicKey:
+    """Get key object for base64-encoded key, reusing recently decoded ones.
+
+    Since decoded keys are cached, they won't reflect changes of
+    :code:`config.BYTEORDER` made after they have been decoded.
+
+    Args:
+        key: base64 encoded key
+
+    Returns:
+        key object
+    """
+    return PublicKey.from_base64(key)
+
+
+@lru_cache(maxsize=KEY_CACHE_SIZE)
+def load_private_key(key: str) -> PrivateKey:
+    """Get key object for base64-encoded private key, reusing recently decoded ones.
+
+    Since decoded keys are cached, they won't reflect changes of
+    :code:`config.BYTEORDER` made after they have been decoded.
+
+    Args:
+        key: base64 encoded private key
+
+    Returns:
+        key object
+    """
+    return PrivateKey.from_base64(key)
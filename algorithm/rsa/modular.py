@@ -0,0 +1,155 @@
+"""Modular inverses, single and batched.
+
+Private exponents and CRT coefficients are modular inverses. Python 3.8+ computes
+them natively using :code:`pow(x, -1, m)`, which is what :func:`modinv` uses when it
+is available. On older versions it falls back to :func:`lehmer_xgcd`, which runs
+most of the steps of the extended Euclidean algorithm on the leading bits of the
+numbers only, so big numbers are divided and multiplied once per many quotients
+rather than once per quotient, as they are in :func:`rsa.utils.xgcd`.
+
+Many values can be inverted modulo the same modulus using :func:`batch_modinv`,
+which uses `Montgomery's trick <https://en.wikipedia.org/wiki/Modular_multiplicative_inverse#Multiple_inverses>`__
+to replace all but one of the inversions by three modular multiplications each.
+
+Attributes:
+    LEHMER_BITS (int): number of leading bits used by inner steps of Lehmer's
+                       algorithm
+
+Example:
+    >>> from rsa.modular import batch_modinv, modinv
+    >>> modinv(3, 11)
+    4
+    >>> batch_modinv([2, 3, 4], 11)
+    [6, 4, 3]
+"""
+import sys
+from typing import List
+from typing import Sequence
+from typing import Tuple
+
+LEHMER_BITS = 30
+
+
+def lehmer_xgcd(a: int, b: int) -> Tuple[int, int, int]:
+    """Extended Euclidean algorithm using Lehmer's method.
+
+    Quotients are calculated from the leading :code:`LEHMER_BITS` bits of the
+    remainders for as long as they are guaranteed to be the same as quotients of the
+    whole numbers, as described in Knuth's TAOCP, Vol. 2, 4.5.2, Algorithm L. The
+    accumulated steps are then applied to the whole numbers at once.
+
+    Args:
+        a: first non-negative number
+        b: second non-negative number
+
+    Returns:
+        :code:`gcd(a,b)`, :code:`x`, :code:`y` such that :code:`ax + by = gcd(a,b)`
+    """
+    if a < 0 or b < 0:
+        raise ValueError("Numbers need to be non-negative")
+
+    swapped = a < b
+    u, v = (b, a) if swapped else (a, b)
+    # coefficients of the first number in linear combinations equal to u and v
+    x0, x1 = (0, 1) if swapped else (1, 0)
+
+    while v.bit_length() > LEHMER_BITS:
+        shift = u.bit_length() - LEHMER_BITS
+        u_hat, v_hat = u >> shift, v >> shift
+        a0, b0, a1, b1 = 1, 0, 0, 1
+        while v_hat + a1 != 0 and v_hat + b1 != 0:
+            q = (u_hat + a0) // (v_hat + a1)
+            if q != (u_hat + b0) // (v_hat + b1):
+                break
+            a0, a1 = a1, a0 - q * a1
+            b0, b1 = b1, b0 - q * b1
+            u_hat, v_hat = v_hat, u_hat - q * v_hat
+
+        if b0 == 0:
+            q, r = divmod(u, v)
+            u, v = v, r
+            x0, x1 = x1, x0 - q * x1
+        else:
+            u, v = a0 * u + b0 * v, a1 * u + b1 * v
+            x0, x1 = a0 * x0 + b0 * x1, a1 * x0 + b1 * x1
+
+    while v != 0:
+        q, r = divmod(u, v)
+        u, v = v, r
+        x0, x1 = x1, x0 - q * x1
+
+    x = x0 if a or b else 0
+    y = (u - a * x) // b if b else 0
+    return u, x, y
+
+
+if sys.version_info >= (3, 8):
+
+    def modinv(a: int, m: int) -> int:
+        """Modular multiplicative inverse.
+
+        Args:
+            a: number to be inverted
+            m: modulus
+
+        Raises:
+            ValueError: if the inverse does not exist
+
+        Returns:
+            :code:`x` in range :code:`[0, m)` such that :code:`ax % m == 1`
+        """
+        try:
+            return pow(a, -1, m)
+        except ValueError:
+            raise ValueError("Modular inverse does not exist!") from None
+
+else:  # pragma: no cover
+
+    def modinv(a: int, m: int) -> int:
+        """Modular multiplicative inverse.
+
+        Args:
+            a: number to be inverted
+            m: modulus
+
+        Raises:
+            ValueError: if the inverse does not exist
+
+        Returns:
+            :code:`x` in range :code:`[0, m)` such that :code:`ax % m == 1`
+        """
+        g, x, _ = lehmer_xgcd(a % m, m)
+        if g != 1:
+            raise ValueError("Modular inverse does not exist!")
+        return x % m
+
+
+def batch_modinv(values: Sequence[int], m: int) -> List[int]:
+    """Modular multiplicative inverses of many numbers modulo the same modulus.
+
+    The product of all the numbers is inverted using a single call of
+    :func:`modinv` and the inverses of the numbers are then recovered from it and
+    the products of their prefixes.
+
+    Args:
+        values: numbers to be inverted
+        m: modulus
+
+    Raises:
+        ValueError: if inverse of any of the numbers does not exist
+
+    Returns:
+        inverses of the numbers, in the same order, each in range :code:`[0, m)`
+    """
+    prefixes = []
+    product = 1
+    for value in values:
+        prefixes.append(product)
+        product = product * value % m
+
+    inverse = modinv(product, m)
+    inverses = [0] * len(prefixes)
+    for i in range(len(prefixes) - 1, -1, -1):
+        inverses[i] = inverse * prefixes[i] % m
+        inverse = inverse * values[i] % m
+    return inverses
@@ -0,0 +1,67 @@
+"""Parallel processing of independent blocks.
+
+Every block of a message is encrypted or decrypted independently of the others, so
+big messages can be processed by a pool of worker processes. Blocks are sent to the
+workers in batches of :code:`BATCH_SIZE` to amortize the cost of inter-process
+communication, and results are put back together in the original order.
+
+Attributes:
+    BATCH_SIZE (int): number of blocks sent to a worker at once
+    PARALLEL_THRESHOLD (int): minimal number of blocks for which the work is
+                              distributed among workers, smaller messages are always
+                              processed in the calling process
+"""
+from concurrent.futures import Executor
+from concurrent.futures import ProcessPoolExecutor
+from itertools import chain
+from itertools import repeat
+from typing import Any
+from typing import List
+from typing import Optional
+from typing import Sequence
+
+BATCH_SIZE = 64
+PARALLEL_THRESHOLD = 2 * BATCH_SIZE
+
+
+def _apply(key: Any, method: str, batch: Sequence[Any]) -> List[Any]:
+    """Calls given method of the key on each of the items of the batch."""
+    function = getattr(key, method)
+    return [function(item) for item in batch]
+
+
+def map_blocks(
+    key: Any,
+    method: str,
+    blocks: Sequence[Any],
+    workers: int = 1,
+    executor: Optional[Executor] = None,
+) -> List[Any]:
+    """Calls given method of the key on each of the blocks, possibly in parallel.
+
+    Args:
+        key: key object, needs to be picklable in order to be sent to the workers
+        method: name of the method of the key to call, e.g. :code:`encrypt_block`
+        blocks: blocks to be processed
+        workers: number of worker processes to create if executor isn't provided
+        executor: executor to submit the batches to, it should be a process pool
+                  since the work is CPU-bound
+
+    Returns:
+        list of results in the same order as blocks
+    """
+    if (executor is None and workers <= 1) or len(blocks) < PARALLEL_THRESHOLD:
+        return _apply(key, method, blocks)
+
+    # memoryviews can't be pickled, so they're copied before being sent to workers
+    blocks = [bytes(b) if isinstance(b, memoryview) else b for b in blocks]
+    batches = [blocks[i : i + BATCH_SIZE] for i in range(0, len(blocks), BATCH_SIZE)]
+    args = (repeat(key), repeat(method), batches)
+
+    if executor is None:
+        with ProcessPoolExecutor(workers) as pool:
+            results = list(pool.map(_apply, *args))
+    else:
+        results = list(executor.map(_apply, *args))
+
+    return list(chain.from_iterable(results))
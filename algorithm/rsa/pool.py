@@ -0,0 +1,249 @@
+"""Pool of pregenerated primes.
+
+Searching for big primes is by far the most expensive part of key generation. A
+prime pool keeps a number of primes of each of the configured sizes ready and
+replenishes them in the background, so that key generation only needs to take them
+from the pool. Only the configured sizes are kept in the pool, primes of other sizes
+are searched for on demand.
+
+Primes are never handed out twice, since keys sharing a prime can be trivially
+factored. That is why saving the inventory to a file moves the primes there instead
+of copying them, and loading it claims the file by atomically renaming it, so that
+only one process can ever obtain the primes it contains. If a process dies before
+saving its inventory the primes are simply lost.
+
+Attributes:
+    DEFAULT_CAPACITY (int): default number of primes of each size kept in the pool
+
+Example:
+    >>> from rsa import PrimePool, keygen
+    >>> pool = PrimePool([512], capacity=2)
+    >>> pool.start()
+    >>> public_key, private_key = keygen(512, pool=pool)
+    >>> pool.stop()
+"""
+import json
+import os
+import random
+import threading
+from collections import deque
+from concurrent.futures import Executor
+from concurrent.futures import ProcessPoolExecutor
+from typing import Deque
+from typing import Dict
+from typing import Iterable
+from typing import List
+from typing import Optional
+
+from .primes import _find_prime_task
+from .primes import find_prime
+from .primes import MIN_PRIME_BITS
+from .primes import SearchCancelled
+
+DEFAULT_CAPACITY = 8
+FILE_VERSION = 1
+
+
+class PrimePool:
+    """Thread-safe pool of primes replenished in the background.
+
+    Args:
+        sizes: sizes of primes in bits to keep in the pool
+        capacity: number of primes of each size to keep in the pool
+        path: file to load the inventory from when the pool is started and to save
+              it to when it is stopped
+        processes: number of processes searching for primes, if 0 primes are
+                   searched for in the background thread itself
+
+    Raises:
+        ValueError: if any of the sizes is smaller than :code:`MIN_PRIME_BITS`
+    """
+
+    def __init__(
+        self,
+        sizes: Iterable[int] = (),
+        capacity: int = DEFAULT_CAPACITY,
+        path: Optional[str] = None,
+        processes: int = 0,
+    ) -> None:
+        self._primes: Dict[int, Deque[int]] = {size: deque() for size in sizes}
+        if any(size < MIN_PRIME_BITS for size in self._primes):
+            raise ValueError(f"Primes need to have at least {MIN_PRIME_BITS} bits")
+        self.capacity = capacity
+        self.path = path
+        self.processes = processes
+        self._condition = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._executor: Optional[Executor] = None
+        self._stopping = False
+
+    def __len__(self) -> int:
+        with self._condition:
+            return sum(len(primes) for primes in self._primes.values())
+
+    def count(self, num_bits: int) -> int:
+        """Number of primes of given size currently in the pool.
+
+        Args:
+            num_bits: size of primes in bits
+
+        Returns:
+            number of available primes
+        """
+        with self._condition:
+            return len(self._primes.get(num_bits, ()))
+
+    def get(self, num_bits: int) -> int:
+        """Take a prime of given size from the pool.
+
+        If the pool has run out of primes of that size, a prime is searched for
+        synchronously. Primes of sizes that haven't been configured are always
+        searched for synchronously and the pool doesn't start keeping them, so
+        requests for arbitrary sizes can't make it grow.
+
+        Args:
+            num_bits: size of the prime in bits
+
+        Raises:
+            ValueError: if :code:`num_bits` is smaller than :code:`MIN_PRIME_BITS`
+
+        Returns:
+            a (probably) prime number with given number of bits
+        """
+        if num_bits < MIN_PRIME_BITS:
+            raise ValueError(f"Primes need to have at least {MIN_PRIME_BITS} bits")
+
+        with self._condition:
+            primes = self._primes.get(num_bits)
+            prime = primes.popleft() if primes else None
+            self._condition.notify_all()
+
+        if prime is None:
+            prime = find_prime(num_bits)
+        return prime
+
+    def add(self, num_bits: int, primes: Iterable[int]) -> None:
+        """Put primes of given size into the pool.
+
+        Primes of sizes that haven't been configured are ignored, so neither adding
+        nor loading primes can make the pool keep sizes it wasn't configured with.
+
+        Args:
+            num_bits: size of the primes in bits
+            primes: primes to be added
+        """
+        with self._condition:
+            if num_bits not in self._primes:
+                return
+            self._primes[num_bits].extend(primes)
+            self._condition.notify_all()
+
+    def start(self) -> None:
+        """Load the inventory if the pool has a file and start replenishing it."""
+        if self._thread is not None:
+            return
+        if self.path is not None:
+            self.load(self.path)
+        if self.processes > 0:
+            self._executor = ProcessPoolExecutor(self.processes)
+        self._stopping = False
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop replenishing the pool and move the inventory to the file, if any."""
+        if self._thread is None:
+            return
+        with self._condition:
+            self._stopping = True
+            self._condition.notify_all()
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+        self._thread.join()
+        self._thread = None
+        if self.path is not None:
+            self.save(self.path)
+
+    def _next_size(self) -> Optional[int]:
+        """Size of which the pool has the fewest primes, if any is below capacity."""
+        sizes = [
+            size for size, primes in self._primes.items() if len(primes) < self.capacity
+        ]
+        return min(sizes, key=lambda size: len(self._primes[size]), default=None)
+
+    def _search(self, num_bits: int) -> int:
+        """Find a prime of given size, in a worker process if there are any."""
+        if self._executor is None:
+            return find_prime(num_bits, lambda: self._stopping)
+        seed = random.getrandbits(64)
+        return self._executor.submit(_find_prime_task, num_bits, seed).result()
+
+    def _run(self) -> None:
+        """Replenish the pool until it is stopped."""
+        while True:
+            with self._condition:
+                num_bits = self._next_size()
+                while not self._stopping and num_bits is None:
+                    self._condition.wait()
+                    num_bits = self._next_size()
+                if self._stopping or num_bits is None:
+                    return
+
+            try:
+                prime = self._search(num_bits)
+            except (SearchCancelled, RuntimeError):
+                return
+
+            self.add(num_bits, [prime])
+
+    def load(self, path: str) -> None:
+        """Claim the inventory stored in a file and add it to the pool.
+
+        The file is renamed before being read, so no other process can claim the same
+        primes. It is removed once its contents have been added to the pool. Primes of
+        sizes that haven't been configured are discarded along with the file.
+
+        Args:
+            path: path of the file
+        """
+        claimed = f"{path}.{os.getpid()}.{threading.get_ident()}"
+        try:
+            os.replace(path, claimed)
+        except FileNotFoundError:
+            return
+
+        try:
+            with open(claimed) as f:
+                inventory = json.load(f)
+            if inventory.get("version") != FILE_VERSION:
+                raise ValueError(f"`{path}` is not a valid prime pool file")
+            for size, primes in inventory["primes"].items():
+                self.add(int(size), (int(prime, 16) for prime in primes))
+        finally:
+            os.remove(claimed)
+
+    def save(self, path: str) -> None:
+        """Move the inventory of the pool to a file.
+
+        Primes are removed from the pool so that they can't be handed out after they
+        have been saved. Inventory already stored in the file is claimed and merged
+        with the one of the pool.
+
+        Args:
+            path: path of the file
+        """
+        self.load(path)
+        with self._condition:
+            inventory: Dict[str, List[str]] = {
+                str(size): [format(prime, "x") for prime in primes]
+                for size, primes in self._primes.items()
+                if primes
+            }
+            for primes in self._primes.values():
+                primes.clear()
+
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, "w") as f:
+            json.dump({"version": FILE_VERSION, "primes": inventory}, f)
+        os.replace(tmp, path)
@@ -1,19 +1,252 @@
 """Prime number checking and generation utilities.
 
 This module contains functions for checking primality and finding big prime numbers.
+
+Attributes:
+    SMALL_PRIMES (List[int]): odd primes smaller than :code:`SMALL_PRIMES_LIMIT` used
+                              for sieving prime candidates before running the
+                              expensive primality test on them
+    SIEVE_WINDOW (int): number of consecutive odd candidates sieved at once
+    MIN_PRIME_BITS (int): smallest size of primes used for keys, smaller sizes have
+                          too few primes to pick distinct ones from
+    DETERMINISTIC_BASES (Tuple[int, ...]): Miller–Rabin bases which correctly
+                                           classify every number smaller than
+                                           :code:`DETERMINISTIC_LIMIT`
+    MILLER_RABIN_ROUNDS (Tuple[Tuple[int, int], ...]): pairs of minimal number of
+                                                       bits and number of random
+                                                       rounds needed for numbers of
+                                                       that size
+    MILLER_RABIN_MAX_ROUNDS (int): number of random rounds for numbers smaller than
+                                   the ones covered by :code:`MILLER_RABIN_ROUNDS`
 """
+import multiprocessing
 import random
+from concurrent.futures import FIRST_COMPLETED
+from concurrent.futures import Future
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import wait
+from typing import Any
+from typing import Callable
+from typing import Iterable
+from typing import Iterator
+from typing import List
+from typing import Optional
+from typing import Set
+
+from . import instrumentation
+
+SMALL_PRIMES_LIMIT = 1 << 15
+SIEVE_WINDOW = 1 << 12
+MIN_PRIME_BITS = 16
+
+DETERMINISTIC_LIMIT = 1 << 64
+DETERMINISTIC_BASES = (2, 3, 5, 7, 11, 13, 17, 19, 23, 29, 31, 37)
+
+MILLER_RABIN_ROUNDS = (
+    (1300, 2),
+    (850, 3),
+    (650, 4),
+    (550, 5),
+    (450, 6),
+    (400, 7),
+    (350, 8),
+    (300, 9),
+    (250, 12),
+    (200, 15),
+    (150, 18),
+    (100, 27),
+)
+MILLER_RABIN_MAX_ROUNDS = 40
+
+
+def _odd_primes_below(limit: int) -> List[int]:
+    """Find all odd primes smaller than given limit using sieve of Eratosthenes.
+
+    Args:
+        limit: upper bound (exclusive) for the primes
+
+    Returns:
+        sorted list of odd primes smaller than limit
+    """
+    sieve = bytearray([1]) * limit
+    sieve[:2] = b"\x00\x00"
+    for i in range(2, int(limit ** 0.5) + 1):
+        if sieve[i]:
+            sieve[i * i :: i] = bytes(len(range(i * i, limit, i)))
+    return [i for i in range(3, limit, 2) if sieve[i]]
+
+
+SMALL_PRIMES = _odd_primes_below(SMALL_PRIMES_LIMIT)
+
+
+class SearchCancelled(Exception):
+    """Raised when prime search is stopped before a prime has been found."""
+
+
+def miller_rabin_rounds(num_bits: int) -> int:
+    """Number of random-base Miller–Rabin rounds needed for a number of given size.
+
+    The counts come from table 4.4 of `Handbook of Applied Cryptography
+    <https://cacr.uwaterloo.ca/hac/about/chap4.pdf>`__ and are derived from the
+    bounds of Damgård, Landrock and Pomerance. They guarantee that a composite chosen
+    uniformly at random among numbers of given size is declared prime with
+    probability lower than :code:`2 ** -80`. The table only covers numbers with at
+    least 100 bits, smaller ones get 40 rounds, for which the worst-case bound of
+    :code:`4 ** -rounds` already gives that probability. The bound from the table
+    does not hold for numbers chosen by an adversary, for those an explicit number
+    of rounds or Baillie–PSW test should be used.
+
+    Args:
+        num_bits: size of the tested number in terms of bits
+
+    Returns:
+        number of rounds
+    """
+    for min_bits, num_rounds in MILLER_RABIN_ROUNDS:
+        if num_bits >= min_bits:
+            return num_rounds
+    return MILLER_RABIN_MAX_ROUNDS
+
+
+def is_strong_probable_prime(num: int, base: int) -> bool:
+    """Check whether a number is a strong probable prime to a given base.
+
+    This is a single round of `Miller–Rabin <https://en.wikipedia.org/wiki/Miller%E2%80%93Rabin_primality_test>`__
+    primality test.
+
+    Args:
+        num: odd number greater than 3
+        base: witness, :code:`1 < base < num - 1`
+
+    Returns:
+        whether the number is a strong probable prime to given base
+    """
+    stats = instrumentation.active
+    if stats is not None:
+        stats.count("miller_rabin_rounds")
+        stats.count("modexps")
+
+    r, d = 0, num - 1
+    while d % 2 == 0:
+        r += 1
+        d //= 2
+
+    x = pow(base, d, num)
+    if x == 1 or x == num - 1:
+        return True
+
+    for _ in range(r - 1):
+        x = pow(x, 2, num)
+        if x == num - 1:
+            return True
+
+    return False
+
 
+def _isqrt(num: int) -> int:
+    """Integer square root of a non-negative integer using Newton's method."""
+    if num < 2:
+        return num
+    x = 1 << ((num.bit_length() + 1) // 2)
+    while True:
+        y = (x + num // x) // 2
+        if y >= x:
+            return x
+        x = y
+
+
+def _jacobi(a: int, n: int) -> int:
+    """Jacobi symbol :code:`(a/n)` for odd positive :code:`n`."""
+    a %= n
+    result = 1
+    while a != 0:
+        while a % 2 == 0:
+            a //= 2
+            if n % 8 in (3, 5):
+                result = -result
+        a, n = n, a
+        if a % 4 == 3 and n % 4 == 3:
+            result = -result
+        a %= n
+    return result if n == 1 else 0
+
+
+def is_strong_lucas_probable_prime(num: int) -> bool:
+    """Check whether a number is a strong Lucas probable prime.
+
+    Lucas sequence parameters are chosen using Selfridge's method: :code:`D` is the
+    first element of :code:`5, -7, 9, -11, ...` for which Jacobi symbol
+    :code:`(D/num)` equals -1, :code:`P = 1` and :code:`Q = (1 - D) / 4`.
+
+    Args:
+        num: odd number greater than 3
 
-def is_prime(num: int, num_rounds: int = 40) -> bool:
+    Returns:
+        whether the number is a strong Lucas probable prime
+    """
+    instrumentation.count("lucas_tests")
+    if _isqrt(num) ** 2 == num:
+        return False
+
+    D = 5
+    while True:
+        jacobi = _jacobi(D, num)
+        if jacobi == -1:
+            break
+        if jacobi == 0 and abs(D) != num:
+            return False
+        D = -D - 2 if D > 0 else -D + 2
+
+    P, Q = 1, (1 - D) // 4
+
+    s, d = 0, num + 1
+    while d % 2 == 0:
+        s += 1
+        d //= 2
+
+    u, v, q_k = 1, P, Q % num
+    for bit in bin(d)[3:]:
+        u, v, q_k = u * v % num, (v * v - 2 * q_k) % num, q_k * q_k % num
+        if bit == "1":
+            u, v = P * u + v, D * u + P * v
+            u = (u + num if u % 2 else u) // 2 % num
+            v = (v + num if v % 2 else v) // 2 % num
+            q_k = q_k * Q % num
+
+    if u == 0 or v == 0:
+        return True
+
+    for _ in range(s - 1):
+        v, q_k = (v * v - 2 * q_k) % num, q_k * q_k % num
+        if v == 0:
+            return True
+
+    return False
+
+
+def is_prime(
+    num: int, num_rounds: Optional[int] = None, baillie_psw: bool = False
+) -> bool:
     """Probabilistically determine if a given number is a prime.
 
     This function uses `Miller–Rabin <https://en.wikipedia.org/wiki/Miller%E2%80%93Rabin_primality_test>`__
     primality test to probabilistically determine if the provided number is prime.
+    Every number is first tested to base 2, which rejects most composites at the
+    cost of a single round. Numbers smaller than :code:`2 ** 64` are then tested
+    against :code:`DETERMINISTIC_BASES`, which makes the answer exact. Bigger numbers
+    go through :code:`num_rounds` rounds with random bases, by default as many as
+    :func:`miller_rabin_rounds` requires for error probability below
+    :code:`2 ** -80`.
+
+    If :code:`baillie_psw` is set, base 2 test is followed by a strong Lucas test,
+    which makes up `Baillie–PSW <https://en.wikipedia.org/wiki/Baillie%E2%80%93PSW_primality_test>`__
+    test for which no composite passing it is known. In that case random-base rounds
+    are only performed if :code:`num_rounds` is set explicitly.
 
     Args:
         num: prime candidate
-        num_rounds: number of iterations inside the algorithm
+        num_rounds: number of iterations with random bases inside the algorithm
+        baillie_psw: whether to perform strong Lucas test
 
     Returns:
         whether the number is a prime or not
@@ -23,26 +256,26 @@ def is_prime(num: int, num_rounds: int = 40) -> bool:
     if num <= 1 or num % 2 == 0:  # pragma: no cover
         return False
 
-    r, d = 0, num - 1
-    while d % 2 == 0:
-        r += 1
-        d //= 2
+    if not is_strong_probable_prime(num, 2):
+        instrumentation.count("rejected.miller_rabin_base_2")
+        return False
 
-    for _ in range(num_rounds):
-        a = random.randrange(2, num - 1)
-        x = pow(a, d, num)
+    if num < DETERMINISTIC_LIMIT:
+        bases: Iterable[int] = (b for b in DETERMINISTIC_BASES[1:] if b < num - 1)
+    else:
+        if baillie_psw and not is_strong_lucas_probable_prime(num):
+            instrumentation.count("rejected.lucas")
+            return False
 
-        if x == 1 or x == num - 1:
-            continue
+        if num_rounds is None:
+            num_rounds = 0 if baillie_psw else miller_rabin_rounds(num.bit_length())
+        bases = (random.randrange(2, num - 1) for _ in range(num_rounds))
 
-        for _ in range(r - 1):
-            x = pow(x, 2, num)
-            if x == num - 1:
-                break
-        else:
-            return False
+    if all(is_strong_probable_prime(num, base) for base in bases):
+        return True
 
-    return True
+    instrumentation.count("rejected.miller_rabin")
+    return False
 
 
 def generate_prime_candidate(num_bits: int) -> int:
@@ -57,19 +290,150 @@ def generate_prime_candidate(num_bits: int) -> int:
     return random.getrandbits(num_bits) | ((1 << num_bits - 1) | 1)
 
 
-def find_prime(num_bits: int) -> int:
+def sieve_candidates(start: int, window: int = SIEVE_WINDOW) -> Iterator[int]:
+    """Walk odd numbers starting from :code:`start` skipping those with small factors.
+
+    Residues of :code:`start` modulo each of :code:`SMALL_PRIMES` are computed only
+    once. Candidates are then sieved in windows of :code:`window` consecutive odd
+    numbers, and residues are updated incrementally when moving to the next window,
+    so that no big number division is performed while walking.
+
+    Args:
+        start: odd number to start the walk from
+        window: number of consecutive odd numbers sieved at once
+
+    Returns:
+        iterator over odd numbers greater or equal to :code:`start` that aren't
+        divisible by any of :code:`SMALL_PRIMES`
+    """
+    residues = [start % p for p in SMALL_PRIMES]
+    zeros = memoryview(bytes(window))
+
+    while True:
+        sieve = bytearray([1]) * window
+        for p, r in zip(SMALL_PRIMES, residues):
+            # smallest k such that start + 2k is divisible by p
+            k = (p - r) * ((p + 1) >> 1) % p
+            sieve[k::p] = zeros[: len(range(k, window, p))]
+
+        for k in range(window):
+            if sieve[k]:
+                yield start + 2 * k
+
+        start += 2 * window
+        residues = [(r + 2 * window) % p for p, r in zip(SMALL_PRIMES, residues)]
+
+
+def find_prime(num_bits: int, should_stop: Optional[Callable[[], bool]] = None) -> int:
     """Find a prime represented with given number of bits.
 
-    Generates random numbers of given size until one of them is deemed prime by
-    a probabilistic primality check.
+    Starts from a random odd number of given size and walks forward through the
+    numbers which survive sieving by :code:`SMALL_PRIMES` until one of them is deemed
+    prime by a probabilistic primality check. If the walk runs out of numbers of
+    given size it restarts from another random number. Numbers too small for
+    sieving to make sense are found by testing random candidates.
 
     Args:
         num_bits: size of the prime in terms of bits required  for representing it
+        should_stop: optional callable checked before testing each candidate, the
+                     search is abandoned as soon as it returns :code:`True`
+
+    Raises:
+        SearchCancelled: if the search has been stopped by :code:`should_stop`
 
     Returns:
         a (probably) prime number with given number of bits
     """
-    while True:
-        num = generate_prime_candidate(num_bits)
-        if is_prime(num):
-            return num
+    stats = instrumentation.active
+    with instrumentation.timer("find_prime"):
+        if num_bits <= SMALL_PRIMES_LIMIT.bit_length():
+            while True:
+                num = generate_prime_candidate(num_bits)
+                if should_stop is not None and should_stop():
+                    raise SearchCancelled
+                if stats is not None:
+                    stats.count("candidates")
+                if is_prime(num):
+                    return num
+
+        while True:
+            start = generate_prime_candidate(num_bits)
+            previous = start - 2
+            for num in sieve_candidates(start):
+                if num.bit_length() > num_bits:
+                    break
+                if should_stop is not None and should_stop():
+                    raise SearchCancelled
+                if stats is not None:
+                    stats.count("candidates")
+                    if num - previous > 2:
+                        stats.count("sieve_rejections", (num - previous) // 2 - 1)
+                    previous = num
+                if is_prime(num):
+                    return num
+
+
+_stop_event: Any = None
+
+
+def _init_worker(stop_event: Any) -> None:
+    """Store the event signalling worker processes to stop searching."""
+    global _stop_event
+    _stop_event = stop_event
+
+
+def _find_prime_task(num_bits: int, seed: int) -> int:
+    """Search for a prime inside of a worker process.
+
+    Worker processes may inherit state of the random number generator from the
+    parent, so it's reseeded to make each of them search a different region. If the
+    worker has been initialized with a stop event, the search is cancelled once the
+    event is set.
+    """
+    random.seed(seed)
+    return find_prime(num_bits, None if _stop_event is None else _stop_event.is_set)
+
+
+def find_primes(num_bits: int, count: int, workers: int) -> List[int]:
+    """Find distinct primes of given size using a pool of worker processes.
+
+    Each of the workers searches for a prime starting from its own random number.
+    Primes are collected in the order they are found and once :code:`count` of them
+    have been found the remaining searches are cancelled.
+
+    Args:
+        num_bits: size of the primes in terms of bits required for representing them
+        count: number of distinct primes to find
+        workers: number of worker processes
+
+    Returns:
+        list of :code:`count` distinct (probably) prime numbers with given number of
+        bits
+    """
+    ctx = multiprocessing.get_context()
+    stop_event = ctx.Event()
+    primes: List[int] = []
+
+    with ProcessPoolExecutor(
+        workers, mp_context=ctx, initializer=_init_worker, initargs=(stop_event,)
+    ) as executor:
+
+        def submit() -> "Future[int]":
+            return executor.submit(_find_prime_task, num_bits, random.getrandbits(64))
+
+        pending: Set["Future[int]"] = {submit() for _ in range(max(workers, count))}
+        try:
+            while len(primes) < count:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    prime = future.result()
+                    if prime not in primes and len(primes) < count:
+                        primes.append(prime)
+                    else:
+                        pending.add(submit())
+        finally:
+            stop_event.set()
+            for future in pending:
+                future.cancel()
+
+    return primes
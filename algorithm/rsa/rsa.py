@@ -1,19 +1,132 @@
 """Implementation of core functions of RSA cryptosystem.
 """
 import base64
+from concurrent.futures import Executor
+from concurrent.futures import ProcessPoolExecutor
+from functools import reduce
+from math import gcd
+from operator import mul
+from typing import Callable
+from typing import Dict
+from typing import Iterable
+from typing import List
+from typing import Optional
+from typing import Sequence
 from typing import Tuple
 from typing import Union
 
 from . import config
+from . import instrumentation
+from .batch import check_family_exponents
+from .batch import FAMILY_EXPONENTS
+from .envelope import decrypt_envelope
+from .envelope import encrypt_envelope
+from .envelope import is_envelope
+from .keys import LENGTH_MARKER
+from .keys import length_suffix
+from .keys import load_private_key
+from .keys import load_public_key
+from .keys import PublicKey
+from .modular import modinv
+from .pool import PrimePool
 from .primes import find_prime
-from .utils import decode_key
+from .primes import find_primes
+from .primes import MIN_PRIME_BITS
+from .utils import crt_params
 from .utils import encode_key
+from .utils import encode_private_key
 from .utils import lcm
 from .utils import powmod
-from .utils import xgcd
+from .utils import powmod_crt
 
+KEY_BATCH_SIZE = 16
+MAX_REJECTED_PRIMES = 64
 
-def initialize(num_bits: int) -> Tuple[int, int, int, int, int, int]:
+
+def initialize_multi_prime(
+    num_bits: int,
+    num_primes: int = 3,
+    workers: int = 1,
+    pool: Optional[PrimePool] = None,
+    should_stop: Optional[Callable[[], bool]] = None,
+    e: int = 65_537,
+) -> Tuple[List[int], int, int, int, int]:
+    """Generate all parameters of a multi-prime RSA key.
+
+    The modulus is a product of :code:`num_primes` distinct primes, so it's about
+    :code:`num_primes * num_bits` bits long. For a given size of the modulus the
+    primes are smaller the more of them there are, which makes them faster to find
+    and makes CRT decryption cheaper, as exponentiation modulo each of the primes
+    costs roughly the cube of its size.
+
+    Args:
+        num_bits: number of bits in primes to be generated
+        num_primes: number of primes, at least 2
+        workers: number of processes searching for primes, if greater than 1 the
+                 primes are searched for concurrently using :func:`find_primes`
+        pool: pool of pregenerated primes to take the primes from, if provided
+              :code:`workers` is ignored
+        should_stop: optional callable checked while searching for primes in the
+                     calling process, see :func:`rsa.primes.find_prime`
+        e: odd public exponent greater than 1, primes :code:`p` for which
+           :code:`p - 1` isn't coprime with it are skipped
+
+    Raises:
+        ValueError: if :code:`num_bits` is smaller than
+                    :code:`rsa.primes.MIN_PRIME_BITS`, :code:`num_primes` is
+                    smaller than 2, :code:`e` isn't a valid public exponent or
+                    :code:`MAX_REJECTED_PRIMES` primes found in a row were either
+                    already chosen or skipped because of :code:`e`
+        SearchCancelled: if the search has been stopped by :code:`should_stop`
+
+    Returns:
+        list of primes, n, e, d, phi where phi is the least common multiple of the
+        primes decreased by one
+    """
+    if num_bits < MIN_PRIME_BITS:
+        raise ValueError(f"Primes need to have at least {MIN_PRIME_BITS} bits")
+    if num_primes < 2:
+        raise ValueError("Key needs to have at least 2 primes")
+    if e < 3 or e % 2 == 0:
+        raise ValueError("Public exponent needs to be an odd number greater than 1")
+
+    primes: List[int] = []
+    rejected = 0
+    with instrumentation.timer("initialize.primes"):
+        while len(primes) < num_primes:
+            if rejected >= MAX_REJECTED_PRIMES:
+                raise ValueError(
+                    f"Couldn't find {num_primes} distinct primes of {num_bits} bits "
+                    "suitable for the public exponent"
+                )
+            if pool is None and workers > 1:
+                candidates = find_primes(num_bits, num_primes - len(primes), workers)
+            elif pool is None:
+                candidates = [find_prime(num_bits, should_stop)]
+            else:
+                candidates = [pool.get(num_bits)]
+            for prime in candidates:
+                if prime not in primes and gcd(prime - 1, e) == 1:
+                    primes.append(prime)
+                    rejected = 0
+                else:
+                    rejected += 1
+
+    with instrumentation.timer("initialize.exponent"):
+        n = reduce(mul, primes)
+        phi = reduce(lcm, (prime - 1 for prime in primes))
+        d = modinv(e, phi)
+
+    return primes, n, e, d, phi
+
+
+def initialize(
+    num_bits: int,
+    workers: int = 1,
+    pool: Optional[PrimePool] = None,
+    should_stop: Optional[Callable[[], bool]] = None,
+    e: int = 65_537,
+) -> Tuple[int, int, int, int, int, int]:
     """Generate RSA all parameters needed by the RSA algorithm.
 
     The following parameters are generated:
@@ -21,25 +134,82 @@ def initialize(num_bits: int) -> Tuple[int, int, int, int, int, int]:
         - q: a random prime
         - n: product of p and q
         - phi: lcm(p-1, q - 1)
-        - e: 65_537
+        - e: 65_537, unless another public exponent is provided
         - d: modular multiplicative inverse of e modulo phi
 
+    Keys with more than two primes are generated using
+    :func:`initialize_multi_prime`. Families of keys sharing a modulus, whose
+    ciphertexts can be decrypted in batches, are generated using
+    :func:`initialize_family`.
+
     Args:
         num_bits: number of bits in primes to be generated
+        workers: number of processes searching for primes, if greater than 1 the
+                 primes are searched for concurrently using :func:`find_primes`
+        pool: pool of pregenerated primes to take the primes from, if provided
+              :code:`workers` is ignored
+        should_stop: optional callable checked while searching for primes in the
+                     calling process, see :func:`rsa.primes.find_prime`
+        e: public exponent, see :func:`initialize_multi_prime`
+
+    Raises:
+        ValueError: if :code:`num_bits` is too small or :code:`e` isn't a valid
+                    public exponent, see :func:`initialize_multi_prime`
+        SearchCancelled: if the search has been stopped by :code:`should_stop`
 
     Returns:
         p, q, n, e, d, phi
     """
-    p = find_prime(num_bits)
-    q = find_prime(num_bits)
-    n = p * q
-    phi = lcm(p - 1, q - 1)
-    e = 65_537
-    _, d, _ = xgcd(e, phi)
-
+    (p, q), n, e, d, phi = initialize_multi_prime(
+        num_bits, 2, workers, pool, should_stop, e
+    )
     return p, q, n, e, d, phi
 
 
+def initialize_family(
+    num_bits: int,
+    exponents: Sequence[int] = FAMILY_EXPONENTS,
+    workers: int = 1,
+    pool: Optional[PrimePool] = None,
+    should_stop: Optional[Callable[[], bool]] = None,
+) -> Tuple[int, int, int, List[int], List[int], int]:
+    """Generate parameters of a family of keys sharing a modulus.
+
+    Each key of the family has its own public exponent, which need to be pairwise
+    coprime, so that ciphertexts encrypted using different keys of the family can
+    be decrypted together by :class:`rsa.batch.BatchDecryptor`. The primes are
+    chosen so that all the exponents are valid, i.e. as if the key was generated
+    by :func:`initialize` with the product of the exponents as :code:`e`.
+
+    Since the keys share a modulus, anyone holding one of the private keys can
+    factor it, so the family should be used only by a single holder of all the
+    private keys, e.g. to spread clients over several keys whose ciphertexts are
+    decrypted by the same service.
+
+    Args:
+        num_bits: number of bits in primes to be generated
+        exponents: pairwise coprime public exponents of the keys
+        workers: number of processes searching for primes
+        pool: pool of pregenerated primes to take the primes from
+        should_stop: optional callable checked while searching for primes, see
+                     :func:`initialize_multi_prime`
+
+    Raises:
+        ValueError: if :code:`num_bits` is too small, see
+                    :func:`initialize_multi_prime`, or the exponents aren't valid
+                    public exponents or aren't pairwise coprime
+        SearchCancelled: if the search has been stopped by :code:`should_stop`
+
+    Returns:
+        p, q, n, public exponents, private exponents, phi
+    """
+    check_family_exponents(exponents)
+    p, q, n, _, _, phi = initialize(
+        num_bits, workers, pool, should_stop, reduce(mul, exponents)
+    )
+    return p, q, n, list(exponents), [modinv(e, phi) for e in exponents], phi
+
+
 def encrypt(string: Union[str, bytes], n: int, e: int) -> bytes:
     """Encrypt message using a key made up of modulus and exponent.
 
@@ -55,81 +225,296 @@ def encrypt(string: Union[str, bytes], n: int, e: int) -> bytes:
     Returns:
         encrypted message
     """
-    if isinstance(string, str):
-        text = int.from_bytes(string.encode(config.ENCODING), config.BYTEORDER)
-    else:
-        text = int.from_bytes(string, config.BYTEORDER)
-    text = powmod(text, e, n)
+    with instrumentation.timer("encrypt"):
+        if isinstance(string, str):
+            text = int.from_bytes(string.encode(config.ENCODING), config.BYTEORDER)
+        else:
+            text = int.from_bytes(string, config.BYTEORDER)
+        text = powmod(text, e, n)
 
-    return text.to_bytes((text.bit_length() + 7) // 8, config.BYTEORDER)
+        return text.to_bytes((text.bit_length() + 7) // 8, config.BYTEORDER)
 
 
-def decrypt(string: bytes, n: int, d: int) -> str:
+def decrypt(
+    string: bytes,
+    n: int,
+    d: int,
+    crt: Optional[Tuple[int, ...]] = None,
+) -> str:
     """Decrypt message using a key made up of modulus and exponent.
 
     Incoming bytes are converted into a big integer :code:`num`. The message is
-    decrypted by calculating :code:`num ** d % n`.
+    decrypted by calculating :code:`num ** d % n`. If CRT parameters of the key are
+    provided the calculation is done using :func:`powmod_crt` which is several times
+    faster.
 
     Args:
         string: encrypted message
         n: modulus
         d: exponent
+        crt: optional :code:`(p, q, dP, dQ, qInv)` tuple, followed by parameters of
+             the other primes of multi-prime keys, see :func:`rsa.utils.crt_params`
 
     Returns:
         decrypted message
     """
-    ciphertext = int.from_bytes(string, config.BYTEORDER)
-    ciphertext = powmod(ciphertext, d, n)
+    with instrumentation.timer("decrypt"):
+        ciphertext = int.from_bytes(string, config.BYTEORDER)
+        if crt is None:
+            ciphertext = powmod(ciphertext, d, n)
+        else:
+            ciphertext = powmod_crt(ciphertext, *crt)
 
-    return ciphertext.to_bytes(
-        (ciphertext.bit_length() + 7) // 8, config.BYTEORDER
-    ).decode(config.ENCODING)
+        return ciphertext.to_bytes(
+            (ciphertext.bit_length() + 7) // 8, config.BYTEORDER
+        ).decode(config.ENCODING)
 
 
-def keygen(num_bits: int) -> Tuple[str, str]:
+def keygen(
+    num_bits: int,
+    workers: int = 1,
+    pool: Optional[PrimePool] = None,
+    num_primes: int = 2,
+    should_stop: Optional[Callable[[], bool]] = None,
+) -> Tuple[str, str]:
     """Generates pair of base64-encoded keys.
 
     Args:
         num_bits: number of bits in primes used by the RSA
+        workers: number of processes searching for primes
+        pool: pool of pregenerated primes to take the primes from
+        num_primes: number of primes making up the modulus, see
+                    :func:`initialize_multi_prime`
+        should_stop: optional callable checked while searching for primes, see
+                     :func:`initialize_multi_prime`
+
+    Raises:
+        ValueError: if :code:`num_bits` is too small for :code:`num_primes`, see
+                    :func:`initialize_multi_prime`
+        SearchCancelled: if the search has been stopped by :code:`should_stop`
 
     Returns:
         base64 encoded public and private key
     """
-    *_, n, e, d, _ = initialize(num_bits)
-    return encode_key(n, e), encode_key(n, d)
+    primes, n, e, d, _ = initialize_multi_prime(
+        num_bits, num_primes, workers, pool, should_stop
+    )
+    p, q, *other_primes = primes
+    return (
+        encode_key(n, e),
+        encode_private_key(n, d, p, q, *crt_params(p, q, d, *other_primes)),
+    )
+
+
+def encrypt_bytes(
+    data: Union[bytes, bytearray, memoryview],
+    key: str,
+    workers: int = 1,
+    executor: Optional[Executor] = None,
+    hybrid: bool = False,
+) -> str:
+    """Encrypt and base64-encode bytes using base64-encoded key.
+
+    Unlike :func:`base64_encrypt` the data isn't converted from text, and blocks
+    are slices of a :code:`memoryview` of it, so it isn't copied. See
+    :meth:`rsa.keys.PublicKey.encrypt_bytes`.
+
+    Args:
+        data: bytes to be encrypted
+        key: base64 encoded key
+        workers: number of processes encrypting blocks of big messages
+        executor: process pool to use instead of creating one
+        hybrid: whether to encrypt the data into an envelope, see
+                :func:`base64_encrypt`
+
+    Returns:
+        base64 encoded ciphertext
+    """
+    if hybrid:
+        return base64.urlsafe_b64encode(encrypt_envelope(data, key)).decode()
+    return load_public_key(key).encrypt_bytes(data, workers, executor)
+
+
+def _decrypt_bytes(
+    ciphertext: str, key: str, workers: int, executor: Optional[Executor]
+) -> bytearray:
+    """Decrypt base64-encoded ciphertext or envelope into bytes."""
+    private_key = load_private_key(key)
+    if "." not in ciphertext and LENGTH_MARKER not in ciphertext:
+        data = base64.urlsafe_b64decode(ciphertext)
+        # blocks of the ciphertext are never longer than the modulus
+        if len(data) > private_key.num_bytes and is_envelope(data):
+            return bytearray(decrypt_envelope(data, private_key))
+    return private_key.decrypt_bytes(ciphertext, workers, executor)
+
+
+def decrypt_bytes(
+    ciphertext: str, key: str, workers: int = 1, executor: Optional[Executor] = None
+) -> bytearray:
+    """Decrypt base64-encoded ciphertext into bytes using base64-encoded key.
+
+    Decrypted blocks are written into a single preallocated buffer and aren't
+    decoded into text, see :meth:`rsa.keys.PrivateKey.decrypt_bytes`.
+
+    Args:
+        ciphertext: base64 encoded ciphertext or envelope
+        key: base64 encoded private key
+        workers: number of processes decrypting blocks of big ciphertexts
+        executor: process pool to use instead of creating one
+
+    Raises:
+        ValueError: if the ciphertext hasn't been encrypted using the corresponding
+                    public key
+
+    Returns:
+        decrypted bytes
+    """
+    return _decrypt_bytes(ciphertext, key, workers, executor)
 
 
-def base64_encrypt(message: str, key: str) -> str:
+def base64_encrypt(
+    message: str,
+    key: str,
+    workers: int = 1,
+    executor: Optional[Executor] = None,
+    hybrid: bool = False,
+) -> str:
     """Encrypt and base64-encode message using base64-encoded key.
 
+    Decoded keys are cached, so repeated calls with the same key don't decode it
+    again. See :func:`rsa.keys.load_public_key`.
+
+    Blocks of big messages can be encrypted in parallel by a pool of processes, either
+    created for the call if :code:`workers` is greater than 1 or provided as
+    :code:`executor`. See :func:`rsa.parallel.map_blocks`.
+
+    In hybrid mode the message is instead encrypted into an envelope, which uses a
+    single RSA operation regardless of the size of the message, see
+    :mod:`rsa.envelope`. Envelopes are much faster to encrypt and decrypt for all
+    but the shortest messages, but are bigger than a single block of ciphertext and
+    differ every time the same message is encrypted. :code:`workers` and
+    :code:`executor` are ignored in that case.
+
     Args:
         message: message to be encrypted
         key: base64 encoded key
+        workers: number of processes encrypting blocks of big messages
+        executor: process pool to use instead of creating one
+        hybrid: whether to encrypt the message into an envelope
 
     Returns:
         base64 encoded ciphertext
     """
-    mod, exp = decode_key(key)
-    n = (mod.bit_length() + 7) // 8 - 1
-    message_bytes = message.encode(config.ENCODING)
-    return ".".join(
-        base64.urlsafe_b64encode(encrypt(message_bytes[i : i + n], mod, exp)).decode()
-        for i in range(0, len(message_bytes), n)
-    )
+    if hybrid:
+        return encrypt_bytes(message.encode(config.ENCODING), key, hybrid=True)
+    return load_public_key(key).encrypt(message, workers, executor)
 
 
-def base64_decrypt(ciphertext: str, key: str) -> str:
+def base64_decrypt(
+    ciphertext: str, key: str, workers: int = 1, executor: Optional[Executor] = None
+) -> str:
     """Decrypt base64-encoded ciphertext using base64-encoded key.
 
+    Decoded keys are cached, so repeated calls with the same key don't decode it
+    again. See :func:`rsa.keys.load_private_key`. Blocks of big ciphertexts can be
+    decrypted in parallel the same way as in :func:`base64_encrypt`. Envelopes
+    produced in hybrid mode are recognized and decrypted as such.
+
     Args:
-        ciphertext: base64 encoded ciphertext
-        key: base64 encoded key
+        ciphertext: base64 encoded ciphertext or envelope
+        key: base64 encoded private key, either extended with CRT parameters or
+             the legacy one consisting of modulus and exponent only
+        workers: number of processes decrypting blocks of big ciphertexts
+        executor: process pool to use instead of creating one
 
     Returns:
         decrypted message
     """
-    mod, exp = decode_key(key)
-    return "".join(
-        decrypt(base64.urlsafe_b64decode(chunk), mod, exp)
-        for chunk in ciphertext.split(".")
-    )
+    return _decrypt_bytes(ciphertext, key, workers, executor).decode(config.ENCODING)
+
+
+def _encrypt_for_keys(
+    keys: Sequence[PublicKey], nums: Sequence[int], suffix: str
+) -> List[str]:
+    """Encrypt message represented as integers of its blocks using each of the keys."""
+    ciphertexts = []
+    for key in keys:
+        blocks = []
+        for num in nums:
+            encrypted = key.encrypt_int(num)
+            size = (encrypted.bit_length() + 7) // 8
+            blocks.append(
+                base64.urlsafe_b64encode(encrypted.to_bytes(size, config.BYTEORDER))
+            )
+        ciphertexts.append(b".".join(blocks).decode() + suffix)
+    return ciphertexts
+
+
+def encrypt_many(
+    message: str,
+    keys: Iterable[Union[str, PublicKey]],
+    workers: int = 1,
+    executor: Optional[Executor] = None,
+) -> Dict[str, str]:
+    """Encrypt and base64-encode the same message using each of the keys.
+
+    The message is encoded only once and keys are grouped by size of their blocks,
+    so that the message is split into blocks and the blocks are converted to
+    integers once per group rather than once per key. Keys are decoded through the
+    cache of :func:`rsa.keys.load_public_key` and duplicate keys are encrypted for
+    only once. Each ciphertext is the same as the one :func:`base64_encrypt` would
+    produce for the key.
+
+    Keys are encrypted for in batches of :code:`KEY_BATCH_SIZE`, which can be
+    processed in parallel by a pool of processes, either created for the call if
+    :code:`workers` is greater than 1 or provided as :code:`executor`.
+
+    Args:
+        message: message to be encrypted
+        keys: base64 encoded keys or public key objects
+        workers: number of processes encrypting for batches of keys
+        executor: process pool to use instead of creating one
+
+    Raises:
+        ValueError: if different keys share a modulus, and with it a fingerprint
+
+    Returns:
+        mapping of hex-encoded fingerprints of the keys to ciphertexts
+    """
+    data = memoryview(message.encode(config.ENCODING))
+
+    groups: Dict[int, Dict[str, PublicKey]] = {}
+    for key in keys:
+        if isinstance(key, str):
+            key = load_public_key(key)
+        group = groups.setdefault(key.chunk_size, {})
+        fingerprint = key.fingerprint.hex()
+        if group.get(fingerprint, key).e != key.e:
+            raise ValueError("Keys sharing a modulus can't be told apart")
+        group[fingerprint] = key
+
+    fingerprints: List[List[str]] = []
+    tasks: List[Tuple[List[PublicKey], List[int], str]] = []
+    for chunk_size, group in groups.items():
+        blocks = [data[i : i + chunk_size] for i in range(0, len(data), chunk_size)]
+        nums = [int.from_bytes(block, config.BYTEORDER) for block in blocks]
+        suffix = length_suffix(blocks[-1]) if blocks else ""
+        batches = list(group)
+        for i in range(0, len(batches), KEY_BATCH_SIZE):
+            fingerprints.append(batches[i : i + KEY_BATCH_SIZE])
+            tasks.append(([group[f] for f in fingerprints[-1]], nums, suffix))
+
+    with instrumentation.timer("encrypt"):
+        if len(tasks) < 2 or (executor is None and workers <= 1):
+            results = [_encrypt_for_keys(*task) for task in tasks]
+        elif executor is None:
+            with ProcessPoolExecutor(workers) as pool:
+                results = list(pool.map(_encrypt_for_keys, *zip(*tasks)))
+        else:
+            results = list(executor.map(_encrypt_for_keys, *zip(*tasks)))
+
+    return {
+        fingerprint: ciphertext
+        for batch, ciphertexts in zip(fingerprints, results)
+        for fingerprint, ciphertext in zip(batch, ciphertexts)
+    }
@@ -0,0 +1,182 @@
+"""Incremental encryption and decryption.
+
+Encryptor and decryptor objects follow the interface of :mod:`hashlib` objects:
+data is fed to them in pieces of arbitrary size using :code:`update` and the
+remaining output is retrieved using :code:`finalize`. Only the incomplete block is
+kept between calls, so memory usage doesn't depend on the size of the message.
+
+The output has the same format as that of :func:`rsa.encrypt_bytes`, meaning that
+concatenated output of an encryptor can be decrypted using
+:func:`rsa.decrypt_bytes` and vice versa. The last block is kept until
+:code:`finalize` is called, so that the size of the last block can be appended to
+the ciphertext if it ends with zero bytes, see :mod:`rsa.keys`.
+
+Example:
+    >>> from rsa import Decryptor, Encryptor, keygen
+    >>> public, private = keygen(512)
+    >>> encryptor = Encryptor(public)
+    >>> ciphertext = encryptor.update(b"Hello ") + encryptor.update(b"world!")
+    >>> ciphertext += encryptor.finalize()
+    >>> decryptor = Decryptor(private)
+    >>> print((decryptor.update(ciphertext) + decryptor.finalize()).decode())
+    Hello world!
+"""
+
+import base64
+from typing import Union
+
+from .keys import length_suffix
+from .keys import load_private_key
+from .keys import load_public_key
+from .keys import PrivateKey
+from .keys import PublicKey
+from .keys import restore_last_block
+from .keys import split_ciphertext
+
+
+class Encryptor:
+    """Incrementally encrypts and base64-encodes a message.
+
+    Args:
+        key: public key object or base64 encoded key
+    """
+
+    def __init__(self, key: Union[str, PublicKey]) -> None:
+        self.key = load_public_key(key) if isinstance(key, str) else key
+        self._buffer = bytearray()
+        self._started = False
+        self._finalized = False
+
+    def _encode(self, block: Union[bytes, bytearray, memoryview]) -> bytes:
+        """Encrypt and base64-encode a block prepending separator if needed."""
+        encoded = base64.urlsafe_b64encode(self.key.encrypt_block(block))
+        if self._started:
+            return b"." + encoded
+        self._started = True
+        return encoded
+
+    def update(self, data: bytes) -> bytes:
+        """Feed the next part of the message to the encryptor.
+
+        Args:
+            data: next part of the message
+
+        Raises:
+            ValueError: if the encryptor has already been finalized
+
+        Returns:
+            ciphertext of all the blocks completed by the data, except for the last
+            one
+        """
+        if self._finalized:
+            raise ValueError("Encryptor has already been finalized")
+
+        self._buffer += data
+        chunk_size = self.key.chunk_size
+        # the last block is kept even if it's complete, since it may need its size
+        end = max(len(self._buffer) - 1, 0) // chunk_size * chunk_size
+        if end == 0:
+            return b""
+
+        with memoryview(self._buffer) as view:
+            out = b"".join(
+                self._encode(view[i : i + chunk_size])
+                for i in range(0, end, chunk_size)
+            )
+        del self._buffer[:end]
+        return out
+
+    def finalize(self) -> bytes:
+        """Encrypt the remaining incomplete block.
+
+        Raises:
+            ValueError: if the encryptor has already been finalized
+
+        Returns:
+            ciphertext of the last block, followed by its size if it ends with zero
+            bytes, or nothing if the message is empty
+        """
+        if self._finalized:
+            raise ValueError("Encryptor has already been finalized")
+
+        self._finalized = True
+        if not self._buffer:
+            return b""
+        out = self._encode(self._buffer) + length_suffix(self._buffer).encode()
+        self._buffer.clear()
+        return out
+
+
+class Decryptor:
+    """Incrementally decrypts base64-encoded ciphertext.
+
+    Args:
+        key: private key object or base64 encoded private key
+    """
+
+    def __init__(self, key: Union[str, PrivateKey]) -> None:
+        self.key = load_private_key(key) if isinstance(key, str) else key
+        self._buffer = bytearray()
+        self._finalized = False
+
+    def _decode(self, chunk: Union[bytes, bytearray]) -> bytes:
+        """Base64-decode and decrypt a single block."""
+        block = self.key.decrypt_block(base64.urlsafe_b64decode(bytes(chunk)))
+        if len(block) > self.key.chunk_size:
+            raise ValueError("Ciphertext has not been encrypted using this key")
+        return block
+
+    def update(self, data: bytes) -> bytes:
+        """Feed the next part of the ciphertext to the decryptor.
+
+        Every block except the last one holds exactly :code:`chunk_size` bytes, so
+        zero bytes lost at their ends when they're converted to integers are
+        restored, the same way :meth:`rsa.keys.PrivateKey.decrypt_bytes` does.
+
+        Args:
+            data: next part of the ciphertext
+
+        Raises:
+            ValueError: if the decryptor has already been finalized or a block
+                        doesn't decrypt into at most :code:`chunk_size` bytes
+
+        Returns:
+            decrypted bytes of all the blocks completed by the data
+        """
+        if self._finalized:
+            raise ValueError("Decryptor has already been finalized")
+
+        self._buffer += data
+        end = self._buffer.rfind(b".")
+        if end == -1:
+            return b""
+
+        chunk_size = self.key.chunk_size
+        out = b"".join(
+            self._decode(chunk).ljust(chunk_size, b"\0")
+            for chunk in self._buffer[:end].split(b".")
+        )
+        del self._buffer[: end + 1]
+        return out
+
+    def finalize(self) -> bytes:
+        """Decrypt the last block.
+
+        Raises:
+            ValueError: if the decryptor has already been finalized, the size of
+                        the last block is malformed or the block doesn't decrypt into
+                        at most :code:`chunk_size` bytes
+
+        Returns:
+            decrypted bytes of the last block
+        """
+        if self._finalized:
+            raise ValueError("Decryptor has already been finalized")
+
+        self._finalized = True
+        (chunk,), size = split_ciphertext(self._buffer.decode())
+        out = restore_last_block(
+            self._decode(chunk.encode()), size, self.key.chunk_size
+        )
+        self._buffer.clear()
+        return out
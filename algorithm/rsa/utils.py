@@ -1,9 +1,14 @@
 """Utility functions needed for implementing RSA cryptosystem."""
 import base64
+import hashlib
 from math import gcd
+from typing import List
+from typing import Optional
 from typing import Tuple
 
 from . import config
+from . import instrumentation
+from .modular import modinv
 
 
 def lcm(a: int, b: int) -> int:
@@ -43,7 +48,8 @@ def xgcd(a: int, b: int) -> Tuple[int, int, int]:
 def powmod(n: int, e: int, m: int) -> int:
     """
     If :code:`e > 0` the implementation falls back to builtin pow. Otherwise finds modular
-    multiplicative inverse of :code:`n` (:code:`n^-1`) and calculates :code:`pow(n^-1, -e, m).`
+    multiplicative inverse of :code:`n` (:code:`n^-1`) using :func:`rsa.modular.modinv`
+    and calculates :code:`pow(n^-1, -e, m).`
     This is necessary because builtin pow for Python < 3.8 doesn't do this if :code:`e < 0`.
 
     Args:
@@ -54,14 +60,133 @@ def powmod(n: int, e: int, m: int) -> int:
     Returns:
         :code:`n ** e % m`
     """
+    if instrumentation.active is not None:
+        instrumentation.active.count("modexps")
     if e < 0:
-        g, x, _ = xgcd(n, m)
-        if g != 1:
-            raise ValueError("Modular inverse does not exist!")
-        return pow(x % m, -e, m)
+        return pow(modinv(n, m), -e, m)
     return pow(n, e, m)
 
 
+def crt_params(p: int, q: int, d: int, *other_primes: int) -> Tuple[int, ...]:
+    """Calculate parameters needed for decryption using Chinese Remainder Theorem.
+
+    Keys with more than two primes are supported the same way as in `PKCS #1
+    <https://tools.ietf.org/html/rfc8017#section-3.2>`__: for every additional prime
+    :code:`r` the prime itself, :code:`d mod (r - 1)` and the modular multiplicative
+    inverse of the product of all the preceding primes modulo :code:`r` are added.
+
+    Args:
+        p: first prime factor of the modulus
+        q: second prime factor of the modulus
+        d: private exponent
+        other_primes: remaining prime factors of the modulus, if any
+
+    Returns:
+        dP, dQ, qInv followed by a triplet of the prime, exponent and coefficient for
+        each of the other primes
+    """
+    params = [d % (p - 1), d % (q - 1), modinv(q, p)]
+    product = p * q
+    for r in other_primes:
+        params += [r, d % (r - 1), modinv(product, r)]
+        product *= r
+    return tuple(params)
+
+
+def powmod_crt(
+    num: int, p: int, q: int, dp: int, dq: int, qinv: int, *other_primes: int
+) -> int:
+    """Calculate :code:`num ** d % n` using Chinese Remainder Theorem.
+
+    Instead of a single exponentiation modulo :code:`n` two exponentiations with
+    half-sized exponents modulo :code:`p` and :code:`q` are performed and their
+    results are combined using `Garner's formula
+    <https://en.wikipedia.org/wiki/RSA_(cryptosystem)#Using_the_Chinese_remainder_algorithm>`__.
+    For multi-prime keys the result is then extended to each of the other primes in
+    turn, as described in `PKCS #1 <https://tools.ietf.org/html/rfc8017#section-5.1.2>`__.
+
+    Args:
+        num: base
+        p: first prime factor of the modulus
+        q: second prime factor of the modulus
+        dp: :code:`d mod (p - 1)`
+        dq: :code:`d mod (q - 1)`
+        qinv: modular multiplicative inverse of :code:`q` modulo :code:`p`
+        other_primes: triplets of the remaining primes and their parameters as
+                      returned by :func:`crt_params`
+
+    Returns:
+        :code:`num ** d % n`
+    """
+    if instrumentation.active is not None:
+        instrumentation.active.count("modexps", 2 + len(other_primes) // 3)
+    m1 = pow(num, dp, p)
+    m2 = pow(num, dq, q)
+    h = qinv * (m1 - m2) % p
+    m = m2 + h * q
+
+    product = p * q
+    for i in range(0, len(other_primes), 3):
+        r, dr, tr = other_primes[i : i + 3]
+        h = tr * (pow(num, dr, r) - m) % r
+        m += h * product
+        product *= r
+    return m
+
+
+def fingerprint(mod: int) -> bytes:
+    """Calculates short fingerprint identifying a key by its modulus.
+
+    The fingerprint consists of the first 8 bytes of SHA-256 hash of big-endian
+    representation of the modulus, so it doesn't depend on :code:`config.BYTEORDER`.
+
+    Args:
+        mod: modulus
+
+    Returns:
+        8 byte fingerprint
+    """
+    return hashlib.sha256(mod.to_bytes((mod.bit_length() + 7) // 8, "big")).digest()[:8]
+
+
+def _int_to_base64(num: int, signed: bool = False) -> str:
+    """Base64-encodes an integer using the minimal number of bytes.
+
+    Args:
+        num: integer to be encoded
+        signed: whether to use two's complement to represent the number
+
+    Returns:
+        base64-encoded integer
+    """
+    length = (num.bit_length() + 7) // 8
+    try:
+        raw = num.to_bytes(length, config.BYTEORDER, signed=signed)
+    except OverflowError:
+        raw = num.to_bytes(length + 1, config.BYTEORDER, signed=signed)
+    return base64.urlsafe_b64encode(raw).decode()
+
+
+def _split_key(key: str) -> List[str]:
+    """Splits base64-encoded key into its base64-encoded components.
+
+    Public keys and legacy private keys consist of 2 components (modulus and
+    exponent), while extended private keys consist of 7 of them (modulus, exponent,
+    p, q, dP, dQ and qInv) followed by 3 more for each prime of multi-prime keys
+    beyond the first two.
+
+    Args:
+        key: base64-encoded key
+
+    Returns:
+        list of base64-encoded key components
+    """
+    parts = key.split(".")
+    if len(parts) != 2 and (len(parts) < 7 or (len(parts) - 7) % 3):
+        raise ValueError(f"`{key}` is not a valid key")
+    return parts
+
+
 def encode_key(mod: int, exp: int) -> str:
     """Base64-encodes public/private key.
 
@@ -72,37 +197,75 @@ def encode_key(mod: int, exp: int) -> str:
     Returns:
         base64-encoded key
     """
-    mod_base64 = base64.urlsafe_b64encode(
-        mod.to_bytes((mod.bit_length() + 7) // 8, config.BYTEORDER)
-    ).decode()
+    return f"{_int_to_base64(mod)}.{_int_to_base64(exp, signed=True)}"
 
-    try:
-        exp_base64 = base64.urlsafe_b64encode(
-            exp.to_bytes((exp.bit_length() + 7) // 8, config.BYTEORDER, signed=True)
-        ).decode()
-    except OverflowError:
-        exp_base64 = base64.urlsafe_b64encode(
-            exp.to_bytes((exp.bit_length() + 7) // 8 + 1, config.BYTEORDER, signed=True)
-        ).decode()
 
-    return f"{mod_base64}.{exp_base64}"
+def encode_private_key(
+    mod: int, exp: int, p: int, q: int, dp: int, dq: int, qinv: int, *other_primes: int
+) -> str:
+    """Base64-encodes private key extended with parameters used by CRT decryption.
+
+    Args:
+        mod: modulus
+        exp: private exponent
+        p: first prime factor of the modulus
+        q: second prime factor of the modulus
+        dp: :code:`exp mod (p - 1)`
+        dq: :code:`exp mod (q - 1)`
+        qinv: modular multiplicative inverse of :code:`q` modulo :code:`p`
+        other_primes: triplets of the remaining primes of multi-prime keys and their
+                      parameters, see :func:`crt_params`
+
+    Returns:
+        base64-encoded private key
+    """
+    return ".".join(
+        [encode_key(mod, exp)]
+        + [_int_to_base64(num) for num in (p, q, dp, dq, qinv, *other_primes)]
+    )
 
 
 def decode_key(key: str) -> Tuple[int, int]:
     """Decodes base64-encoded key into modulus and exponent.
 
+    Extended private keys are accepted as well, in which case the CRT parameters
+    are ignored.
+
     Args:
         key: base64-encoded key
 
     Returns:
         modulus, exponent pair
     """
-    try:
-        mod, exp = key.split(".")
-    except ValueError:
-        raise ValueError(f"`{key}` is not a valid key")
+    mod, exp, *_ = _split_key(key)
 
     return (
         int.from_bytes(base64.urlsafe_b64decode(mod), config.BYTEORDER),
         int.from_bytes(base64.urlsafe_b64decode(exp), config.BYTEORDER, signed=True),
     )
+
+
+def decode_private_key(key: str) -> Tuple[int, int, Optional[Tuple[int, ...]]]:
+    """Decodes base64-encoded private key into modulus, exponent and CRT parameters.
+
+    Args:
+        key: base64-encoded private key, either extended or legacy one
+
+    Returns:
+        modulus, exponent and :code:`(p, q, dP, dQ, qInv)` tuple, followed by
+        parameters of the other primes of multi-prime keys, or :code:`None` if the
+        key does not contain CRT parameters
+    """
+    mod, exp, *crt = _split_key(key)
+    n, d = decode_key(f"{mod}.{exp}")
+    if not crt:
+        return n, d, None
+
+    return (
+        n,
+        d,
+        tuple(
+            int.from_bytes(base64.urlsafe_b64decode(part), config.BYTEORDER)
+            for part in crt
+        ),
+    )
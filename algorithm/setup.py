@@ -15,6 +15,6 @@ setup(
     url="https://github.com/AleksaC/rsa",
     license="MIT",
     python_requires=">=3.6.1",
-    packages=["rsa"],
+    packages=["rsa", "rsa.bench"],
     entry_points={"console_scripts": ["rsa = rsa.cli:main"]},
 )
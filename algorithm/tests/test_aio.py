@@ -0,0 +1,90 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import pytest
+from rsa import aio
+from rsa import base64_decrypt
+
+
+def run(coroutine):
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coroutine)
+    finally:
+        loop.close()
+
+
+def test_default_runner():
+    async def main():
+        public, private = await aio.keygen(128)
+        ciphertext = await aio.encrypt("Hello world!", public, hybrid=True)
+        *_, n, e, d, _ = await aio.initialize(64)
+        return public, private, ciphertext, n * e * d
+
+    public, private, ciphertext, product = run(main())
+    assert base64_decrypt(ciphertext, private) == "Hello world!"
+    assert run(aio.decrypt(ciphertext, private)) == "Hello world!"
+    assert product > 0
+
+
+def test_concurrency_limit():
+    runner = aio.Runner(max_concurrency=2)
+    lock = threading.Lock()
+    running, peak = [0], [0]
+
+    def work():
+        with lock:
+            running[0] += 1
+            peak[0] = max(peak[0], running[0])
+        time.sleep(0.02)
+        with lock:
+            running[0] -= 1
+
+    async def main():
+        await asyncio.gather(*(runner.run(work) for _ in range(6)))
+
+    try:
+        run(main())
+    finally:
+        runner.close()
+    assert peak[0] == 2
+
+    with pytest.raises(ValueError):
+        aio.Runner(max_concurrency=0)
+
+
+def cancel_keygen(runner):
+    async def main():
+        task = asyncio.ensure_future(runner.keygen(4096))
+        await asyncio.sleep(0.2)
+        task.cancel()
+        start = time.perf_counter()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        return time.perf_counter() - start
+
+    return run(main())
+
+
+def test_cancellation_stops_prime_search():
+    runner = aio.Runner(max_concurrency=1)
+    try:
+        assert cancel_keygen(runner) < 5
+        assert runner.executor.submit(lambda: 42).result(timeout=5) == 42
+    finally:
+        runner.close()
+
+
+def test_process_pool_runner():
+    with ProcessPoolExecutor(1) as executor:
+        runner = aio.configure(executor, max_concurrency=1)
+        try:
+            public, private = run(aio.keygen(128))
+            ciphertext = run(aio.encrypt("Hello world!", public))
+            assert run(aio.decrypt(ciphertext, private)) == "Hello world!"
+            assert cancel_keygen(runner) < 5
+            assert executor.submit(pow, 2, 10).result(timeout=5) == 1024
+        finally:
+            aio.configure()
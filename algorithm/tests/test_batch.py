@@ -0,0 +1,88 @@
+import base64
+import random
+from math import gcd
+
+import pytest
+from rsa import BatchDecryptor
+from rsa import config
+from rsa import initialize
+from rsa import initialize_family
+from rsa import PrivateKey
+from rsa import PublicKey
+from rsa.batch import FAMILY_EXPONENTS
+
+
+@pytest.fixture(scope="module")
+def family():
+    return initialize_family(256, (3, 5, 7))
+
+
+def test_initialize_family(family):
+    p, q, n, exponents, private_exponents, phi = family
+    assert n == p * q and exponents == [3, 5, 7]
+    for e, d in zip(exponents, private_exponents):
+        assert e * d % phi == 1
+
+    *_, exponents, _, _ = initialize_family(128)
+    assert exponents == list(FAMILY_EXPONENTS)
+
+
+@pytest.mark.parametrize("exponents", [(), (3, 4), (3, 9), (1, 3)])
+def test_initialize_family_with_invalid_exponents(exponents):
+    with pytest.raises(ValueError):
+        initialize_family(128, exponents)
+
+
+def test_initialize_with_small_exponent():
+    p, q, n, e, d, _ = initialize(128, e=3)
+    assert e == 3 and gcd(p - 1, 3) == gcd(q - 1, 3) == 1
+    assert pow(pow(42, e, n), d, n) == 42
+
+    with pytest.raises(ValueError):
+        initialize(128, e=4)
+
+
+def test_batch_decrypt_ints(family):
+    p, q, n, exponents, private_exponents, _ = family
+    decryptor = BatchDecryptor.from_primes([p, q], private_exponents)
+    assert decryptor.exponents == exponents
+
+    indices = [0] * 5 + [1] * 3 + [2]
+    messages = [random.randrange(n) for _ in indices] + [0, 1]
+    indices += [1, 2]
+    ciphertexts = [pow(m, exponents[i], n) for m, i in zip(messages, indices)]
+    assert decryptor.decrypt_ints(list(zip(indices, ciphertexts))) == messages
+
+
+def test_batch_decrypt(family):
+    p, q, n, exponents, private_exponents, _ = family
+    decryptor = BatchDecryptor.from_primes([p, q], private_exponents)
+    decryptor = BatchDecryptor(key.to_base64() for key in decryptor.keys)
+
+    messages = ["Hello world!" * 10, "", "Zdravo svete!", "\0"]
+    items = [
+        (i % 3, PublicKey(n, exponents[i % 3]).encrypt(message))
+        for i, message in enumerate(messages)
+    ]
+    assert decryptor.decrypt(items) == messages
+    items = [(0, PublicKey(n, exponents[0]).encrypt_bytes(b"a\x00\x00"))]
+    assert decryptor.decrypt_bytes(items) == [b"a\x00\x00"]
+
+    too_big = (n - 1).to_bytes(64, config.BYTEORDER)
+    ciphertext = base64.urlsafe_b64encode(PublicKey(n, 3).encrypt_block(too_big))
+    with pytest.raises(ValueError):
+        decryptor.decrypt([(0, ciphertext.decode())])
+
+
+def test_batch_decryptor_with_invalid_keys(family):
+    p, q, n, _, private_exponents, _ = family
+    keys = BatchDecryptor.from_primes([p, q], private_exponents).keys
+
+    with pytest.raises(ValueError):
+        BatchDecryptor([])
+    with pytest.raises(ValueError):
+        BatchDecryptor([keys[0], PrivateKey(n + 2, 3, keys[1].crt)])
+    with pytest.raises(ValueError):
+        BatchDecryptor([keys[0], PrivateKey(n, keys[1].d)])
+    with pytest.raises(ValueError):
+        BatchDecryptor([keys[0], keys[0]])
@@ -0,0 +1,63 @@
+import json
+
+import pytest
+from rsa import bench
+from rsa.bench import BENCHMARKS
+from rsa.bench import compare
+from rsa.bench import run
+from rsa.bench.__main__ import main
+
+
+def test_run_covers_all_benchmarks(monkeypatch):
+    monkeypatch.setattr(bench, "MIN_TIME", 0)
+    report = run(key_sizes=[128], message_sizes=[10, 100], repeat=1)
+
+    assert {result["name"] for result in report["results"]} == set(BENCHMARKS)
+    assert len(report["results"]) == len(BENCHMARKS) + 4
+    assert all(result["median"] > 0 for result in report["results"])
+    json.dumps(report)
+
+
+def test_run_only_selected_benchmarks(monkeypatch):
+    monkeypatch.setattr(bench, "MIN_TIME", 0)
+    report = run(key_sizes=[128, 256], only=["find_prime"], repeat=1)
+
+    assert [result["params"] for result in report["results"]] == [
+        {"key_bits": 128},
+        {"key_bits": 256},
+    ]
+
+
+def test_unknown_benchmarks_are_rejected(capsys):
+    with pytest.raises(ValueError):
+        run(key_sizes=[128], only=["find_prime", "encrypt_fast"], repeat=1)
+    with pytest.raises(SystemExit):
+        main(["--only", "find_prime,encrypt_fast"])
+    assert "unknown benchmarks: encrypt_fast" in capsys.readouterr().err
+
+
+def test_compare_flags_regressions():
+    def report(*medians):
+        return {
+            "results": [
+                {"name": name, "params": {"key_bits": 512}, "median": median}
+                for name, median in zip(("encrypt", "decrypt", "is_prime"), medians)
+            ]
+        }
+
+    regressions = compare(report(1.1, 2.0, 1.0), report(1.0, 1.0), tolerance=0.2)
+    assert [(r["name"], r["ratio"]) for r in regressions] == [("decrypt", 2.0)]
+
+
+def test_main_exits_with_error_on_regression(tmpdir, monkeypatch):
+    monkeypatch.setattr(bench, "MIN_TIME", 0)
+    baseline = tmpdir.join("baseline.json")
+    args = ["--key-sizes", "128", "--only", "encrypt", "--repeat", "1"]
+
+    assert main(args + ["-o", str(baseline)]) == 0
+    report = json.loads(baseline.read())
+    report["results"][0]["median"] /= 100
+    baseline.write(json.dumps(report))
+
+    assert main(args + ["--baseline", str(baseline), "-o", str(baseline)]) == 1
+    assert json.loads(baseline.read())["regressions"][0]["name"] == "encrypt"
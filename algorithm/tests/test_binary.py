@@ -0,0 +1,109 @@
+import pytest
+from hypothesis import given
+from hypothesis import settings
+from hypothesis.strategies import binary
+from rsa import config
+from rsa import decrypt_from_binary
+from rsa import encrypt_to_binary
+from rsa import keygen
+from rsa import PublicKey
+from rsa.binary import decrypt_file
+from rsa.binary import decrypt_file_range
+from rsa.binary import decrypt_range
+from rsa.binary import encrypt_file
+from rsa.binary import HEADER
+from rsa.binary import read_header
+
+PUBLIC, PRIVATE = keygen(128)
+OTHER_PUBLIC, _ = keygen(128)
+
+
+@given(binary(max_size=300))
+@settings(deadline=None)
+def test_binary_roundtrip(data):
+    ciphertext = encrypt_to_binary(data, PUBLIC)
+    assert decrypt_from_binary(memoryview(ciphertext), PRIVATE) == data
+
+
+def test_binary_layout():
+    key = PublicKey.from_base64(PUBLIC)
+    data = b"\x00" * (2 * key.chunk_size + 5)
+    ciphertext = encrypt_to_binary(data, key)
+    header = read_header(ciphertext)
+    assert header.fingerprint == key.fingerprint
+    assert header.block_size == key.num_bytes
+    assert header.block_count == 3
+    assert header.final_block_size == 5
+    assert header.plaintext_size == len(data)
+    assert len(ciphertext) == header.size == HEADER.size + 3 * key.num_bytes
+
+
+def test_invalid_binary_ciphertext():
+    ciphertext = encrypt_to_binary(b"Hello world", PUBLIC)
+    with pytest.raises(ValueError):
+        decrypt_from_binary(ciphertext[:10], PRIVATE)
+    with pytest.raises(ValueError):
+        decrypt_from_binary(b"XXXX" + ciphertext[4:], PRIVATE)
+    with pytest.raises(ValueError):
+        decrypt_from_binary(ciphertext[:4] + b"\x02" + ciphertext[5:], PRIVATE)
+    with pytest.raises(ValueError):
+        decrypt_from_binary(ciphertext[:-1], PRIVATE)
+    with pytest.raises(ValueError):
+        decrypt_from_binary(encrypt_to_binary(b"Hello world", OTHER_PUBLIC), PRIVATE)
+
+
+def test_corrupted_binary_block():
+    key = PublicKey.from_base64(PUBLIC)
+    ciphertext = encrypt_to_binary(b"Hello world", key)
+    block = key.encrypt_int(key.n - 1).to_bytes(key.num_bytes, config.BYTEORDER)
+    with pytest.raises(ValueError):
+        decrypt_from_binary(ciphertext[: HEADER.size] + block, PRIVATE)
+
+
+@pytest.mark.parametrize(
+    "start,stop", [(None, None), (0, 1), (5, 95), (31, 62), (-10, None), (50, 10)]
+)
+def test_decrypt_range(start, stop):
+    data = bytes(range(100))
+    ciphertext = encrypt_to_binary(data, PUBLIC)
+    assert decrypt_range(ciphertext, PRIVATE, start, stop) == data[start:stop]
+
+
+def test_file_encryption(tmpdir):
+    data = bytes(range(256)) * 10
+    source, destination = tmpdir / "source", tmpdir / "destination"
+    source.write_binary(data)
+    encrypt_file(str(source), str(destination), PUBLIC)
+    assert destination.read_binary() == encrypt_to_binary(data, PUBLIC)
+    assert decrypt_file_range(str(destination), PRIVATE) == data
+    assert decrypt_file_range(str(destination), PRIVATE, 1000, 1100) == data[1000:1100]
+    decrypt_file(str(destination), str(source), PRIVATE)
+    assert source.read_binary() == data
+
+    source.write_binary(b"")
+    encrypt_file(str(source), str(destination), PUBLIC)
+    assert decrypt_file_range(str(destination), PRIVATE) == b""
+
+    destination.write_binary(b"")
+    with pytest.raises(ValueError):
+        decrypt_file_range(str(destination), PRIVATE)
+    with pytest.raises(ValueError):
+        decrypt_file(str(destination), str(source), PRIVATE)
+
+
+def test_invalid_file_leaves_destination_untouched(tmpdir):
+    source, destination = tmpdir / "source", tmpdir / "destination"
+    destination.write_binary(b"existing")
+
+    source.write_binary(encrypt_to_binary(b"Hello world!", OTHER_PUBLIC))
+    with pytest.raises(ValueError):
+        decrypt_file(str(source), str(destination), PRIVATE)
+    assert destination.read_binary() == b"existing"
+
+    ciphertext = encrypt_to_binary(bytes(100), PUBLIC)
+    ciphertext[HEADER.size :] = b"\xff" * (len(ciphertext) - HEADER.size)
+    source.write_binary(bytes(ciphertext))
+    with pytest.raises(ValueError):
+        decrypt_file(str(source), str(destination), PRIVATE)
+    assert destination.read_binary() == b"existing"
+    assert sorted(tmpdir.listdir()) == [destination, source]
@@ -1,7 +1,15 @@
+import io
+import json
 import random
+import sys
 
 import pytest
+from rsa import base64_decrypt
+from rsa import base64_encrypt
 from rsa import cli
+from rsa import encrypt_bytes
+from rsa import keygen
+from rsa import load_public_key
 
 
 @pytest.fixture
@@ -12,14 +20,41 @@ def message():
 @pytest.fixture
 def public_key():
     return (
-        "zXR7l5BTTjoURXPmcc7vtto1GCbi07ygBodsICAzl3O3TG0K9dl1wB1izdy9Ey0Mfur_r_"
-        "BFKtb5PeOXY0JVU0dafKw5YT9qndzdvTGKlHKr5xuVAAJx4OQsk1c3A-igZVkm6QEuJlOW"
-        "sv0bLKOxjX6X9G9_oh4Kgxm3zudEmJA=.AQAB"
+        "cayAfCrX3vtG_2DW2qlJ1zwRM19GFjj2OBFgbaa1bX6pJGRdpNRUqBbHQY6f58BxRJGQs9"
+        "QG3u_hOu6yEqfxKFrFfZYIEzcYqW8JQD4i610UCoRJ2baCwHCJgcpPsZJehZ6r4cTHC-hE"
+        "Cjsm9zv4PjavUvwDwnQ5qpjpS40rDIQ=.AQAB"
     )
 
 
 @pytest.fixture
 def private_key():
+    return (
+        "cayAfCrX3vtG_2DW2qlJ1zwRM19GFjj2OBFgbaa1bX6pJGRdpNRUqBbHQY6f58BxRJGQs9"
+        "QG3u_hOu6yEqfxKFrFfZYIEzcYqW8JQD4i610UCoRJ2baCwHCJgcpPsZJehZ6r4cTHC-hE"
+        "Cjsm9zv4PjavUvwDwnQ5qpjpS40rDIQ=.DT4GW9jgYvCPYE_Y2D4MXtgBlAlUT3qJyPsui"
+        "280251GRjFoAqPB65bePkkLvMUMl8dhseq6_FJ7fN_ueEPPDhDN5TbLzQ6OUuqxzR0-QTs"
+        "nm7CSQ5zZw4cYwVba3jRSw231u3ZCXGqRsbKDcUcUfA2amD1rWZtVxsDEdqxWiyk=.Vwgs"
+        "2L5vn2KsTAnCggbn41WUqms0L10KOl5IQvq0KPdi5uKC5cFlfHjDqWezZxHrOQanyGA9cd"
+        "QJ56VNh73B9w==.dxRulg7oo0kFzepxbTN1F21BppgheEXMpeGIYnz7KVFy3V2TCLz6Pcw"
+        "IU0pUBRIvJvN7MOSsS9K1gc0vXOFwiA==.F2GQoOtrk-AH_IvtAQ0BbS3lxTsGBSp_PDJF"
+        "m2w6BpdF0nYzYnFM-kiHq02qwtIynAjhraDbtebeSaB-IG077Q==.sbPlW-CNBxHcejV-2"
+        "RhZOf2XDeShz93RmaynrbwI5W3eXYz4N_9C0Ou65eTdUdzZR2v2sPQyEE57tPTOTvgGUQ="
+        "=.P9TY_AdG7htDhKE79O46rWLOsyBLM938YtEmZmaiCQr6YPiZrfZvFETddE3Twey6zfLq"
+        "_R7ad2L5OpC6i9plYg=="
+    )
+
+
+@pytest.fixture
+def ciphertext():
+    return (
+        "yeUu3s0haZtTwQ78c8x6w1eXezD9cEZUJUgI3f0TKzX5IV0-dUgs9UmsKtT7eZXGdRhAuc"
+        "RWZN4gPgLE_8NB4QPAUjdnLTtJPrUHLfQoBjEJwW6uw-4bcqR2AOYvx1r5eMyX2NHOpUJ4"
+        "-ld8-irkQpz8AlyykNWLc0CtFfcJnAk="
+    )
+
+
+@pytest.fixture
+def legacy_private_key():
     return (
         "zXR7l5BTTjoURXPmcc7vtto1GCbi07ygBodsICAzl3O3TG0K9dl1wB1izdy9Ey0Mfur_r_"
         "BFKtb5PeOXY0JVU0dafKw5YT9qndzdvTGKlHKr5xuVAAJx4OQsk1c3A-igZVkm6QEuJlOW"
@@ -30,7 +65,7 @@ def private_key():
 
 
 @pytest.fixture
-def ciphertext():
+def legacy_ciphertext():
     return (
         "LNOISy6_5SyF3aTlKmJ-NTOD2W-HfkquEvI7zDtVQYsj5exIphiXEhCxEryBl50JUmEn9d"
         "svSqAf-j0JyKg9FiGVyYouNUDvGYRhqBkygmAhZCMRh6NW-7QRtH3f4Biwu_XTvqV43n21"
@@ -45,6 +80,19 @@ def test_keygen(capfd, public_key, private_key):
     assert captured.out == f"{public_key}\n{private_key}\n"
 
 
+def test_keygen_with_multiple_workers(capfd, message):
+    cli.main(["keygen", "-w", "2", "256"])
+    public_key, private_key = capfd.readouterr().out.split()
+    assert base64_decrypt(base64_encrypt(message, public_key), private_key) == message
+
+
+def test_keygen_with_multiple_primes(capsys, message):
+    cli.main(["keygen", "-p", "3", "256"])
+    public_key, private_key = capsys.readouterr().out.split()
+    assert len(private_key.split(".")) == 10
+    assert base64_decrypt(base64_encrypt(message, public_key), private_key) == message
+
+
 def test_encrypt(capsys, message, public_key, ciphertext):
     cli.main(["encrypt", message, public_key])
     captured = capsys.readouterr()
@@ -78,3 +126,107 @@ def test_commands_writing_to_files(
 
     cli.main(["-o", str(message_path), "decrypt", ciphertext, private_key])
     assert message_path.read_text("utf8") == message
+
+
+def test_decrypt_with_legacy_private_key(capsys, legacy_private_key, legacy_ciphertext):
+    cli.main(["decrypt", legacy_ciphertext, legacy_private_key])
+    captured = capsys.readouterr()
+    assert captured.out == "Hello world\n"
+
+
+def test_streaming_through_files(
+    tmpdir, capsysbinary, public_key, private_key, ciphertext
+):
+    data = bytes(range(256)) * 100 + "žćčđš".encode()
+    message_path = tmpdir / "message"
+    ciphertext_path = tmpdir / "ciphertext"
+    message_path.write_binary(data)
+
+    args = ["--in", str(message_path), "--out", str(ciphertext_path), public_key]
+    assert cli.main(["encrypt", *args]) == 0
+    assert ciphertext_path.read_text("utf8") == encrypt_bytes(data, public_key)
+    args = ["--in", str(ciphertext_path), "--out", "-", private_key]
+    assert cli.main(["decrypt", *args]) == 0
+    assert capsysbinary.readouterr().out == data
+
+    cli.main(["encrypt", "--out", str(ciphertext_path), "Hello world", public_key])
+    assert ciphertext_path.read_text("utf8") == ciphertext
+
+
+def test_hybrid_mode(tmpdir, capsysbinary, public_key, private_key, message):
+    data = bytes(range(256)) * 1000
+    message_path = tmpdir / "message"
+    ciphertext_path = tmpdir / "ciphertext"
+    message_path.write_binary(data)
+
+    args = ["--in", str(message_path), "--out", str(ciphertext_path), public_key]
+    assert cli.main(["encrypt", "--hybrid", *args]) == 0
+    assert "." not in ciphertext_path.read_text("utf8")
+    # raw bytes are encrypted, so only base64 and the envelope header add to the size
+    assert len(ciphertext_path.read_binary()) < len(data) * 3 // 2
+    args = ["--in", str(ciphertext_path), "--out", "-", private_key]
+    assert cli.main(["decrypt", *args]) == 0
+    assert capsysbinary.readouterr().out == data
+
+    cli.main(["-o", str(ciphertext_path), "encrypt", "--hybrid", message, public_key])
+    assert base64_decrypt(ciphertext_path.read_text("utf8"), private_key) == message
+    cli.main(["decrypt", ciphertext_path.read_text("utf8"), private_key])
+    assert capsysbinary.readouterr().out == f"{message}\n".encode()
+
+    cli.main(["encrypt", "--hybrid", "--out", str(ciphertext_path), "žć", public_key])
+    assert base64_decrypt(ciphertext_path.read_text("utf8"), private_key) == "žć"
+
+    args = ["--binary", "--in", str(message_path), "--out", str(ciphertext_path)]
+    assert cli.main(["encrypt", "--hybrid", *args, public_key]) == 1
+
+
+def test_streaming_through_stdin_and_stdout(
+    monkeypatch, capsysbinary, private_key, ciphertext, message
+):
+    monkeypatch.setattr(sys, "stdin", io.TextIOWrapper(io.BytesIO(ciphertext.encode())))
+    assert cli.main(["decrypt", "--in", "-", private_key]) == 0
+    assert capsysbinary.readouterr().out == message.encode()
+
+
+def test_input_provided_twice_or_not_at_all(tmpdir, public_key, message):
+    assert cli.main(["encrypt", public_key]) == 1
+    assert cli.main(["encrypt", "--in", str(tmpdir / "file"), message, public_key]) == 1
+
+
+def test_binary_mode_and_decrypt_range(tmpdir, capsysbinary, public_key, private_key):
+    data = bytes(range(256)) * 10
+    message_path = tmpdir / "message"
+    ciphertext_path = tmpdir / "ciphertext"
+    decrypted_path = tmpdir / "decrypted"
+    message_path.write_binary(data)
+
+    args = ["--binary", "--in", str(message_path), "--out", str(ciphertext_path)]
+    assert cli.main(["encrypt", *args, public_key]) == 0
+    args = ["--binary", "--in", str(ciphertext_path), "--out", str(decrypted_path)]
+    assert cli.main(["decrypt", *args, private_key]) == 0
+    assert decrypted_path.read_binary() == data
+
+    args = ["--start", "1000", "--length", "300", str(ciphertext_path), private_key]
+    assert cli.main(["decrypt-range", *args]) == 0
+    assert capsysbinary.readouterr().out == data[1000:1300]
+
+    assert cli.main(["encrypt", "--binary", "--in", "-", public_key]) == 1
+
+
+def test_encrypt_many(tmpdir, capsys, message, public_key, ciphertext):
+    other_public_key, other_private_key = keygen(256)
+    keys_path = tmpdir / "keys"
+    keys_path.write_text(f"{other_public_key}\n{public_key}\n", "utf8")
+
+    assert cli.main(["encrypt-many", message, public_key]) == 0
+    fingerprint = load_public_key(public_key).fingerprint.hex()
+    assert json.loads(capsys.readouterr().out) == {fingerprint: ciphertext}
+
+    assert cli.main(["encrypt-many", "--keys-file", str(keys_path), message]) == 0
+    ciphertexts = json.loads(capsys.readouterr().out)
+    assert len(ciphertexts) == 2
+    other_fingerprint = load_public_key(other_public_key).fingerprint.hex()
+    decrypted = base64_decrypt(ciphertexts[other_fingerprint], other_private_key)
+    assert decrypted == message
+
+    assert cli.main(["encrypt-many", message]) == 1
@@ -0,0 +1,94 @@
+import os
+
+import pytest
+from hypothesis import given
+from hypothesis import settings
+from hypothesis.strategies import binary
+from hypothesis.strategies import integers
+from rsa import decrypt_envelope
+from rsa import encrypt_envelope
+from rsa import EnvelopeDecryptor
+from rsa import EnvelopeEncryptor
+from rsa import keygen
+from rsa import load_public_key
+from rsa.envelope import CHUNK_SIZE
+from rsa.envelope import HEADER
+from rsa.envelope import is_envelope
+from rsa.envelope import TAG_SIZE
+
+PUBLIC, PRIVATE = keygen(128)
+
+
+def split(data, size):
+    return [data[i : i + size] for i in range(0, len(data), size)]
+
+
+@pytest.mark.parametrize(
+    "size", [0, 1, CHUNK_SIZE - 1, CHUNK_SIZE, CHUNK_SIZE + 1, 3 * CHUNK_SIZE + 7]
+)
+def test_envelope_roundtrip(size):
+    data = os.urandom(size)
+    envelope = encrypt_envelope(data, PUBLIC)
+    assert is_envelope(envelope)
+    num_chunks = max(-(-size // CHUNK_SIZE), 1)
+    key_size = load_public_key(PUBLIC).num_bytes
+    assert len(envelope) == HEADER.size + key_size + size + num_chunks * TAG_SIZE
+    assert decrypt_envelope(envelope, PRIVATE) == data
+
+
+def test_envelopes_of_same_message_differ():
+    assert encrypt_envelope(b"Hello", PUBLIC) != encrypt_envelope(b"Hello", PUBLIC)
+
+
+@given(binary(max_size=300), integers(min_value=1, max_value=100))
+@settings(deadline=None, max_examples=20)
+def test_incremental_encryption_and_decryption(data, piece_size):
+    encryptor = EnvelopeEncryptor(PUBLIC)
+    envelope = b"".join(encryptor.update(piece) for piece in split(data, piece_size))
+    envelope += encryptor.finalize()
+
+    decryptor = EnvelopeDecryptor(PRIVATE)
+    out = b"".join(decryptor.update(piece) for piece in split(envelope, piece_size))
+    assert out + decryptor.finalize() == data
+
+
+def test_decryptor_outputs_only_authenticated_chunks(monkeypatch):
+    monkeypatch.setattr("rsa.envelope.CHUNK_SIZE", 16)
+    envelope = encrypt_envelope(b"a" * 40, PUBLIC)
+
+    decryptor = EnvelopeDecryptor(PRIVATE)
+    assert decryptor.update(envelope[:-1]) == b"a" * 32
+    with pytest.raises(ValueError):
+        decryptor.finalize()
+
+
+@pytest.mark.parametrize("position", [0, 4, 5, HEADER.size, HEADER.size + 70, -1])
+def test_tampered_envelope(position):
+    envelope = bytearray(encrypt_envelope(b"Hello world!" * 10, PUBLIC))
+    envelope[position] ^= 1
+    with pytest.raises(ValueError):
+        decrypt_envelope(envelope, PRIVATE)
+
+
+def test_truncated_envelope_and_wrong_key():
+    envelope = encrypt_envelope(b"Hello world!", PUBLIC)
+    for size in (0, HEADER.size, len(envelope) - TAG_SIZE - 1, len(envelope) - 1):
+        with pytest.raises(ValueError):
+            decrypt_envelope(envelope[:size], PRIVATE)
+
+    _, other_private = keygen(128)
+    with pytest.raises(ValueError):
+        decrypt_envelope(envelope, other_private)
+
+
+def test_update_after_finalize():
+    encryptor = EnvelopeEncryptor(PUBLIC)
+    decryptor = EnvelopeDecryptor(PRIVATE)
+    decryptor.update(encryptor.finalize())
+    decryptor.finalize()
+
+    for processor in (encryptor, decryptor):
+        with pytest.raises(ValueError):
+            processor.update(b"")
+        with pytest.raises(ValueError):
+            processor.finalize()
@@ -0,0 +1,80 @@
+import random
+
+from rsa import base64_decrypt
+from rsa import base64_encrypt
+from rsa import find_prime
+from rsa import initialize
+from rsa import instrumentation
+from rsa import is_prime
+from rsa import keygen
+from rsa.instrumentation import collect
+from rsa.instrumentation import Stats
+from rsa.primes import miller_rabin_rounds
+
+
+def test_disabled_by_default():
+    assert instrumentation.active is None
+    assert instrumentation.timer("stage") is instrumentation.timer("other stage")
+
+
+def test_instrumentation_does_not_change_results():
+    random.seed(0)
+    expected = initialize(256)
+    random.seed(0)
+    with collect():
+        assert initialize(256) == expected
+
+
+def test_find_prime_counters():
+    with collect() as stats:
+        find_prime(512)
+    rounds = miller_rabin_rounds(512)
+
+    counters = stats.counters
+    assert stats.calls["find_prime"] == 1
+    assert counters["candidates"] >= 1
+    assert counters["sieve_rejections"] > counters["candidates"]
+    assert counters["rejected.miller_rabin_base_2"] == counters["candidates"] - 1
+    assert counters["miller_rabin_rounds"] == counters["candidates"] + rounds
+    assert counters["modexps"] == counters["miller_rabin_rounds"]
+
+
+def test_rejections():
+    with collect() as stats:
+        assert not is_prime(561)
+        # strong pseudoprime to bases 2, 3, 5 and 7
+        assert not is_prime(3215031751)
+        assert is_prime((1 << 127) - 1, baillie_psw=True)
+
+    assert stats.counters["rejected.miller_rabin_base_2"] == 1
+    assert stats.counters["rejected.miller_rabin"] == 1
+    assert stats.counters["lucas_tests"] == 1
+    assert "rejected.lucas" not in stats.counters
+
+
+def test_stage_timings_and_callback():
+    public, private = keygen(128)
+    events = []
+
+    with collect(callback=lambda name, value: events.append(name)) as stats:
+        base64_decrypt(base64_encrypt("Hello world!" * 10, public), private)
+        initialize(128)
+
+    assert stats.calls["encrypt"] == stats.calls["decrypt"] == 1
+    assert stats.calls["initialize.primes"] == stats.calls["initialize.exponent"] == 1
+    assert stats.counters["modexps"] >= 3 * 2 + stats.counters["miller_rabin_rounds"]
+    assert set(events) == set(stats.counters) | set(stats.calls)
+    assert stats.as_dict()["timings"]["encrypt"]["calls"] == 1
+
+
+def test_nested_collection():
+    outer = Stats()
+    with collect(outer):
+        with collect() as inner:
+            is_prime(97)
+        is_prime(89)
+        assert instrumentation.active is outer
+    assert instrumentation.active is None
+    assert (
+        inner.counters["miller_rabin_rounds"] == outer.counters["miller_rabin_rounds"]
+    )
@@ -0,0 +1,81 @@
+import pytest
+from rsa import iter_keys
+from rsa import key_from_bytes
+from rsa import key_from_pem
+from rsa import key_to_bytes
+from rsa import key_to_pem
+from rsa import keygen
+from rsa import load_private_key
+from rsa import load_public_key
+from rsa import PrivateKey
+from rsa import utils
+from rsa.keyformat import HEADER
+from rsa.keyformat import read_key_header
+
+PUBLIC, PRIVATE = keygen(256)
+_, MULTI_PRIME_PRIVATE = keygen(128, num_primes=3)
+
+
+@pytest.mark.parametrize(
+    "key",
+    [
+        load_public_key(PUBLIC),
+        load_private_key(PRIVATE),
+        load_private_key(MULTI_PRIME_PRIVATE),
+        PrivateKey(*utils.decode_key(PRIVATE)),
+    ],
+)
+def test_roundtrip(key):
+    data = key_to_bytes(key)
+    assert len(data) < len(key.to_base64())
+    for buffer in (bytes(data), data, memoryview(data)):
+        assert key_from_bytes(buffer).to_base64() == key.to_base64()
+    assert key_from_pem(key_to_pem(key)).to_base64() == key.to_base64()
+
+    header = read_key_header(data)
+    assert header.fingerprint == key.fingerprint
+    assert header.size == len(data)
+    assert header.private == isinstance(key, PrivateKey)
+
+
+def test_negative_exponent():
+    n, d = utils.decode_key(PRIVATE)
+    key = key_from_bytes(key_to_bytes(PrivateKey(n, -d)))
+    assert key.d == -d
+
+
+def test_concatenated_keys():
+    keys = [load_public_key(PUBLIC), load_private_key(PRIVATE)] * 2
+    data = b"".join(key_to_bytes(key) for key in keys)
+    assert [key.to_base64() for key in iter_keys(data)] == [
+        key.to_base64() for key in keys
+    ]
+    offset = len(key_to_bytes(keys[0]))
+    assert key_from_bytes(data, offset).to_base64() == PRIVATE
+
+
+@pytest.mark.parametrize(
+    "corrupt",
+    [
+        lambda data: data[:10],
+        lambda data: data[:-1],
+        lambda data: b"RSAX" + data[4:],
+        lambda data: data[:4] + b"\x02" + data[5:],
+        lambda data: data[:6] + b"\x03" + data[7:],
+        lambda data: data[:7] + bytes(8) + data[15:],
+        lambda data: data[: HEADER.size] + b"\xff\xff" + data[HEADER.size + 2 :],
+    ],
+)
+def test_corrupted_keys(corrupt):
+    with pytest.raises(ValueError):
+        key_from_bytes(corrupt(bytes(key_to_bytes(load_public_key(PUBLIC)))))
+
+
+def test_invalid_pem():
+    pem = key_to_pem(load_public_key(PUBLIC))
+    with pytest.raises(ValueError):
+        key_from_pem(pem.replace("PUBLIC", "PRIVATE"))
+    with pytest.raises(ValueError):
+        key_from_pem(pem.replace("BEGIN", "START"))
+    with pytest.raises(ValueError):
+        key_from_pem(pem.replace("A", "!", 1).replace("-!", "-A"))
@@ -0,0 +1,86 @@
+import pytest
+from rsa import base64_decrypt
+from rsa import base64_encrypt
+from rsa import decrypt_bytes
+from rsa import encrypt_bytes
+from rsa import keygen
+from rsa import load_private_key
+from rsa import load_public_key
+from rsa import PrivateKey
+from rsa import PublicKey
+from rsa import utils
+from rsa.keys import LENGTH_MARKER
+from rsa.parallel import PARALLEL_THRESHOLD
+
+PUBLIC, PRIVATE = keygen(256)
+
+
+def test_key_objects():
+    public_key = PublicKey.from_base64(PUBLIC)
+    private_key = PrivateKey.from_base64(PRIVATE)
+    assert public_key.num_bytes == 64
+    assert public_key.chunk_size == private_key.chunk_size == 63
+    assert private_key.crt is not None
+    assert public_key.to_base64() == PUBLIC
+    assert private_key.to_base64() == PRIVATE
+
+    message = "Hello world" * 20
+    ciphertext = public_key.encrypt(message)
+    assert ciphertext == base64_encrypt(message, PUBLIC)
+    assert private_key.decrypt(ciphertext) == message
+    assert base64_decrypt(ciphertext, PRIVATE) == message
+
+
+def test_legacy_private_key_object():
+    n, d = utils.decode_key(PRIVATE)
+    private_key = PrivateKey.from_base64(utils.encode_key(n, d))
+    assert private_key.crt is None
+    assert private_key.decrypt(base64_encrypt("Hello", PUBLIC)) == "Hello"
+
+
+def test_keys_are_cached():
+    assert load_public_key(PUBLIC) is load_public_key(PUBLIC)
+    assert load_private_key(PRIVATE) is load_private_key(PRIVATE)
+
+
+def test_bytes_roundtrip():
+    public_key = load_public_key(PUBLIC)
+    # zero bytes at the ends of blocks are lost when blocks are converted to integers
+    data = bytes(range(1, 256)) + b"\x00" * 100 + b"end"
+    for buffer in (data, bytearray(data), memoryview(data)):
+        ciphertext = encrypt_bytes(buffer, PUBLIC)
+        assert ciphertext == public_key.encrypt_bytes(buffer)
+        assert decrypt_bytes(ciphertext, PRIVATE) == data
+
+    data = b"\x01" * public_key.chunk_size * PARALLEL_THRESHOLD
+    ciphertext = encrypt_bytes(memoryview(data), PUBLIC, workers=2)
+    assert decrypt_bytes(ciphertext, PRIVATE, workers=2) == data
+    assert encrypt_bytes(b"", PUBLIC) == ""
+    assert decrypt_bytes("", PRIVATE) == b""
+
+
+@pytest.mark.parametrize("data", [b"\x00", b"a\x00\x00", b"a" * 63 + b"\x00" * 70])
+def test_bytes_roundtrip_with_trailing_zero_bytes(data):
+    ciphertext = encrypt_bytes(data, PUBLIC)
+    assert ciphertext.endswith(f"{LENGTH_MARKER}{(len(data) - 1) % 63 + 1}")
+    assert decrypt_bytes(ciphertext, PRIVATE) == data
+    assert LENGTH_MARKER not in encrypt_bytes(b"\x00a", PUBLIC)
+
+
+@pytest.mark.parametrize("suffix", ["~", "~x", "~64", "~0"])
+def test_decrypt_bytes_with_invalid_last_block_size(suffix):
+    with pytest.raises(ValueError):
+        decrypt_bytes(encrypt_bytes(b"abc", PUBLIC) + suffix, PRIVATE)
+
+
+def test_characters_split_between_blocks():
+    message = "\u0107evap\u010di\u0107i " * 20
+    encoded = message.encode("unicode_escape")
+    assert any(b"\\" in encoded[i - 5 : i] for i in range(63, len(encoded), 63))
+    assert base64_decrypt(base64_encrypt(message, PUBLIC), PRIVATE) == message
+
+
+def test_decrypt_bytes_with_wrong_key():
+    other_public, _ = keygen(264)
+    with pytest.raises(ValueError):
+        decrypt_bytes(base64_encrypt("Hello" * 20, other_public), PRIVATE)
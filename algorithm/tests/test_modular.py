@@ -0,0 +1,45 @@
+from math import gcd
+
+import pytest
+from hypothesis import given
+from hypothesis.strategies import integers
+from hypothesis.strategies import lists
+from rsa import batch_modinv
+from rsa import lehmer_xgcd
+from rsa import modinv
+
+
+@given(
+    integers(min_value=0, max_value=1 << 600), integers(min_value=0, max_value=1 << 600)
+)
+def test_lehmer_xgcd(a, b):
+    g, x, y = lehmer_xgcd(a, b)
+    assert g == gcd(a, b)
+    assert a * x + b * y == g
+
+
+@pytest.mark.parametrize("a, b", [(0, 0), (0, 7), (7, 0), (1 << 200, 3)])
+def test_lehmer_xgcd_edge_cases(a, b):
+    g, x, y = lehmer_xgcd(a, b)
+    assert g == gcd(a, b) and a * x + b * y == g
+
+
+@given(integers(min_value=2, max_value=1 << 600), integers())
+def test_modinv(m, a):
+    if gcd(a, m) != 1:
+        with pytest.raises(ValueError):
+            modinv(a, m)
+    else:
+        inverse = modinv(a, m)
+        assert 0 <= inverse < m and a * inverse % m == 1
+
+
+@given(lists(integers(min_value=1, max_value=1 << 300), max_size=20))
+def test_batch_modinv(values):
+    m = (1 << 521) - 1
+    assert batch_modinv(values, m) == [modinv(value, m) for value in values]
+
+
+def test_batch_modinv_without_inverse():
+    with pytest.raises(ValueError):
+        batch_modinv([3, 4, 6], 9)
@@ -0,0 +1,37 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from rsa import base64_decrypt
+from rsa import base64_encrypt
+from rsa import keygen
+from rsa import PublicKey
+from rsa.parallel import map_blocks
+from rsa.parallel import PARALLEL_THRESHOLD
+
+PUBLIC, PRIVATE = keygen(128)
+MESSAGE = "Hello world! " * 400
+
+
+def test_parallel_encryption_and_decryption():
+    ciphertext = base64_encrypt(MESSAGE, PUBLIC)
+    assert ciphertext.count(".") + 1 >= PARALLEL_THRESHOLD
+    assert base64_encrypt(MESSAGE, PUBLIC, workers=2) == ciphertext
+    assert base64_decrypt(ciphertext, PRIVATE, workers=2) == MESSAGE
+
+
+def test_parallel_with_executor():
+    ciphertext = base64_encrypt(MESSAGE, PUBLIC)
+    with ThreadPoolExecutor(3) as executor:
+        assert base64_encrypt(MESSAGE, PUBLIC, executor=executor) == ciphertext
+        assert base64_decrypt(ciphertext, PRIVATE, executor=executor) == MESSAGE
+
+
+def test_small_inputs_are_processed_serially():
+    class FailingExecutor(ThreadPoolExecutor):
+        def map(self, *args, **kwargs):
+            raise AssertionError("Executor shouldn't be used")
+
+    key = PublicKey.from_base64(PUBLIC)
+    blocks = [b"block"] * (PARALLEL_THRESHOLD - 1)
+    with FailingExecutor() as executor:
+        result = map_blocks(key, "encrypt_block", blocks, executor=executor)
+    assert result == [key.encrypt_block(b"block")] * len(blocks)
@@ -0,0 +1,93 @@
+import json
+import time
+
+import pytest
+from rsa import initialize
+from rsa import is_prime
+from rsa import PrimePool
+
+
+def wait_until_full(pool, num_bits, timeout=30):
+    deadline = time.time() + timeout
+    while pool.count(num_bits) < pool.capacity and time.time() < deadline:
+        time.sleep(0.01)
+
+
+def test_pool_replenishes_itself():
+    pool = PrimePool([64, 128], capacity=3)
+    pool.start()
+    try:
+        wait_until_full(pool, 64)
+        wait_until_full(pool, 128)
+        assert pool.count(64) == pool.count(128) == 3
+
+        prime = pool.get(128)
+        assert prime.bit_length() == 128 and is_prime(prime)
+        wait_until_full(pool, 128)
+        assert pool.count(128) == 3
+        assert prime not in [pool.get(128) for _ in range(3)]
+    finally:
+        pool.stop()
+
+
+def test_pool_with_worker_process():
+    pool = PrimePool([64], capacity=2, processes=1)
+    pool.start()
+    wait_until_full(pool, 64)
+    pool.stop()
+    assert pool.count(64) == 2
+
+
+def test_get_falls_back_to_search_without_learning_size():
+    pool = PrimePool()
+    p, q, n, *_ = initialize(96, pool=pool)
+    assert p != q and n == p * q
+    assert p.bit_length() == q.bit_length() == 96
+    assert 96 not in pool._primes
+
+
+def test_pool_rejects_tiny_sizes():
+    with pytest.raises(ValueError):
+        PrimePool([2])
+    with pytest.raises(ValueError):
+        PrimePool().get(2)
+
+
+def test_unconfigured_sizes_are_ignored(tmpdir):
+    path = str(tmpdir / "primes.json")
+    pool = PrimePool([64], capacity=2)
+    pool.add(128, [17])
+    assert pool.count(128) == 0
+    assert len(pool) == 0
+
+    other = PrimePool([64, 128], capacity=2)
+    other.add(64, [19])
+    other.add(128, [23])
+    other.save(path)
+
+    pool.load(path)
+    assert pool.count(64) == 1
+    assert pool.count(128) == 0
+    assert len(pool) == 1
+
+
+def test_inventory_is_moved_to_file(tmpdir):
+    path = str(tmpdir / "primes.json")
+    pool = PrimePool([64], capacity=2, path=path)
+    pool.add(64, [17, 19])
+    pool.save(path)
+    assert len(pool) == 0
+
+    other = PrimePool([64], capacity=2, path=path)
+    other.add(64, [23])
+    other.save(path)
+    with open(path) as f:
+        saved = json.load(f)["primes"]["64"]
+    assert sorted(int(prime, 16) for prime in saved) == [17, 19, 23]
+
+    pool.load(path)
+    assert pool.count(64) == 3
+    assert not tmpdir.join("primes.json").exists()
+
+    other.load(path)
+    assert other.count(64) == 0
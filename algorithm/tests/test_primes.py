@@ -0,0 +1,88 @@
+import pytest
+from rsa import find_prime
+from rsa import find_primes
+from rsa import is_prime
+from rsa.primes import is_strong_lucas_probable_prime
+from rsa.primes import is_strong_probable_prime
+from rsa.primes import miller_rabin_rounds
+from rsa.primes import SearchCancelled
+from rsa.primes import sieve_candidates
+from rsa.primes import SMALL_PRIMES
+
+
+def test_small_primes():
+    assert SMALL_PRIMES[:6] == [3, 5, 7, 11, 13, 17]
+    assert all(is_prime(p) for p in SMALL_PRIMES)
+
+
+def test_sieve_candidates():
+    start = (1 << 64) + 1
+    candidates = sieve_candidates(start, window=64)
+    survivors = [next(candidates) for _ in range(100)]
+    assert survivors == sorted(survivors)
+    assert all(num % 2 and all(num % p for p in SMALL_PRIMES) for num in survivors)
+    expected = [
+        num
+        for num in range(start, survivors[-1] + 1, 2)
+        if all(num % p for p in SMALL_PRIMES)
+    ]
+    assert survivors == expected
+
+
+@pytest.mark.parametrize("num_bits", [2, 8, 16, 17, 64, 512])
+def test_find_prime(num_bits):
+    prime = find_prime(num_bits)
+    assert prime.bit_length() == num_bits
+    assert is_prime(prime)
+
+
+def test_find_prime_stopped():
+    with pytest.raises(SearchCancelled):
+        find_prime(512, should_stop=lambda: True)
+    with pytest.raises(SearchCancelled):
+        find_prime(8, should_stop=lambda: True)
+
+
+@pytest.mark.parametrize("num_bits", [4, 256])
+def test_find_primes(num_bits):
+    primes = find_primes(num_bits, 2, 3)
+    assert len(set(primes)) == 2
+    assert all(p.bit_length() == num_bits and is_prime(p) for p in primes)
+
+
+def test_is_prime_agrees_with_sieve():
+    primes = {2, *SMALL_PRIMES}
+    for num in range(SMALL_PRIMES[-1] + 1):
+        assert is_prime(num) == is_prime(num, baillie_psw=True) == (num in primes)
+
+
+@pytest.mark.parametrize(
+    "num", [2047, 3215031751, 3825123056546413051, 318665857834031151167461]
+)
+def test_is_prime_rejects_strong_pseudoprimes(num):
+    assert is_strong_probable_prime(num, 2)
+    assert not is_prime(num)
+    assert not is_prime(num, baillie_psw=True)
+
+
+@pytest.mark.parametrize("num", [5459, 5777, 10877, 16109, 18971])
+def test_strong_lucas_pseudoprimes(num):
+    assert is_strong_lucas_probable_prime(num)
+    assert not is_prime(num)
+
+
+@pytest.mark.parametrize("exponent", [61, 89, 107, 127, 521])
+def test_is_prime_mersenne(exponent):
+    prime = (1 << exponent) - 1
+    assert is_prime(prime)
+    assert is_prime(prime, baillie_psw=True)
+    assert is_prime(prime, num_rounds=1, baillie_psw=True)
+    assert not is_prime(prime * ((1 << 31) - 1), baillie_psw=True)
+
+
+@pytest.mark.parametrize(
+    "num_bits,num_rounds",
+    [(64, 40), (99, 40), (100, 27), (150, 18), (512, 6), (1024, 3), (2048, 2)],
+)
+def test_miller_rabin_rounds(num_bits, num_rounds):
+    assert miller_rabin_rounds(num_bits) == num_rounds
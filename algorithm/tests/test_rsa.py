@@ -1,3 +1,8 @@
+from concurrent.futures import ProcessPoolExecutor
+from functools import reduce
+from operator import mul
+
+import pytest
 from hypothesis import assume
 from hypothesis import given
 from hypothesis import settings
@@ -5,10 +10,18 @@ from hypothesis.strategies import text
 from rsa import base64_decrypt
 from rsa import base64_encrypt
 from rsa import config
+from rsa import crt_params
 from rsa import decrypt
+from rsa import decrypt_bytes
 from rsa import encrypt
+from rsa import encrypt_bytes
+from rsa import encrypt_many
 from rsa import initialize
+from rsa import initialize_multi_prime
 from rsa import keygen
+from rsa import load_public_key
+from rsa import PublicKey
+from rsa.primes import SMALL_PRIMES
 
 NUM_BITS = 512
 NUM_BYTES = NUM_BITS // 4
@@ -26,3 +39,84 @@ def test_rsa_base64():
     public, private = keygen(1024)
     message = "Hello world"
     assert base64_decrypt(base64_encrypt(message, public), private) == message
+
+
+def test_rsa_base64_hybrid():
+    public, private = keygen(256)
+    message = "Hello world! " * 1000
+    ciphertext = base64_encrypt(message, public, hybrid=True)
+    assert "." not in ciphertext
+    assert base64_decrypt(ciphertext, private) == message
+    assert base64_decrypt(base64_encrypt("", public, hybrid=True), private) == ""
+    assert decrypt_bytes(encrypt_bytes(b"a\0", public, hybrid=True), private) == b"a\0"
+
+
+def test_encrypt_many(monkeypatch):
+    pairs = [keygen(num_bits) for num_bits in (256, 256, 512)]
+    keys = [public for public, _ in pairs]
+    message = "Hello world! " * 20
+
+    ciphertexts = encrypt_many(message, keys + keys[:1])
+    assert len(ciphertexts) == 3
+    for public, private in pairs:
+        ciphertext = ciphertexts[load_public_key(public).fingerprint.hex()]
+        assert ciphertext == base64_encrypt(message, public)
+        assert base64_decrypt(ciphertext, private) == message
+
+    monkeypatch.setattr("rsa.rsa.KEY_BATCH_SIZE", 1)
+    with ProcessPoolExecutor(2) as executor:
+        assert encrypt_many(message, keys, executor=executor) == ciphertexts
+
+    key = load_public_key(keys[0])
+    with pytest.raises(ValueError):
+        encrypt_many(message, [key, PublicKey(key.n, 3)])
+
+
+@given(text(min_size=1, max_size=NUM_BYTES))
+@settings(deadline=None, max_examples=20)
+def test_rsa_crt(message):
+    assume(len(message.encode(config.ENCODING)) < NUM_BYTES)
+    p, q, n, e, d, _ = initialize(NUM_BITS)
+    crt = (p, q, *crt_params(p, q, d))
+    ciphertext = encrypt(message, n, e)
+    assert decrypt(ciphertext, n, d, crt) == decrypt(ciphertext, n, d) == message
+
+
+def test_initialize_with_multiple_workers():
+    p, q, n, e, d, _ = initialize(NUM_BITS, workers=2)
+    assert p != q and n == p * q
+    assert pow(pow(42, e, n), d % ((p - 1) * (q - 1)), n) == 42
+
+
+@pytest.mark.parametrize("num_primes", [3, 4])
+def test_multi_prime_keys(num_primes):
+    primes, n, e, d, _ = initialize_multi_prime(256, num_primes)
+    assert len(set(primes)) == num_primes and n == reduce(mul, primes)
+
+    public, private = keygen(256, num_primes=num_primes)
+    assert len(private.split(".")) == 7 + 3 * (num_primes - 2)
+    message = "Hello world" * 20
+    assert base64_decrypt(base64_encrypt(message, public), private) == message
+
+
+def test_multi_prime_keys_with_multiple_workers():
+    primes, n, e, d, _ = initialize_multi_prime(256, 3, workers=2)
+    assert len(set(primes)) == 3
+    assert pow(pow(42, e, n), d, n) == 42
+
+
+def test_too_few_primes():
+    with pytest.raises(ValueError):
+        initialize_multi_prime(256, 1)
+
+
+def test_too_small_primes():
+    with pytest.raises(ValueError):
+        initialize(2)
+    with pytest.raises(ValueError):
+        keygen(3, num_primes=3)
+
+    # every odd prime factor of p - 1 of a 16-bit prime p is a factor of e, so
+    # no prime of that size is suitable
+    with pytest.raises(ValueError):
+        initialize_multi_prime(16, e=reduce(mul, SMALL_PRIMES))
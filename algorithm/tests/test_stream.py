@@ -0,0 +1,105 @@
+import base64
+
+import pytest
+from hypothesis import given
+from hypothesis import settings
+from hypothesis.strategies import binary
+from hypothesis.strategies import integers
+from hypothesis.strategies import text
+from rsa import base64_encrypt
+from rsa import config
+from rsa import Decryptor
+from rsa import encrypt_bytes
+from rsa import Encryptor
+from rsa import keygen
+
+PUBLIC, PRIVATE = keygen(128)
+
+
+def split(data, size):
+    return [data[i : i + size] for i in range(0, len(data), size)]
+
+
+@given(text(max_size=200), integers(min_value=1, max_value=50))
+@settings(deadline=None)
+def test_stream_matches_base64_functions(message, piece_size):
+    ciphertext = base64_encrypt(message, PUBLIC)
+
+    encryptor = Encryptor(PUBLIC)
+    out = b"".join(
+        encryptor.update(piece)
+        for piece in split(message.encode(config.ENCODING), piece_size)
+    )
+    out += encryptor.finalize()
+    assert out.decode() == ciphertext
+
+    decryptor = Decryptor(PRIVATE)
+    plaintext = b"".join(
+        decryptor.update(piece) for piece in split(ciphertext.encode(), piece_size)
+    )
+    plaintext += decryptor.finalize()
+    assert plaintext == message.encode(config.ENCODING)
+
+
+def test_encryptor_emits_complete_blocks():
+    encryptor = Encryptor(PUBLIC)
+    chunk_size = encryptor.key.chunk_size
+    assert encryptor.update(b"a" * chunk_size) == b""
+    assert encryptor.update(b"a") != b""
+    assert encryptor.finalize() != b""
+    assert Encryptor(PUBLIC).finalize() == b""
+
+
+@given(binary(max_size=200), integers(min_value=1, max_value=50))
+@settings(deadline=None)
+def test_stream_binary_roundtrip(data, piece_size):
+    data += b"\x00" * (piece_size % 3)
+    encryptor = Encryptor(PUBLIC)
+    ciphertext = b"".join(encryptor.update(piece) for piece in split(data, piece_size))
+    ciphertext += encryptor.finalize()
+    assert ciphertext.decode() == encrypt_bytes(data, PUBLIC)
+
+    decryptor = Decryptor(PRIVATE)
+    plaintext = b"".join(
+        decryptor.update(piece) for piece in split(ciphertext, piece_size)
+    )
+    assert plaintext + decryptor.finalize() == data
+
+
+def test_stream_restores_zero_bytes_of_inner_blocks():
+    encryptor = Encryptor(PUBLIC)
+    chunk_size = encryptor.key.chunk_size
+    data = b"a" * (chunk_size - 2) + b"\x00\x00" + b"b" * 10
+    ciphertext = encryptor.update(data) + encryptor.finalize()
+
+    decryptor = Decryptor(PRIVATE)
+    assert decryptor.update(ciphertext) + decryptor.finalize() == data
+
+
+def test_decryptor_rejects_too_big_blocks():
+    key = Encryptor(PUBLIC).key
+    too_big = (key.n - 1).to_bytes(key.num_bytes, config.BYTEORDER)
+    block = base64.urlsafe_b64encode(key.encrypt_block(too_big))
+    with pytest.raises(ValueError):
+        Decryptor(PRIVATE).update(block + b"." + block)
+
+    decryptor = Decryptor(PRIVATE)
+    decryptor.update(block)
+    with pytest.raises(ValueError):
+        decryptor.finalize()
+
+
+def test_update_after_finalize():
+    encryptor = Encryptor(PUBLIC)
+    encryptor.finalize()
+    with pytest.raises(ValueError):
+        encryptor.update(b"data")
+    with pytest.raises(ValueError):
+        encryptor.finalize()
+
+    decryptor = Decryptor(PRIVATE)
+    decryptor.finalize()
+    with pytest.raises(ValueError):
+        decryptor.update(b"data")
+    with pytest.raises(ValueError):
+        decryptor.finalize()
@@ -1,9 +1,17 @@
+from functools import reduce
+from operator import mul
+
 import pytest
 from hypothesis import given
 from hypothesis.strategies import integers
+from rsa import crt_params
 from rsa import decode_key
+from rsa import decode_private_key
 from rsa import encode_key
+from rsa import encode_private_key
+from rsa import lcm
 from rsa import powmod
+from rsa import powmod_crt
 
 
 @given(integers(min_value=2), integers(max_value=-1), integers(min_value=2))
@@ -17,8 +25,37 @@ def test_encode_key_overflow():
 
 
 @pytest.mark.parametrize(
-    "key", ["A valid key contains exactly 1 dot", "This.one.has.too.many"]
+    "key",
+    [
+        "A valid key contains exactly 1 dot",
+        "This.one.has.too.many",
+        "Nor.does.this.one.with.eight.dots.here",
+    ],
 )
 def test_invalid_number_of_dots_in_decode_key_raises_exception(key):
     with pytest.raises(ValueError):
         decode_key(key)
+
+
+def test_private_key_roundtrip():
+    key = encode_private_key(200, -130, 11, 13, 3, 5, 7)
+    assert decode_private_key(key) == (200, -130, (11, 13, 3, 5, 7))
+    assert decode_key(key) == (200, -130)
+    assert decode_private_key(encode_key(200, -130)) == (200, -130, None)
+
+
+def test_multi_prime_private_key_roundtrip():
+    key = encode_private_key(200, -130, 11, 13, 3, 5, 7, 17, 9, 19)
+    assert len(key.split(".")) == 10
+    assert decode_private_key(key) == (200, -130, (11, 13, 3, 5, 7, 17, 9, 19))
+
+
+def test_multi_prime_crt():
+    p, q, r, s = 1009, 1013, 1019, 1021
+    d = powmod(13, -1, lcm(lcm(p - 1, q - 1), lcm(r - 1, s - 1)))
+    for primes in ((p, q), (p, q, r), (p, q, r, s)):
+        n = reduce(mul, primes)
+        crt = crt_params(primes[0], primes[1], d, *primes[2:])
+        assert len(crt) == 3 * (len(primes) - 1)
+        for num in (0, 1, 42, n - 1):
+            assert powmod_crt(num, primes[0], primes[1], *crt) == pow(num, d, n)
@@ -1,17 +1,71 @@
 """REST API exposing rsa package main functionality, namely key generation, encrytion and decryption.
 """
+import atexit
+import hashlib
+import json
 import logging
+import os
+import stat
+import tempfile
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
 from functools import wraps
+from typing import Optional
 
 import rsa
 from flask import Flask
+from flask import g
 from flask import jsonify
 from flask import request
+from flask import stream_with_context
+from prometheus_client import CollectorRegistry
+from prometheus_client import CONTENT_TYPE_LATEST
+from prometheus_client import Counter
+from prometheus_client import generate_latest
+from prometheus_client import Histogram
+from prometheus_client import multiprocess
+from prometheus_client import REGISTRY
 
 app = Flask(__name__)
 logger = logging.getLogger(__file__)
 
 
+def create_prime_pool() -> Optional[rsa.PrimePool]:
+    """Creates and starts a pool of pregenerated primes if it is configured.
+
+    The pool is configured using the following environment variables:
+        - :code:`RSA_PRIME_POOL_SIZES` - comma-separated sizes of primes in bits to
+          keep in the pool, the pool is disabled if it's not set
+        - :code:`RSA_PRIME_POOL_CAPACITY` - number of primes of each size
+        - :code:`RSA_PRIME_POOL_FILE` - file to persist the inventory of the pool to
+        - :code:`RSA_PRIME_POOL_PROCESSES` - number of processes replenishing the
+          pool, 1 by default so that searching for primes doesn't hold the GIL of
+          the worker serving requests
+
+    Returns:
+        started prime pool or None if the pool is disabled
+    """
+    sizes = os.environ.get("RSA_PRIME_POOL_SIZES", "")
+    if not sizes:
+        return None
+
+    pool = rsa.PrimePool(
+        sizes=[int(size) for size in sizes.split(",")],
+        capacity=int(os.environ.get("RSA_PRIME_POOL_CAPACITY", 8)),
+        path=os.environ.get("RSA_PRIME_POOL_FILE"),
+        processes=int(os.environ.get("RSA_PRIME_POOL_PROCESSES", 1)),
+    )
+    pool.start()
+    atexit.register(pool.stop)
+    return pool
+
+
+prime_pool = create_prime_pool()
+
+
 def json_exceptions(func):
     """Wraps view functions to log all uncaught exceptions and return them as a JSON response.
 
@@ -23,9 +77,9 @@ def json_exceptions(func):
     """
 
     @wraps(func)
-    def wrapper():
+    def wrapper(*args, **kwargs):
         try:
-            return func()
+            return func(*args, **kwargs)
         except Exception as e:
             logger.exception(e)
             return jsonify({"error": str(e)}), 500
@@ -33,6 +87,136 @@ def json_exceptions(func):
     return wrapper
 
 
+METRICS_KEY_SIZES = frozenset(2 ** i for i in range(8, 14))
+
+REQUESTS = Counter(
+    "rsa_http_requests_total",
+    "Number of handled requests.",
+    ["endpoint", "method", "key_bits", "status"],
+)
+REQUEST_LATENCY = Histogram(
+    "rsa_http_request_duration_seconds",
+    "Time spent handling requests.",
+    ["endpoint", "method", "key_bits", "status"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60),
+)
+REQUEST_SIZE = Histogram(
+    "rsa_http_request_size_bytes",
+    "Size of query string and body of requests.",
+    ["endpoint", "method"],
+    buckets=tuple(1 << i for i in range(6, 24, 2)),
+)
+
+
+def set_key_bits(key_bits):
+    """Sets size of the modulus used by the request, used to label its metrics.
+
+    Sizes other than powers of 2 between 256 and 8192 are labelled as
+    :code:`other`, so that arbitrary user input can't create unbounded number of
+    label values.
+
+    Args:
+        key_bits: size of the modulus in bits
+    """
+    g.key_bits = str(key_bits) if key_bits in METRICS_KEY_SIZES else "other"
+
+
+@app.before_request
+def start_timer():
+    g.start = time.perf_counter()
+
+
+@app.after_request
+def record_metrics(response):
+    """Records metrics of a request handled by one of the API endpoints.
+
+    Streamed responses are produced after this hook returns, so their metrics are
+    recorded once the response is closed, i.e. when the whole stream has been sent.
+    """
+    if request.url_rule is None or request.endpoint == "metrics":
+        return response
+
+    endpoint, method = request.url_rule.rule, request.method
+    REQUEST_SIZE.labels(endpoint, method).observe(
+        len(request.query_string) + (request.content_length or 0)
+    )
+    # the generator of a streamed response may still set key_bits
+    request_globals = g._get_current_object()
+
+    def record():
+        key_bits = request_globals.get("key_bits", "")
+        labels = (endpoint, method, key_bits, str(response.status_code))
+        REQUESTS.labels(*labels).inc()
+        REQUEST_LATENCY.labels(*labels).observe(
+            time.perf_counter() - request_globals.start
+        )
+
+    if response.is_streamed:
+        response.call_on_close(record)
+    else:
+        record()
+    return response
+
+
+@app.route("/metrics", methods=["GET"])
+def metrics():
+    """Exposes metrics in Prometheus text format.
+
+    When running under gunicorn with :code:`prometheus_multiproc_dir` environment
+    variable set (see :code:`gunicorn.conf.py`), metrics of all the worker processes
+    are aggregated, so the response doesn't depend on which worker handles it.
+
+    The following metrics are exposed:
+        - :code:`rsa_http_requests_total` - number of requests labelled by endpoint,
+          method, size of the key in bits (see :func:`set_key_bits`) and status
+        - :code:`rsa_http_request_duration_seconds` - histogram of latencies with
+          the same labels
+        - :code:`rsa_http_request_size_bytes` - histogram of sizes of requests
+          labelled by endpoint and method
+
+    Returns:
+        flask.Response with metrics in Prometheus text format
+    """
+    if "prometheus_multiproc_dir" in os.environ:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return app.response_class(generate_latest(registry), mimetype=CONTENT_TYPE_LATEST)
+
+
+MIN_NUM_BITS = rsa.primes.MIN_PRIME_BITS
+MAX_NUM_BITS = int(os.environ.get("RSA_MAX_NUM_BITS", 4096))
+NUM_BITS_ERROR = (
+    f"num_bits should be an integer between {MIN_NUM_BITS} and {MAX_NUM_BITS}"
+)
+
+
+def parse_num_bits(num_bits):
+    """Validates :code:`num_bits` parameter.
+
+    Sizes smaller than :code:`MIN_NUM_BITS` are rejected, since there are too few
+    primes of such sizes to generate a key, and so are sizes bigger than
+    :code:`MAX_NUM_BITS`, since generating such keys would keep the worker busy for
+    too long.
+
+    Args:
+        num_bits: value of the parameter, either a string or an integer
+
+    Returns:
+        num_bits as an integer or None if it's not valid
+    """
+    if isinstance(num_bits, str):
+        if not num_bits.isdecimal():
+            return None
+        num_bits = int(num_bits)
+    if not isinstance(num_bits, int) or isinstance(num_bits, bool):
+        return None
+    if not MIN_NUM_BITS <= num_bits <= MAX_NUM_BITS:
+        return None
+    return num_bits
+
+
 @app.route("/keygen", methods=["GET"])
 @json_exceptions
 def keygen():
@@ -40,7 +224,8 @@ def keygen():
 
     The endpoint takes a query parameter :code:`num_bits` specifying size in bits of
     prime numbers used in the algorithm. If the parameter is not specified 1024 will
-    be used by default.
+    be used by default. If a prime pool is configured (see :func:`create_prime_pool`)
+    the primes are taken from it.
 
     Examples:
         .. code::
@@ -50,21 +235,465 @@ def keygen():
     Returns:
         flask.Response with JSON object containing public and private key or error message
     """
-    num_bits = request.args.get("num_bits", 1024)
+    num_bits = parse_num_bits(request.args.get("num_bits", 1024))
+    if num_bits is None:
+        return jsonify({"error": NUM_BITS_ERROR}), 400
 
-    if isinstance(num_bits, str):  # pragma: no branch
-        err_message = "num_bits should be a positive integer greater or equal to 2"
-        if not num_bits.isdecimal():
-            return jsonify({"error": err_message}), 400
-        num_bits = int(num_bits)
-        if num_bits < 2:
-            return jsonify({"error": err_message}), 400
-
-    public_key, private_key = rsa.keygen(num_bits)
+    set_key_bits(2 * num_bits)
+    public_key, private_key = rsa.keygen(num_bits, pool=prime_pool)
 
     return jsonify({"public_key": public_key, "private_key": private_key})
 
 
+JOB_DIR = os.environ.get(
+    "RSA_KEYGEN_JOB_DIR", os.path.join(tempfile.gettempdir(), "rsa-keygen-jobs")
+)
+JOB_TTL = float(os.environ.get("RSA_KEYGEN_JOB_TTL", 600))
+JOB_PROCESSES = int(os.environ.get("RSA_KEYGEN_JOB_PROCESSES", 2))
+JOB_MAX_PENDING = int(os.environ.get("RSA_KEYGEN_JOB_MAX_PENDING", 16))
+JOB_MAX_TIMEOUT = 30.0
+
+_job_executor = None
+_job_lock = threading.Lock()
+
+
+def _job_path(job_id):
+    return os.path.join(JOB_DIR, f"{job_id}.json")
+
+
+def _make_private_dir(directory):
+    """Creates a directory accessible only by the owner, unless it exists.
+
+    An existing directory is accepted only if it's owned by the current user and
+    not accessible by anyone else, so that a directory created in advance by
+    another user, e.g. in the shared temp dir, can't be used to read or plant
+    files.
+
+    Raises:
+        RuntimeError: if the directory is a symlink, is owned by another user or
+                      is accessible by other users
+    """
+    os.makedirs(directory, mode=0o700, exist_ok=True)
+    info = os.lstat(directory)
+    if not stat.S_ISDIR(info.st_mode) or info.st_uid != os.getuid():
+        raise RuntimeError(f"{directory} is not a directory owned by this user")
+    if info.st_mode & 0o077:
+        raise RuntimeError(f"{directory} is accessible by other users")
+
+
+def _write_temp_file(path, data):
+    """Writes data to a new uniquely named file next to the path.
+
+    The file is created with :code:`O_EXCL` and :code:`O_NOFOLLOW`, so an existing
+    file or symlink is never written to, and is readable only by the owner.
+
+    Returns:
+        path of the temporary file
+    """
+    tmp = f"{path}.{uuid.uuid4().hex}.tmp"
+    flags = os.O_WRONLY | os.O_CREAT | os.O_EXCL | getattr(os, "O_NOFOLLOW", 0)
+    with open(os.open(tmp, flags, 0o600), "wb") as f:
+        f.write(data)
+    return tmp
+
+
+def _write_file(path, data):
+    """Atomically writes data to a file readable only by the owner."""
+    os.replace(_write_temp_file(path, data), path)
+
+
+def _create_file(path, data):
+    """Atomically creates a file readable only by the owner if it doesn't exist.
+
+    The data is written to a temporary file which is then hard linked to the path,
+    which, like opening it with :code:`O_EXCL`, fails if the path exists, but never
+    exposes a partially written file.
+
+    Returns:
+        True if the file has been created, False if it already existed
+    """
+    tmp = _write_temp_file(path, data)
+    try:
+        os.link(tmp, path)
+    except FileExistsError:
+        return False
+    finally:
+        os.remove(tmp)
+    return True
+
+
+def _remove_file(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def _write_job(path, job):
+    """Atomically writes state of the job to its file."""
+    _write_file(path, json.dumps(job).encode())
+
+
+def _read_job(job_id):
+    """Reads state of the job, treating expired jobs as nonexistent."""
+    try:
+        with open(_job_path(job_id)) as f:
+            job = json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+    if time.time() - job["created"] > JOB_TTL:
+        return None
+    return job
+
+
+def _remove_expired_files(directory, ttl):
+    """Removes files from the directory which haven't been modified for ttl seconds."""
+    now = time.time()
+    try:
+        names = os.listdir(directory)
+    except FileNotFoundError:
+        return
+    for name in names:
+        path = os.path.join(directory, name)
+        try:
+            if now - os.path.getmtime(path) > ttl:
+                os.remove(path)
+        except OSError:  # pragma: no cover
+            pass
+
+
+def _claim_job_slot():
+    """Claims one of :code:`JOB_MAX_PENDING` slots shared by all worker processes.
+
+    A slot is a lock file in :code:`JOB_DIR` created with :code:`O_EXCL`, so each of
+    them can be held by a single job. It is removed once the job is finished, or
+    expires with the jobs if the process running it has died.
+
+    Returns:
+        path of the claimed slot or None if all of them are taken
+    """
+    for i in range(JOB_MAX_PENDING):
+        path = os.path.join(JOB_DIR, f"slot-{i}.lock")
+        try:
+            os.close(os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600))
+        except FileExistsError:
+            continue
+        return path
+    return None
+
+
+def _run_keygen_job(path, job, slot):
+    """Generates the keys inside of a worker process and stores the result."""
+    try:
+        public_key, private_key = rsa.keygen(job["num_bits"])
+        job.update(status="done", public_key=public_key, private_key=private_key)
+    except Exception as e:  # pragma: no cover
+        job.update(status="failed", error=str(e))
+    _write_job(path, job)
+    _remove_file(slot)
+
+
+def _get_job_executor():
+    global _job_executor
+    with _job_lock:
+        if _job_executor is None:
+            _job_executor = ProcessPoolExecutor(JOB_PROCESSES)
+            atexit.register(_job_executor.shutdown)
+    return _job_executor
+
+
+def _job_response(job_id, job):
+    return jsonify({"id": job_id, **job})
+
+
+@app.route("/keygen/jobs", methods=["POST"])
+@json_exceptions
+def create_keygen_job():
+    """Starts generating public/private key pair in the background.
+
+    Key size is specified the same way as for :code:`/keygen`, either as a query
+    parameter or as a field of JSON body. The keys are generated by a bounded pool
+    of worker processes and the response containing id of the job is returned
+    immediately. At most :code:`JOB_MAX_PENDING` jobs can be pending at once across
+    all the worker processes of the API. Jobs and their results expire after
+    :code:`JOB_TTL` seconds. They are stored in :code:`JOB_DIR`, which has to be
+    owned by the user running the API and accessible only by it, since the results
+    contain private keys.
+
+    If the request has :code:`Idempotency-Key` header, its value identifies the job,
+    so retrying the request returns the existing job instead of starting another one.
+
+    Examples:
+        .. code::
+
+            $ curl -X POST "http://localhost:5000/keygen/jobs?num_bits=2048"
+
+    Returns:
+        flask.Response with JSON object describing the job or error message
+    """
+    body = request.get_json(silent=True)
+    if not isinstance(body, dict):
+        body = {}
+    num_bits = parse_num_bits(body.get("num_bits", request.args.get("num_bits", 1024)))
+    if num_bits is None:
+        return jsonify({"error": NUM_BITS_ERROR}), 400
+    set_key_bits(2 * num_bits)
+
+    _make_private_dir(JOB_DIR)
+    _remove_expired_files(JOB_DIR, JOB_TTL)
+
+    idempotency_key = request.headers.get("Idempotency-Key")
+    if idempotency_key is None:
+        job_id = uuid.uuid4().hex
+    else:
+        job_id = hashlib.sha256(idempotency_key.encode()).hexdigest()[:32]
+        job = _read_job(job_id)
+        if job is not None:
+            return _job_response(job_id, job), 200
+
+    slot = _claim_job_slot()
+    if slot is None:
+        return jsonify({"error": "Too many pending keygen jobs"}), 503
+
+    path = _job_path(job_id)
+    job = {"status": "pending", "num_bits": num_bits, "created": time.time()}
+    try:
+        while not _create_file(path, json.dumps(job).encode()):
+            existing = _read_job(job_id)
+            if existing is not None:
+                _remove_file(slot)
+                return _job_response(job_id, existing), 200
+            _remove_file(path)
+        _get_job_executor().submit(_run_keygen_job, path, job, slot)
+    except BaseException:
+        _remove_file(slot)
+        raise
+
+    return _job_response(job_id, job), 202
+
+
+@app.route("/keygen/jobs/<job_id>", methods=["GET"])
+@json_exceptions
+def get_keygen_job(job_id):
+    """Returns the state of a keygen job, including the keys once they're generated.
+
+    If :code:`timeout` query parameter is provided the request blocks for up to that
+    many seconds (at most :code:`JOB_MAX_TIMEOUT`) waiting for the job to finish.
+
+    Examples:
+        .. code::
+
+            $ curl -X GET "http://localhost:5000/keygen/jobs/<id>?timeout=10"
+
+    Returns:
+        flask.Response with JSON object describing the job or error message
+    """
+    try:
+        timeout = min(float(request.args.get("timeout", 0)), JOB_MAX_TIMEOUT)
+    except ValueError:
+        return jsonify({"error": "timeout should be a number"}), 400
+
+    if not all(c in "0123456789abcdef" for c in job_id):
+        return jsonify({"error": "Job not found"}), 404
+
+    _make_private_dir(JOB_DIR)
+    _remove_expired_files(JOB_DIR, JOB_TTL)
+
+    deadline = time.time() + timeout
+    job = _read_job(job_id)
+    while job is not None and job["status"] == "pending" and time.time() < deadline:
+        time.sleep(0.05)
+        job = _read_job(job_id)
+
+    if job is None:
+        return jsonify({"error": "Job not found"}), 404
+    return _job_response(job_id, job)
+
+
+KEY_DIR = os.environ.get("RSA_KEY_DIR", os.path.join(tempfile.gettempdir(), "rsa-keys"))
+KEY_TTL = float(os.environ.get("RSA_KEY_TTL", 24 * 60 * 60))
+KEY_CACHE_SIZE = int(os.environ.get("RSA_KEY_CACHE_SIZE", 1024))
+KEY_KINDS = {"public_key": rsa.load_public_key, "private_key": rsa.load_private_key}
+
+
+def _is_in_temp_dir(path):
+    temp_dir = os.path.realpath(tempfile.gettempdir())
+    return os.path.commonpath([os.path.realpath(path), temp_dir]) == temp_dir
+
+
+# private keys are never written to the temp dir, which is shared by all users
+PRIVATE_KEYS_ENABLED = "RSA_KEY_DIR" in os.environ and not _is_in_temp_dir(KEY_DIR)
+
+_key_cache = OrderedDict()
+_key_cache_lock = threading.Lock()
+
+
+def _key_path(kind, key_id):
+    return os.path.join(KEY_DIR, f"{kind}-{key_id}.rsak")
+
+
+def _key_id(key):
+    """Id of a key object.
+
+    Keys are identified by a hash of the whole key, rather than just of the
+    modulus, so that keys differing only in the exponent get different ids and the
+    id of a private key can't be derived from the corresponding public key.
+    """
+    return hashlib.sha256(rsa.key_to_bytes(key)).hexdigest()[:16]
+
+
+def register_key(kind, key):
+    """Stores a key so that it can later be referenced by its id.
+
+    Keys are stored in :code:`KEY_DIR` in binary format (see :mod:`rsa.keyformat`),
+    so that they're available to all worker processes, and expire if they aren't
+    registered again within :code:`KEY_TTL` seconds. The file of a key is created
+    only if it doesn't exist, so a registered key is never replaced by another one.
+
+    Args:
+        kind: either :code:`public_key` or :code:`private_key`
+        key: key object
+
+    Raises:
+        ValueError: if a different key with the same id is already registered
+
+    Returns:
+        id of the key
+    """
+    key_id = _key_id(key)
+    path = _key_path(kind, key_id)
+    data = bytes(rsa.key_to_bytes(key))
+    while not _create_file(path, data):
+        try:
+            with open(path, "rb") as f:
+                if f.read() != data:
+                    raise ValueError(f"Another key with id {key_id} is registered")
+            os.utime(path)
+        except FileNotFoundError:
+            continue
+        break
+
+    with _key_cache_lock:
+        _key_cache.pop((kind, key_id), None)
+    return key_id
+
+
+def get_registered_key(kind, key_id):
+    """Gets a registered key by its id.
+
+    Decoded keys are kept in a per-process LRU cache of at most
+    :code:`KEY_CACHE_SIZE` keys, so the key file is read and parsed only when the
+    key isn't in the cache. Expired keys are removed before the file is read, and
+    a key read from a file is rejected unless its id matches the requested one, so
+    a replaced file can't make the id refer to another key.
+
+    Args:
+        kind: either :code:`public_key` or :code:`private_key`
+        key_id: id of the key
+
+    Returns:
+        key object or None if there is no such key or it has expired
+    """
+    if len(key_id) != 16 or not all(c in "0123456789abcdef" for c in key_id):
+        return None
+
+    now = time.time()
+    with _key_cache_lock:
+        cached = _key_cache.get((kind, key_id))
+        if cached is not None and cached[1] > now:
+            _key_cache.move_to_end((kind, key_id))
+            return cached[0]
+
+    _remove_expired_files(KEY_DIR, KEY_TTL)
+    path = _key_path(kind, key_id)
+    try:
+        expires = os.path.getmtime(path) + KEY_TTL
+        with open(path, "rb") as f:
+            key = rsa.key_from_bytes(f.read())
+    except (FileNotFoundError, ValueError):
+        return None
+    if expires <= now:
+        return None
+    if _key_id(key) != key_id:
+        logger.warning("Key file %s doesn't hold the key with its id", path)
+        return None
+
+    with _key_cache_lock:
+        _key_cache[(kind, key_id)] = (key, expires)
+        _key_cache.move_to_end((kind, key_id))
+        while len(_key_cache) > KEY_CACHE_SIZE:
+            _key_cache.popitem(last=False)
+    return key
+
+
+def resolve_key(kind, key, key_id):
+    """Gets key object either from base64 key or from id of a registered key.
+
+    Args:
+        kind: either :code:`public_key` or :code:`private_key`
+        key: base64 encoded key, takes precedence over key_id if provided
+        key_id: id of a registered key
+
+    Returns:
+        key object or None if there is no registered key with given id
+    """
+    if key is not None:
+        return KEY_KINDS[kind](key)
+    return get_registered_key(kind, key_id)
+
+
+@app.route("/keys", methods=["POST"])
+@json_exceptions
+def register_keys():
+    """Registers keys so that other endpoints can reference them by id.
+
+    The body should be a JSON object with :code:`public_key` and/or
+    :code:`private_key`, e.g. the response of :code:`/keygen`. Instead of sending
+    the key with every request, :code:`key_id` can then be passed to
+    :code:`/encrypt` and :code:`/decrypt` and their batch counterparts. The key is
+    decoded only once per worker process, see :func:`get_registered_key`.
+
+    Private keys can be registered only if :code:`RSA_KEY_DIR` is explicitly set to
+    a directory outside of the system temp dir, otherwise the request is rejected.
+
+    Examples:
+        .. code::
+
+            $ curl -X POST "http://localhost:5000/keys" \\
+                -H "Content-Type: application/json" \\
+                -d '{"public_key": "5R3MTuM=.AQAB"}'
+            {"public_key_id": "..."}
+
+    Returns:
+        flask.Response with JSON object containing ids of the keys or error message
+    """
+    body = request.get_json(silent=True)
+    if not isinstance(body, dict) or not any(kind in body for kind in KEY_KINDS):
+        return jsonify({"error": "Neither public nor private key is provided!\n"}), 400
+
+    if "private_key" in body and not PRIVATE_KEYS_ENABLED:
+        return jsonify({"error": "Registering private keys is disabled"}), 403
+
+    keys = {}
+    for kind, load_key in KEY_KINDS.items():
+        if kind not in body:
+            continue
+        try:
+            if not isinstance(body[kind], str):
+                raise ValueError(f"{kind} should be a string")
+            keys[kind] = load_key(body[kind])
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+    _make_private_dir(KEY_DIR)
+    _remove_expired_files(KEY_DIR, KEY_TTL)
+    try:
+        ids = {f"{kind}_id": register_key(kind, key) for kind, key in keys.items()}
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 409
+    return jsonify(ids), 201
+
+
 @app.route("/encrypt", methods=["GET"])
 @json_exceptions
 def encrypt():
@@ -72,7 +701,8 @@ def encrypt():
 
     The following query parameters need to be provided:
         - :code:`message` - message to be encrypted
-        - :code:`key` - key to use for encryption
+        - :code:`key` - key to use for encryption, or :code:`key_id` of a key
+          registered using :code:`/keys`
 
     Examples:
         .. code::
@@ -84,18 +714,24 @@ def encrypt():
     """
     message = request.args.get("message")
     key = request.args.get("key")
+    key_id = request.args.get("key_id")
 
     error = ""
 
     if message is None:
         error += "Message is not provided!\n"
-    if key is None:
+    if key is None and key_id is None:
         error += "Encryption key is not provided!\n"
 
     if error:
         return jsonify({"error": error}), 400
 
-    return jsonify({"ciphertext": rsa.base64_encrypt(message, key)})
+    public_key = resolve_key("public_key", key, key_id)
+    if public_key is None:
+        return jsonify({"error": "Key not found"}), 404
+
+    set_key_bits(public_key.num_bytes * 8)
+    return jsonify({"ciphertext": public_key.encrypt(message)})
 
 
 @app.route("/decrypt", methods=["GET"])
@@ -105,7 +741,8 @@ def decrypt():
 
     The following query parameters need to be provided:
         - :code:`ciphertext` - encrypted message to be decrypted
-        - :code:`key` - key to use for decryption
+        - :code:`key` - key to use for decryption, or :code:`key_id` of a key
+          registered using :code:`/keys`
 
     Examples:
         .. code::
@@ -117,18 +754,193 @@ def decrypt():
     """
     ciphertext = request.args.get("ciphertext")
     key = request.args.get("key")
+    key_id = request.args.get("key_id")
 
     error = ""
 
     if ciphertext is None:
         error += "Ciphertext is not provided!\n"
-    if key is None:
+    if key is None and key_id is None:
         error += "Decryption key is not provided!\n"
 
     if error:
         return jsonify({"error": error}), 400
 
-    return jsonify({"message": rsa.base64_decrypt(ciphertext, key)})
+    private_key = resolve_key("private_key", key, key_id)
+    if private_key is None:
+        return jsonify({"error": "Key not found"}), 404
+
+    set_key_bits(private_key.num_bytes * 8)
+    return jsonify({"message": private_key.decrypt(ciphertext)})
+
+
+@app.route("/encrypt/many", methods=["POST"])
+@json_exceptions
+def encrypt_many():
+    """Encrypts the same message using many keys
+
+    The body should be a JSON object with :code:`message` and :code:`keys` and/or
+    :code:`key_ids` lists, holding base64 encoded keys and ids of keys registered
+    using :code:`/keys` respectively. The message is encoded and split into blocks
+    once per size of the keys, see :func:`rsa.rsa.encrypt_many`.
+
+    Examples:
+        .. code::
+
+            $ curl -X POST "http://localhost:5000/encrypt/many" \\
+                -H "Content-Type: application/json" \\
+                -d '{"message": "hello", "keys": ["5R3MTuM=.AQAB"], "key_ids": ["..."]}'
+            {"ciphertexts": {"<fingerprint>": "...", "<fingerprint>": "..."}}
+
+    Returns:
+        flask.Response with JSON object mapping fingerprints of the keys to
+        ciphertexts or error message
+    """
+    body = request.get_json(silent=True)
+    if not isinstance(body, dict):
+        body = {}
+    message = body.get("message")
+    keys = body.get("keys", [])
+    key_ids = body.get("key_ids", [])
+
+    error = ""
+
+    if not isinstance(message, str):
+        error += "Message is not provided!\n"
+    if (
+        not isinstance(keys, list)
+        or not isinstance(key_ids, list)
+        or not all(isinstance(ref, str) for ref in keys + key_ids)
+    ):
+        error += "Keys and key ids should be lists of strings!\n"
+    elif not keys and not key_ids:
+        error += "Encryption keys are not provided!\n"
+
+    if error:
+        return jsonify({"error": error}), 400
+
+    try:
+        public_keys = [rsa.load_public_key(key) for key in keys]
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    for key_id in key_ids:
+        public_key = get_registered_key("public_key", key_id)
+        if public_key is None:
+            return jsonify({"error": "Key not found"}), 404
+        public_keys.append(public_key)
+
+    key_bits = {public_key.num_bytes * 8 for public_key in public_keys}
+    set_key_bits(key_bits.pop() if len(key_bits) == 1 else None)
+    try:
+        ciphertexts = rsa.encrypt_many(message, public_keys)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify({"ciphertexts": ciphertexts})
+
+
+def batch(field, result_field, kind, process):
+    """Processes a batch of items streaming the results back as NDJSON.
+
+    The body of the request should be a JSON object with :code:`items` list. Items
+    are either strings, in which case they are processed using the :code:`key` or
+    :code:`key_id` of the body, or objects with :code:`field` and optional
+    :code:`key` or :code:`key_id` overriding the one of the body. Each key is
+    decoded only once for the whole batch. Metrics of the request are labelled with
+    the size of the keys if all of them have the same size.
+
+    Each line of the response is a JSON object with :code:`index` of the item and
+    either :code:`result_field` or :code:`error` if the item couldn't be processed.
+
+    Args:
+        field: name of the field holding the input of an item
+        result_field: name of the field holding the output of an item
+        kind: kind of the keys, either :code:`public_key` or :code:`private_key`
+        process: function processing the input of an item using key object
+
+    Returns:
+        flask.Response streaming the results or error response
+    """
+    body = request.get_json(silent=True)
+    if not isinstance(body, dict) or not isinstance(body.get("items"), list):
+        return jsonify({"error": "Items are not provided!\n"}), 400
+
+    default_ref = (body.get("key"), body.get("key_id"))
+    items = body["items"]
+
+    def generate():
+        keys = {}
+        key_bits = set()
+        for index, item in enumerate(items):
+            if isinstance(item, dict):
+                value, ref = item.get(field), (item.get("key"), item.get("key_id"))
+                if ref == (None, None):
+                    ref = default_ref
+            else:
+                value, ref = item, default_ref
+            ref = tuple(r if isinstance(r, str) else None for r in ref)
+
+            try:
+                if not isinstance(value, str) or ref == (None, None):
+                    raise ValueError(f"Item should have {field} and key or key_id")
+                if ref not in keys:
+                    keys[ref] = resolve_key(kind, *ref)
+                    if keys[ref] is not None:
+                        key_bits.add(keys[ref].num_bytes * 8)
+                        size = next(iter(key_bits)) if len(key_bits) == 1 else None
+                        set_key_bits(size)
+                if keys[ref] is None:
+                    raise ValueError("Key not found")
+                line = {"index": index, result_field: process(keys[ref], value)}
+            except Exception as e:
+                line = {"index": index, "error": str(e)}
+            yield json.dumps(line) + "\n"
+
+    return app.response_class(
+        stream_with_context(generate()), mimetype="application/x-ndjson"
+    )
+
+
+@app.route("/encrypt/batch", methods=["POST"])
+@json_exceptions
+def encrypt_batch():
+    """Encrypts a batch of messages
+
+    See :func:`batch` for the format of the request and the response.
+
+    Examples:
+        .. code::
+
+            $ curl -X POST "http://localhost:5000/encrypt/batch" \\
+                -H "Content-Type: application/json" \\
+                -d '{"key": "5R3MTuM=.AQAB", "items": ["hello", {"message": "world"}]}'
+            {"index": 0, "ciphertext": "..."}
+            {"index": 1, "ciphertext": "..."}
+
+    Returns:
+        flask.Response streaming NDJSON with encrypted messages or error message
+    """
+    return batch("message", "ciphertext", "public_key", lambda key, m: key.encrypt(m))
+
+
+@app.route("/decrypt/batch", methods=["POST"])
+@json_exceptions
+def decrypt_batch():
+    """Decrypts a batch of ciphertexts
+
+    See :func:`batch` for the format of the request and the response.
+
+    Examples:
+        .. code::
+
+            $ curl -X POST "http://localhost:5000/decrypt/batch" \\
+                -H "Content-Type: application/json" \\
+                -d '{"key": "5R3MTuM=.AeymywI=", "items": ["Y4q6Xt8="]}'
+            {"index": 0, "message": "..."}
+
+    Returns:
+        flask.Response streaming NDJSON with decrypted messages or error message
+    """
+    return batch("ciphertext", "message", "private_key", lambda key, c: key.decrypt(c))
 
 
 if __name__ == "__main__":
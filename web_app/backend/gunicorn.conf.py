@@ -0,0 +1,27 @@
+"""Gunicorn configuration enabling metrics aggregated across worker processes.
+
+Each worker writes its metrics to files in :code:`prometheus_multiproc_dir`, which
+are read and aggregated by whichever worker handles the request to :code:`/metrics`.
+The directory is emptied when gunicorn starts, so that metrics of previous runs
+aren't reported. The variable has to be set before :code:`prometheus_client` is
+imported, so it's imported only inside of the hook.
+"""
+import os
+import shutil
+import tempfile
+
+os.environ.setdefault(
+    "prometheus_multiproc_dir", os.path.join(tempfile.gettempdir(), "rsa-metrics")
+)
+
+
+def on_starting(server):
+    path = os.environ["prometheus_multiproc_dir"]
+    shutil.rmtree(path, ignore_errors=True)
+    os.makedirs(path)
+
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+
+    multiprocess.mark_process_dead(worker.pid)
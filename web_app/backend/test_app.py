@@ -1,9 +1,14 @@
 import json
+import os
 import random
 
+import app as app_module
 import pytest
+import rsa
 from app import app
+from app import create_prime_pool
 from app import json_exceptions
+from prometheus_client import REGISTRY
 
 
 @pytest.fixture
@@ -14,29 +19,36 @@ def message():
 @pytest.fixture
 def public_key():
     return (
-        "zXR7l5BTTjoURXPmcc7vtto1GCbi07ygBodsICAzl3O3TG0K9dl1wB1izdy9Ey0Mfur_r_"
-        "BFKtb5PeOXY0JVU0dafKw5YT9qndzdvTGKlHKr5xuVAAJx4OQsk1c3A-igZVkm6QEuJlOW"
-        "sv0bLKOxjX6X9G9_oh4Kgxm3zudEmJA=.AQAB"
+        "cayAfCrX3vtG_2DW2qlJ1zwRM19GFjj2OBFgbaa1bX6pJGRdpNRUqBbHQY6f58BxRJGQs9"
+        "QG3u_hOu6yEqfxKFrFfZYIEzcYqW8JQD4i610UCoRJ2baCwHCJgcpPsZJehZ6r4cTHC-hE"
+        "Cjsm9zv4PjavUvwDwnQ5qpjpS40rDIQ=.AQAB"
     )
 
 
 @pytest.fixture
 def private_key():
     return (
-        "zXR7l5BTTjoURXPmcc7vtto1GCbi07ygBodsICAzl3O3TG0K9dl1wB1izdy9Ey0Mfur_r_"
-        "BFKtb5PeOXY0JVU0dafKw5YT9qndzdvTGKlHKr5xuVAAJx4OQsk1c3A-igZVkm6QEuJlOW"
-        "sv0bLKOxjX6X9G9_oh4Kgxm3zudEmJA=.MexFXz3esLCNvEBC7tF0X5mors-R46-FZsk4d"
-        "PxdW9X4nsXcrtoVGwspSscq4OvIgdKRob033Pcb0XKSH9ui-vdAOuGmWPz-KeZ12rQDlVB"
-        "twwdnmXpTwCAj4DEFyOh1o53lVvGEQSm4GUCASHO0mioLv0VhhGFeREAHjrp0dfU="
+        "cayAfCrX3vtG_2DW2qlJ1zwRM19GFjj2OBFgbaa1bX6pJGRdpNRUqBbHQY6f58BxRJGQs9"
+        "QG3u_hOu6yEqfxKFrFfZYIEzcYqW8JQD4i610UCoRJ2baCwHCJgcpPsZJehZ6r4cTHC-hE"
+        "Cjsm9zv4PjavUvwDwnQ5qpjpS40rDIQ=.DT4GW9jgYvCPYE_Y2D4MXtgBlAlUT3qJyPsui"
+        "280251GRjFoAqPB65bePkkLvMUMl8dhseq6_FJ7fN_ueEPPDhDN5TbLzQ6OUuqxzR0-QTs"
+        "nm7CSQ5zZw4cYwVba3jRSw231u3ZCXGqRsbKDcUcUfA2amD1rWZtVxsDEdqxWiyk=.Vwgs"
+        "2L5vn2KsTAnCggbn41WUqms0L10KOl5IQvq0KPdi5uKC5cFlfHjDqWezZxHrOQanyGA9cd"
+        "QJ56VNh73B9w==.dxRulg7oo0kFzepxbTN1F21BppgheEXMpeGIYnz7KVFy3V2TCLz6Pcw"
+        "IU0pUBRIvJvN7MOSsS9K1gc0vXOFwiA==.F2GQoOtrk-AH_IvtAQ0BbS3lxTsGBSp_PDJF"
+        "m2w6BpdF0nYzYnFM-kiHq02qwtIynAjhraDbtebeSaB-IG077Q==.sbPlW-CNBxHcejV-2"
+        "RhZOf2XDeShz93RmaynrbwI5W3eXYz4N_9C0Ou65eTdUdzZR2v2sPQyEE57tPTOTvgGUQ="
+        "=.P9TY_AdG7htDhKE79O46rWLOsyBLM938YtEmZmaiCQr6YPiZrfZvFETddE3Twey6zfLq"
+        "_R7ad2L5OpC6i9plYg=="
     )
 
 
 @pytest.fixture
 def ciphertext():
     return (
-        "LNOISy6_5SyF3aTlKmJ-NTOD2W-HfkquEvI7zDtVQYsj5exIphiXEhCxEryBl50JUmEn9d"
-        "svSqAf-j0JyKg9FiGVyYouNUDvGYRhqBkygmAhZCMRh6NW-7QRtH3f4Biwu_XTvqV43n21"
-        "QPgDuovuTPUqG9FvojJy9VFReHKThl8="
+        "yeUu3s0haZtTwQ78c8x6w1eXezD9cEZUJUgI3f0TKzX5IV0-dUgs9UmsKtT7eZXGdRhAuc"
+        "RWZN4gPgLE_8NB4QPAUjdnLTtJPrUHLfQoBjEJwW6uw-4bcqR2AOYvx1r5eMyX2NHOpUJ4"
+        "-ld8-irkQpz8AlyykNWLc0CtFfcJnAk="
     )
 
 
@@ -67,18 +79,121 @@ def test_keygen(client, private_key, public_key):
     }
 
 
+def test_keygen_with_prime_pool(client, monkeypatch):
+    p, q = rsa.find_prime(64), rsa.find_prime(64)
+    pool = rsa.PrimePool([64])
+    pool.add(64, [p, q])
+    monkeypatch.setattr(app_module, "prime_pool", pool)
+
+    response = client.get("/keygen?num_bits=64")
+    assert response.status_code == 200
+    modulus, _ = rsa.decode_key(json.loads(response.data)["public_key"])
+    assert modulus == p * q
+    assert pool.count(64) == 0
+
+
+def test_create_prime_pool(monkeypatch):
+    monkeypatch.delenv("RSA_PRIME_POOL_SIZES", raising=False)
+    assert create_prime_pool() is None
+
+    monkeypatch.setenv("RSA_PRIME_POOL_SIZES", "32,64")
+    monkeypatch.setenv("RSA_PRIME_POOL_CAPACITY", "2")
+    pool = create_prime_pool()
+    try:
+        assert pool.capacity == 2
+        assert pool.processes == 1
+        assert pool.count(32) <= 2
+    finally:
+        pool.stop()
+
+
+@pytest.fixture
+def job_dir(tmpdir, monkeypatch):
+    tmpdir.chmod(0o700)
+    monkeypatch.setattr(app_module, "JOB_DIR", str(tmpdir))
+    return tmpdir
+
+
+def test_keygen_job(client, job_dir):
+    response = client.post("/keygen/jobs", json={"num_bits": 128})
+    assert response.status_code == 202
+    job = json.loads(response.data)
+    assert job["status"] == "pending" and job["num_bits"] == 128
+
+    response = client.get(f"/keygen/jobs/{job['id']}?timeout=30")
+    assert response.status_code == 200
+    job = json.loads(response.data)
+    assert job["status"] == "done"
+    message = "Hello world"
+    ciphertext = rsa.base64_encrypt(message, job["public_key"])
+    assert rsa.base64_decrypt(ciphertext, job["private_key"]) == message
+
+
+def test_keygen_jobs_are_deduplicated(client, job_dir):
+    headers = {"Idempotency-Key": "request-1"}
+    first = json.loads(client.post("/keygen/jobs?num_bits=64", headers=headers).data)
+    second = json.loads(client.post("/keygen/jobs?num_bits=64", headers=headers).data)
+    assert first["id"] == second["id"]
+    assert len(job_dir.listdir("*.json")) == 1
+
+
+def test_keygen_jobs_expire(client, job_dir, monkeypatch):
+    job = json.loads(client.post("/keygen/jobs?num_bits=64").data)
+    client.get(f"/keygen/jobs/{job['id']}?timeout=30")
+    monkeypatch.setattr(app_module, "JOB_TTL", -1)
+    assert client.get(f"/keygen/jobs/{job['id']}").status_code == 404
+    assert job_dir.listdir("*.json") == []
+    client.post("/keygen/jobs?num_bits=64")
+    assert len(job_dir.listdir("*.json")) == 1
+
+
+def test_keygen_job_errors(client, job_dir, monkeypatch):
+    response = client.post("/keygen/jobs", json={"num_bits": 1})
+    assert response.status_code == 400
+    num_bits = app_module.MAX_NUM_BITS + 1
+    assert client.post(f"/keygen/jobs?num_bits={num_bits}").status_code == 400
+    assert client.get("/keygen/jobs/not-a-job").status_code == 404
+    assert client.get("/keygen/jobs/abc?timeout=soon").status_code == 400
+
+    monkeypatch.setattr(app_module, "JOB_MAX_PENDING", 0)
+    assert client.post("/keygen/jobs?num_bits=64").status_code == 503
+
+
+def test_keygen_jobs_require_private_dir(client, job_dir):
+    job = json.loads(client.post("/keygen/jobs?num_bits=64").data)
+    client.get(f"/keygen/jobs/{job['id']}?timeout=30")
+    assert all(path.stat().mode & 0o777 == 0o600 for path in job_dir.listdir())
+
+    job_dir.chmod(0o755)
+    assert client.post("/keygen/jobs?num_bits=64").status_code == 500
+    assert client.get(f"/keygen/jobs/{job['id']}").status_code == 500
+
+
+def test_keygen_job_limit_is_shared_by_workers(client, job_dir, monkeypatch):
+    monkeypatch.setattr(app_module, "JOB_MAX_PENDING", 1)
+    job_dir.join("slot-0.lock").write("")
+    assert client.post("/keygen/jobs?num_bits=64").status_code == 503
+
+    job_dir.join("slot-0.lock").remove()
+    job = json.loads(client.post("/keygen/jobs?num_bits=64").data)
+    client.get(f"/keygen/jobs/{job['id']}?timeout=30")
+    assert job_dir.listdir("*.lock") == []
+
+
 def test_keygen_with_invalid_parameters(client):
     response = client.get("/keygen?num_bits=1")
     assert response.status_code == 400
-    assert json.loads(response.data) == {
-        "error": "num_bits should be a positive integer greater or equal to 2"
-    }
+    assert json.loads(response.data) == {"error": app_module.NUM_BITS_ERROR}
+
+    response = client.get("/keygen?num_bits=2")
+    assert response.status_code == 400
+
+    response = client.get(f"/keygen?num_bits={app_module.MAX_NUM_BITS + 1}")
+    assert response.status_code == 400
 
     response = client.get("/keygen?num_bits=NaN")
     assert response.status_code == 400
-    assert json.loads(response.data) == {
-        "error": "num_bits should be a positive integer greater or equal to 2"
-    }
+    assert json.loads(response.data) == {"error": app_module.NUM_BITS_ERROR}
 
 
 def test_encrypt(client, public_key, message, ciphertext):
@@ -111,3 +226,225 @@ def test_decrypt_with_missing_params(client, private_key, message, ciphertext):
     response = client.get(f"/decrypt?ciphertext={ciphertext}")
     assert response.status_code == 400
     assert json.loads(response.data) == {"error": "Decryption key is not provided!\n"}
+
+
+def read_ndjson(response):
+    return [json.loads(line) for line in response.data.decode().splitlines()]
+
+
+def test_encrypt_batch(client, public_key, private_key, message, ciphertext):
+    other_public, _ = rsa.keygen(64)
+    items = [message, {"message": message}, {"message": message, "key": other_public}]
+    response = client.post("/encrypt/batch", json={"key": public_key, "items": items})
+    assert response.status_code == 200
+    assert response.mimetype == "application/x-ndjson"
+    lines = read_ndjson(response)
+    assert [line["index"] for line in lines] == [0, 1, 2]
+    assert lines[0]["ciphertext"] == lines[1]["ciphertext"] == ciphertext
+    assert lines[2]["ciphertext"] == rsa.base64_encrypt(message, other_public)
+
+
+def test_decrypt_batch(client, private_key, message, ciphertext):
+    items = [ciphertext, {"ciphertext": ciphertext}, {"key": private_key}, 42]
+    response = client.post("/decrypt/batch", json={"key": private_key, "items": items})
+    assert response.status_code == 200
+    lines = read_ndjson(response)
+    assert lines[0]["message"] == lines[1]["message"] == message
+    assert "error" in lines[2] and "error" in lines[3]
+
+
+def test_batch_with_invalid_body(client, public_key):
+    response = client.post("/encrypt/batch", json={"key": public_key})
+    assert response.status_code == 400
+    assert json.loads(response.data) == {"error": "Items are not provided!\n"}
+
+    response = client.post("/decrypt/batch", data="not json")
+    assert response.status_code == 400
+
+    response = client.post("/encrypt/batch", json={"items": ["no key"]})
+    assert "error" in read_ndjson(response)[0]
+
+
+@pytest.fixture
+def key_dir(tmpdir, monkeypatch):
+    tmpdir.chmod(0o700)
+    monkeypatch.setattr(app_module, "KEY_DIR", str(tmpdir))
+    monkeypatch.setattr(app_module, "PRIVATE_KEYS_ENABLED", True)
+    app_module._key_cache.clear()
+    yield tmpdir
+    app_module._key_cache.clear()
+
+
+def test_registered_keys(client, key_dir, public_key, private_key, message, ciphertext):
+    response = client.post(
+        "/keys", json={"public_key": public_key, "private_key": private_key}
+    )
+    assert response.status_code == 201
+    ids = json.loads(response.data)
+    public_id, private_id = ids["public_key_id"], ids["private_key_id"]
+    assert len(public_id) == len(private_id) == 16 and private_id != public_id
+    assert len(key_dir.listdir()) == 2
+
+    response = client.get(f"/encrypt?message={message}&key_id={public_id}")
+    assert json.loads(response.data) == {"ciphertext": ciphertext}
+
+    app_module._key_cache.clear()
+    response = client.get(f"/decrypt?ciphertext={ciphertext}&key_id={private_id}")
+    assert json.loads(response.data) == {"message": message}
+
+    items = [ciphertext, {"ciphertext": ciphertext, "key_id": public_id}]
+    response = client.post(
+        "/decrypt/batch", json={"key_id": private_id, "items": items}
+    )
+    lines = read_ndjson(response)
+    assert lines[0]["message"] == message
+    assert lines[1]["error"] == "Key not found"
+
+
+def test_registered_keys_errors(client, key_dir, public_key, message, monkeypatch):
+    assert client.post("/keys", json={}).status_code == 400
+    assert client.post("/keys", json={"public_key": "invalid"}).status_code == 400
+    assert client.post("/keys", json={"private_key": 42}).status_code == 400
+
+    response = client.get(f"/encrypt?message={message}&key_id=0123456789abcdef")
+    assert response.status_code == 404
+    assert json.loads(response.data) == {"error": "Key not found"}
+    assert client.get(f"/encrypt?message={message}&key_id=../x").status_code == 404
+
+    public_id = json.loads(client.post("/keys", json={"public_key": public_key}).data)[
+        "public_key_id"
+    ]
+    monkeypatch.setattr(app_module, "KEY_TTL", -1)
+    app_module._key_cache.clear()
+    response = client.get(f"/encrypt?message={message}&key_id={public_id}")
+    assert response.status_code == 404
+    assert key_dir.listdir() == []
+
+
+def test_registered_private_keys_can_be_disabled(
+    client, key_dir, private_key, monkeypatch
+):
+    monkeypatch.setattr(app_module, "PRIVATE_KEYS_ENABLED", False)
+    response = client.post("/keys", json={"private_key": private_key})
+    assert response.status_code == 403
+    assert key_dir.listdir() == []
+
+    assert app_module._is_in_temp_dir(str(key_dir))
+    assert not app_module._is_in_temp_dir(os.path.dirname(app_module.__file__))
+
+
+def test_registered_key_is_never_replaced(
+    client, key_dir, public_key, message, ciphertext
+):
+    response = client.post("/keys", json={"public_key": public_key})
+    public_id = json.loads(response.data)["public_key_id"]
+
+    # same modulus with an exponent which leaves messages unencrypted
+    weak_key = rsa.PublicKey(rsa.load_public_key(public_key).n, 1)
+    response = client.post("/keys", json={"public_key": weak_key.to_base64()})
+    assert json.loads(response.data)["public_key_id"] != public_id
+    response = client.get(f"/encrypt?message={message}&key_id={public_id}")
+    assert json.loads(response.data) == {"ciphertext": ciphertext}
+
+    key_dir.join(f"public_key-{public_id}.rsak").write_binary(
+        bytes(rsa.key_to_bytes(weak_key))
+    )
+    response = client.post("/keys", json={"public_key": public_key})
+    assert response.status_code == 409
+
+    app_module._key_cache.clear()
+    response = client.get(f"/encrypt?message={message}&key_id={public_id}")
+    assert response.status_code == 404
+
+
+def test_registered_keys_cache_is_bounded(client, key_dir, monkeypatch):
+    monkeypatch.setattr(app_module, "KEY_CACHE_SIZE", 2)
+    for _ in range(3):
+        public_key, _ = rsa.keygen(64)
+        key_id = json.loads(client.post("/keys", json={"public_key": public_key}).data)[
+            "public_key_id"
+        ]
+        assert client.get(f"/encrypt?message=a&key_id={key_id}").status_code == 200
+    assert len(app_module._key_cache) == 2
+
+
+def test_encrypt_many(client, key_dir, public_key, message, ciphertext):
+    other_public_key, other_private_key = rsa.keygen(64)
+    other_id = json.loads(
+        client.post("/keys", json={"public_key": other_public_key}).data
+    )["public_key_id"]
+
+    response = client.post(
+        "/encrypt/many",
+        json={"message": message, "keys": [public_key], "key_ids": [other_id]},
+    )
+    assert response.status_code == 200
+    ciphertexts = json.loads(response.data)["ciphertexts"]
+    assert ciphertexts[rsa.load_public_key(public_key).fingerprint.hex()] == ciphertext
+    other_fingerprint = rsa.load_public_key(other_public_key).fingerprint.hex()
+    other_ciphertext = ciphertexts[other_fingerprint]
+    assert rsa.base64_decrypt(other_ciphertext, other_private_key) == message
+
+    response = client.post("/encrypt/many", json={"message": message})
+    assert response.status_code == 400
+    assert json.loads(response.data) == {"error": "Encryption keys are not provided!\n"}
+    response = client.post("/encrypt/many", json={"keys": public_key})
+    assert response.status_code == 400
+    response = client.post("/encrypt/many", json={"message": message, "keys": ["x"]})
+    assert response.status_code == 400
+    response = client.post(
+        "/encrypt/many", json={"message": message, "key_ids": ["0123456789abcdef"]}
+    )
+    assert response.status_code == 404
+
+
+def test_metrics(client, public_key, message):
+    def count(endpoint, key_bits, status):
+        return (
+            REGISTRY.get_sample_value(
+                "rsa_http_requests_total",
+                {
+                    "endpoint": endpoint,
+                    "method": "GET",
+                    "key_bits": key_bits,
+                    "status": status,
+                },
+            )
+            or 0
+        )
+
+    before = count("/encrypt", "1024", "200"), count("/keygen", "", "400")
+    client.get(f"/encrypt?message={message}&key={public_key}")
+    client.get("/keygen?num_bits=abc")
+    assert count("/encrypt", "1024", "200") == before[0] + 1
+    assert count("/keygen", "", "400") == before[1] + 1
+
+    def latency_count(endpoint):
+        return (
+            REGISTRY.get_sample_value(
+                "rsa_http_request_duration_seconds_count",
+                {
+                    "endpoint": endpoint,
+                    "method": "POST",
+                    "key_bits": "1024",
+                    "status": "200",
+                },
+            )
+            or 0
+        )
+
+    before = latency_count("/encrypt/batch")
+    response = client.post(
+        "/encrypt/batch", json={"key": public_key, "items": [message] * 3}
+    )
+    assert latency_count("/encrypt/batch") == before
+    assert len(read_ndjson(response)) == 3
+    response.close()
+    assert latency_count("/encrypt/batch") == before + 1
+
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.mimetype == "text/plain"
+    text = response.data.decode()
+    assert "rsa_http_request_duration_seconds_bucket{" in text
+    assert 'endpoint="/metrics"' not in text